@@ -18,6 +18,7 @@ email                : gkahiu@gmail.com
 """
 import logging
 import uuid
+from collections import defaultdict
 from datetime import date, datetime
 from numbers import Number
 from enum import Enum
@@ -50,6 +51,7 @@ from qgis.core import (
     QgsFeature,
     QgsGeometry,
     QgsProject,
+    QgsRectangle,
     QgsVectorLayer,
     QgsWkbTypes,
     QgsReadWriteContext,
@@ -67,7 +69,10 @@ from sqlalchemy.schema import (
     Table,
     MetaData
 )
-from sqlalchemy.sql.expression import text
+from sqlalchemy.sql.expression import (
+    func,
+    text
+)
 
 from stdm.composer.chart_configuration import ChartConfigurationCollection
 from stdm.composer.composer_data_source import ComposerDataSource
@@ -101,14 +106,28 @@ from stdm.ui.sourcedocument import (
 )
 from stdm.utils.util import PLUGIN_DIR
 
-LOGGER = logging.getLogger('stdm')
-
 from stdm.utils.logging_handlers import (
     StdOutHandler,
     FileHandler,
     EventLogger
 )
 
+LOGGER = logging.getLogger('stdm')
+
+# Maximum number of values in the IN clause of batch queries
+QUERY_CHUNK_SIZE = 1000
+
+
+def _geometry_label(spatial_field, part):
+    """
+    :return: Returns the label of the column containing the WKB ('wkb') or
+    a bounding box coordinate ('xmin', 'ymin', 'xmax', 'ymax') of a
+    spatial field in the batch record query.
+    :rtype: str
+    """
+    return 'stdm_{0}_{1}'.format(part, spatial_field)
+
+
 class LayoutExportResult(Enum):
     Success = 0
     Canceled = 1
@@ -129,8 +148,12 @@ class DocumentGenerator(QObject):
 
     def __init__(self, iface, parent=None):
         QObject.__init__(self, parent)
+        # The map canvas is not available when documents are generated in
+        # headless mode i.e. iface is None.
         self._iface = iface
-        self._map_settings = self._iface.mapCanvas().mapSettings()
+        self._map_settings = None
+        if self._iface is not None:
+            self._map_settings = self._iface.mapCanvas().mapSettings()
         self._dbSession = STDMDb.instance().session
         self._attr_value_formatters = {}
 
@@ -146,6 +169,16 @@ class DocumentGenerator(QObject):
 
         self._link_field = ""
 
+        # Reflected data source tables
+        self._ds_tables = {}
+
+        # Memory layers of spatial fields which are reused across records
+        self._spatial_field_layers = {}
+
+        # Rows of linked tables prefetched for a batch of records, indexed
+        # by (table, field) then by the field value.
+        self._linked_rows = {}
+
         self._base_photo_table = "supporting_document"
 
         # Value formatter for output files
@@ -569,7 +602,7 @@ class DocumentGenerator(QObject):
 
         if not templateFile.open(QIODevice.ReadOnly):
             error_msg = "Cannot read template file! Document generation aborted."
-            self._log_errorr(error_msg)
+            self._log_error(error_msg)
             return False, QApplication.translate("DocumentGenerator",
                                                  error_msg)
 
@@ -625,234 +658,640 @@ class DocumentGenerator(QObject):
 
                 context = QgsReadWriteContext()
                 results = print_layout.loadFromTemplate(templateDoc, context)
+                layout_items, load_status = results
 
-                ref_layer = None
-                # Set value of composer items based on the corresponding db values
+                layout_configs = self._layout_configurations(print_layout, layout_items, templateDoc)
 
-                for composerId in composerDS.dataFieldMappings().reverse:
-                    # Use composer item id since the uuid is stripped off
-                    self._log_info(f"Composer ID... {composerId}")
-                    composerItem = print_layout.itemById(composerId)
+                status, msg = self._render_record(
+                    print_layout, composerDS, layout_configs, rec, outputMode,
+                    filePath, dataFields, fileExtension, data_source,
+                    entity_field_value
+                )
 
-                    if composerItem is not None:
-                        self._log_info(f"Composer Item... Found.")
-                        fieldName = composerDS.dataFieldName(composerId)
-                        if fieldName == '':
-                            self._log_error(f"Field name for composer Id: {composerId}... Not Found.")
-                            continue
-                        fieldValue = getattr(rec, fieldName)
+                # Record skipped, the error has already been logged
+                if status is None:
+                    continue
 
-                        msg = f"Field Name/Value... {fieldName}={fieldValue}"
-                        self._log_info(msg)
+                if not status:
+                    return False, msg
 
-                        # StdmDataLabel
-                        if isinstance(composerItem, StdmDataLabelLayoutItem):
-                            self._log_info(f"Setting value for Stdm DataLabel...")
-                            self._composeritem_value_handler(composerItem, fieldValue)
+            return True, "Success"
 
+        return False, "Document Print Layout could not be generated"
+    
 
-                # # Set table item values based on configuration information
-                self._log_info("Setting Table Items ...")
-                table_config_collection = TableConfigurationCollection.create(print_layout)
 
-                msg = f"[{len(table_config_collection.items())}] Table items found."
-                self._log_info(msg)
 
-                self._table_mem_layers = load_table_layers(table_config_collection)
-                self._set_table_data(print_layout, table_config_collection, rec)
 
-                self._log_info("Setting Photo items...")
-                layout_items, load_status = results
-                ph_config_collection = PhotoConfigurationCollection.create_layout_item(layout_items)
 
-                msg = f"[{len(ph_config_collection.items())}] Photo items found."
-                self._log_info(msg)
+    def run_batch(self, templatePath, entity_field_values, outputMode, filePath=None,
+                  dataFields=None, fileExtension=None, data_source=None,
+                  file_path_resolver=None):
+        """
+        Generates the documents for several entity records. Unlike calling
+        run for each record, the template is read, validated and loaded
+        into a print layout only once, the matching records are fetched in
+        a single query and the item values of the same layout are updated
+        for each record.
+        :param templatePath: The file path to the user-defined template.
+        :param entity_field_values: Values for filtering the records in the
+        data source view or table, usually the ids of the selected entity
+        records.
+        :type entity_field_values: list
+        :param outputMode: Whether the output composition should be an image or PDF.
+        :param filePath: The output file where the composition will be written to. Applies
+        to single mode output generation.
+        :param dataFields: List containing the field names whose values will be used to name the files.
+        :param fileExtension: The output file format. Used in multiple mode configuration.
+        :param data_source: Name of the data source table or view whose
+        row values will be used to name output files.
+        :param file_path_resolver: Optional function which takes the entity
+        field value and the index of the matching data source record and
+        returns the absolute path of the output file. It takes precedence
+        over filePath and dataFields.
+        :type file_path_resolver: callable
+        :return: Yields a tuple containing the entity field value, the
+        status and message for each value in entity_field_values. The
+        status is None if all the matching records were skipped, as in run.
+        If the template cannot be used then a single tuple is yielded with
+        None as the entity field value.
+        :rtype: tuple
+        """
+        if dataFields is None:
+            dataFields = []
 
-                # Extract photo information
-                self._extract_photo_info(print_layout, ph_config_collection, rec)
+        if fileExtension is None:
+            fileExtension = ''
 
-                self._log_info(f"Setting QRcode Items...")
-                # Create QR code configuration collection object
-                qrc_config_collection = QRCodeConfigurationCollection.create_layout_item(layout_items)
+        if data_source is None:
+            data_source = ''
 
-                msg = f"[{len(qrc_config_collection.items())}] QRCode items found."
-                self._log_info(msg)
+        templateDoc, msg = self.template_document(templatePath)
+        if templateDoc is None:
+            self._log_error(msg)
+            yield None, False, msg
+            return
 
-                # Extract QR code information in order to generate QR codes
-                self._generate_qr_codes(print_layout, qrc_config_collection, rec)
+        composerDS, msg = self.composer_data_source(templateDoc)
+        if composerDS is None:
+            self._log_error(msg)
+            yield None, False, msg
+            return
 
-                self._log_info("Setting Chart Items...")
-                # Create chart configuration collection object
-                chart_config_collection = ChartConfigurationCollection.create_chart_layout(layout_items, templateDoc)
+        # Set file name value formatter
+        self._file_name_value_formatter = EntityValueFormatter(
+            name=data_source
+        )
 
-                if chart_config_collection is not None:
-                    msg = f"[{len(chart_config_collection.items())}] Chart items found."
-                else:
-                    msg = f"[0] Chart items found."
+        entity_field_name = self.format_entity_field_name(composerDS.name(), data_source)
+        value_field = entity_field_name.split('.')[-1]
 
-                self._log_info(msg)
+        self._log_info(
+            f"Batch generation... {len(entity_field_values)} record(s) in `{composerDS.name()}`"
+        )
 
-                # Extract chart information and generate chart
-                self._generate_charts(print_layout, chart_config_collection, rec)
+        print_layout = QgsPrintLayout(QgsProject.instance())
+        print_layout.initializeDefaults()
 
-                # Set use fixed scale to false i.e. relative zoom
-                use_fixed_scale = False
+        context = QgsReadWriteContext()
+        layout_items, load_status = print_layout.loadFromTemplate(templateDoc, context)
+
+        layout_configs = self._layout_configurations(print_layout, layout_items, templateDoc)
+
+        # Item values are replaced for each record hence the initial values
+        # have to be restored before rendering the next record.
+        item_state = self._layout_item_state(print_layout)
+
+        # Spatial fields are fetched as WKB and bounding box
+        spatial_fields = set()
+        for spatial_field_config in layout_configs['spatial_fields']:
+            for spfm_list in spatial_field_config.spatialFieldsMapping().values():
+                spatial_fields.update([spfm.spatialField() for spfm in spfm_list])
+
+        try:
+            # Fetch the records of all the entity values in one query
+            ds_records = defaultdict(list)
+            for rec in self._exec_query_in(composerDS.name(), value_field,
+                                           entity_field_values, spatial_fields):
+                ds_records[getattr(rec, value_field)].append(rec)
+
+            # Records used for naming the output files
+            naming_records = {}
+            if file_path_resolver is None and filePath is None and len(dataFields) > 0:
+                for rec in self._exec_query_in(data_source, 'id', entity_field_values):
+                    naming_records[rec.id] = rec
+
+            self._prefetch_linked_data(
+                layout_configs,
+                [rec for recs in ds_records.values() for rec in recs]
+            )
+
+            for entity_field_value in entity_field_values:
+                records = ds_records.get(entity_field_value, [])
+
+                if len(records) == 0:
+                    error_msg = (f"No matching records in the database! \n"
+                                 "Confirm the STR link is created for the selected record.")
+                    self._log_error(error_msg)
+                    yield entity_field_value, False, QApplication.translate(
+                        "DocumentGenerator", error_msg
+                    )
+                    continue
+
+                status, msg = None, ''
+
+                for i, rec in enumerate(records):
+                    self._restore_layout_item_state(item_state)
 
-                self._log_info("Creating Map Items...")
-                spatial_field_configs = SpatialFieldsConfiguration.create(layout_items)
+                    rec_file_path, rec_data_fields = filePath, dataFields
+                    if file_path_resolver is not None:
+                        rec_file_path = file_path_resolver(entity_field_value, i)
+                        rec_data_fields = []
 
-                msg = f"[{len(spatial_field_configs)}] Map items found."
+                    rec_status, rec_msg = self._render_record(
+                        print_layout, composerDS, layout_configs, rec,
+                        outputMode, rec_file_path, rec_data_fields, fileExtension,
+                        data_source, entity_field_value,
+                        naming_records.get(entity_field_value, None)
+                    )
+
+                    # Record skipped, the error has already been logged
+                    if rec_status is None:
+                        if status is None:
+                            msg = rec_msg
+                        continue
+
+                    status, msg = rec_status, rec_msg
+
+                    if not status:
+                        break
+
+                yield entity_field_value, status, msg
+
+        finally:
+            self._linked_rows = {}
+            self.clear_temporary_layers()
+
+    def _prefetch_linked_data(self, layout_configs: dict, records: list):
+        """
+        Loads the rows of the tables linked to the chart and photo items for
+        all the records in the batch, using one query per linked table and
+        one for the supporting documents. Queries by the item handlers are
+        then answered from memory using _query.
+        :param layout_configs: Configuration collections of the layout.
+        :type layout_configs: dict
+        :param records: Data source records in the batch.
+        :type records: list
+        """
+        self._linked_rows = {}
+
+        chart_collection = layout_configs['charts']
+        if chart_collection is not None:
+            for cc in list(chart_collection.values()):
+                linked_table = cc.linked_table()
+                linked_field = cc.linked_field()
+                if not linked_table or not linked_field:
+                    continue
+
+                self._prefetch_linked_rows(
+                    linked_table,
+                    linked_field,
+                    [getattr(rec, cc.source_field(), None) for rec in records]
+                )
+
+        # Table items filter the features of the QGIS layers and QR codes
+        # only use the record values hence there is nothing to prefetch.
+
+        photo_collection = layout_configs['photos']
+        if photo_collection is None or len(photo_collection.items()) == 0:
+            return
+
+        # Only the supporting document tables are queried, see
+        # _extract_photo_info
+        photo_tables = set([
+            de.name for de in self._current_profile.supporting_document_entities()
+        ])
+
+        doc_ids = set()
+        for conf in list(photo_collection.items().values()):
+            if conf.linked_table() not in photo_tables:
+                continue
+
+            photo_rows = self._prefetch_linked_rows(
+                conf.linked_table(),
+                conf.linked_field(),
+                [getattr(rec, conf.source_field(), '') for rec in records]
+            )
+
+            for rows in photo_rows.values():
+                doc_ids.update([r.supporting_doc_id for r in rows])
+
+        self._prefetch_linked_rows(
+            self._current_profile.supporting_document.name,
+            'id',
+            doc_ids
+        )
+
+    def _prefetch_linked_rows(self, table_name: str, field: str, values) -> dict:
+        """
+        Loads the rows of the table whose field value is in the given values
+        and indexes them by the field value.
+        :return: Returns the index of the rows.
+        :rtype: dict
+        """
+        values = set([v for v in values if v is not None and v != ''])
+
+        index = defaultdict(list)
+        try:
+            for row in self._exec_query_in(table_name, field, values):
+                index[getattr(row, field)].append(row)
+        except (KeyError, SQLAlchemyError):
+            # Table or field does not exist, queries will be sent to the
+            # database for each record
+            self._log_error(f"Could not prefetch `{table_name}.{field}`.")
+
+            return index
+
+        self._linked_rows[(table_name, field)] = index
+
+        return index
+
+    def _query(self, dataSourceName, query_field: str, query_value):
+        """
+        Returns the prefetched rows of the data source matching the query
+        value, otherwise queries the database using _exec_query.
+        Returns a tuple containing the reflected table and the rows.
+        """
+        index = self._linked_rows.get((dataSourceName, query_field), None)
+        if index is None:
+            return self._exec_query(dataSourceName, query_field, query_value)
+
+        return self._reflect_table(dataSourceName), list(index.get(query_value, []))
+
+    def _layout_configurations(self, print_layout: QgsPrintLayout, layout_items,
+                               template_doc: QDomDocument) -> dict:
+        """
+        Creates the configuration collections of the STDM items in the
+        layout and loads the layers required by the table items.
+        :return: Returns a dictionary of the table, photo, QR code, chart
+        and spatial field configurations.
+        :rtype: dict
+        """
+        self._log_info("Setting Table Items ...")
+        table_config_collection = TableConfigurationCollection.create(print_layout)
+
+        msg = f"[{len(table_config_collection.items())}] Table items found."
+        self._log_info(msg)
+
+        self._table_mem_layers = load_table_layers(table_config_collection)
+
+        ph_config_collection = PhotoConfigurationCollection.create_layout_item(layout_items)
+
+        msg = f"[{len(ph_config_collection.items())}] Photo items found."
+        self._log_info(msg)
+
+        qrc_config_collection = QRCodeConfigurationCollection.create_layout_item(layout_items)
+
+        msg = f"[{len(qrc_config_collection.items())}] QRCode items found."
+        self._log_info(msg)
+
+        chart_config_collection = ChartConfigurationCollection.create_chart_layout(layout_items, template_doc)
+
+        if chart_config_collection is not None:
+            msg = f"[{len(chart_config_collection.items())}] Chart items found."
+        else:
+            msg = f"[0] Chart items found."
+
+        self._log_info(msg)
+
+        spatial_field_configs = SpatialFieldsConfiguration.create(layout_items)
+
+        msg = f"[{len(spatial_field_configs)}] Map items found."
+        self._log_info(msg)
+
+        return {
+            'tables': table_config_collection,
+            'photos': ph_config_collection,
+            'qr_codes': qrc_config_collection,
+            'charts': chart_config_collection,
+            'spatial_fields': spatial_field_configs
+        }
+
+    def _layout_item_state(self, print_layout: QgsPrintLayout) -> list:
+        """
+        :return: Returns the text of the label items and the picture path
+        of the picture items in the layout.
+        :rtype: list
+        """
+        state = []
+        for item in print_layout.items():
+            if isinstance(item, QgsLayoutItemLabel):
+                state.append((item, item.text()))
+            elif isinstance(item, QgsLayoutItemPicture):
+                state.append((item, item.picturePath()))
+
+        return state
+
+    def _restore_layout_item_state(self, state: list):
+        """
+        Resets the label text and picture path of the items captured in
+        _layout_item_state.
+        """
+        for item, value in state:
+            if isinstance(item, QgsLayoutItemLabel):
+                item.setText(value)
+            else:
+                item.setPicturePath(value)
+
+    def _render_record(self, print_layout: QgsPrintLayout, composerDS: ComposerDataSource,
+                       layout_configs: dict, rec, outputMode, filePath, dataFields,
+                       fileExtension, data_source, entity_field_value,
+                       naming_record=None) -> tuple:
+        """
+        Sets the values of the layout items using the given record and
+        writes the layout to file.
+        :return: Returns a tuple containing the status and message. The
+        status is None if the record was skipped.
+        :rtype: tuple
+        """
+        fieldName = ''
+        fieldValue = None
+
+        # Set value of composer items based on the corresponding db values
+        for composerId in composerDS.dataFieldMappings().reverse:
+            # Use composer item id since the uuid is stripped off
+            self._log_info(f"Composer ID... {composerId}")
+            composerItem = print_layout.itemById(composerId)
+
+            if composerItem is not None:
+                self._log_info(f"Composer Item... Found.")
+                fieldName = composerDS.dataFieldName(composerId)
+                if fieldName == '':
+                    self._log_error(f"Field name for composer Id: {composerId}... Not Found.")
+                    continue
+                fieldValue = getattr(rec, fieldName)
+
+                msg = f"Field Name/Value... {fieldName}={fieldValue}"
                 self._log_info(msg)
 
-                for spatial_field_config in spatial_field_configs:
+                # StdmDataLabel
+                if isinstance(composerItem, StdmDataLabelLayoutItem):
+                    self._log_info(f"Setting value for Stdm DataLabel...")
+                    self._composeritem_value_handler(composerItem, fieldValue)
 
-                    map_item = spatial_field_config.map_item()
+        # Set table item values based on configuration information
+        self._set_table_data(print_layout, layout_configs['tables'], rec)
 
-                    # Refresh non-custom map composer items
-                    self._refresh_composer_maps(print_layout,
-                                                list(spatial_field_config.spatialFieldsMapping().keys()))
+        # Extract photo information
+        self._extract_photo_info(print_layout, layout_configs['photos'], rec)
 
-                    # Create memory layers for spatial features and add them to the map
-                    for mapId, spfmList in spatial_field_config.spatialFieldsMapping().items():
+        # Extract QR code information in order to generate QR codes
+        self._generate_qr_codes(print_layout, layout_configs['qr_codes'], rec)
 
-                        #map_item = print_layout.itemById(mapId)
-                        #if map_item is not None:
+        # Extract chart information and generate chart
+        self._generate_charts(print_layout, layout_configs['charts'], rec)
 
-                        # Clear any previous map memory layer
-                        # self.clear_temporary_map_layers()
-                        for spfm in spfmList:
-                            # Use the value of the label field to name the layer
-                            lbl_field = spfm.labelField()
-                            spatial_field = spfm.spatialField()
+        self._set_map_items(print_layout, composerDS, layout_configs['spatial_fields'], rec)
 
-                            if not spatial_field:
-                                continue
+        # Build output path and generate print_layout
+        if filePath is not None and len(dataFields) == 0:
+            write_result = self._write_output(print_layout, outputMode, filePath)
 
-                            if lbl_field:
-                                if hasattr(rec, spfm.labelField()):
-                                    layerName = getattr(rec, spfm.labelField())
-                                else:
-                                    layerName = self._random_feature_layer_name(spatial_field)
-                            else:
-                                layerName = self._random_feature_layer_name(spatial_field)
+            if write_result != QgsLayoutExporter.Success:
+                return False, self._export_error_message(write_result)
 
-                            # Extract the geometry using geoalchemy spatial capabilities
-                            geom_value = getattr(rec, spatial_field)
-                            if geom_value is None:
-                                continue
+            self._log_info("Generating document... done.")
 
-                            geom_func = geom_value.ST_AsText()
-                            geomWKT = self._dbSession.scalar(geom_func)
+        elif filePath is None and len(dataFields) > 0:
+            entity_field_name = 'id'
+            doc_filename = self._build_file_name(data_source, entity_field_name,
+                                                 entity_field_value, dataFields, fileExtension,
+                                                 naming_record)
 
-                            # Get geometry type
-                            geom_type, srid = geometryType(composerDS.name(),
-                                                            spatial_field)
+            # If doc_filname is empty - Log the incident and move on
+            if doc_filename == "":
+                error_msg = f"Failed to generate document for record with column: `{fieldName}` value: {fieldValue}"
+                self._log_error(error_msg)
+                return None, error_msg
 
-                            # Create reference layer with feature
-                            ref_layer = self._build_vector_layer(layerName, geom_type, srid)
+            # Replace unsupported characters in Windows file naming
+            doc_filename = doc_filename.replace('/', '_').replace('\\', '_').replace(':', '_').strip('*?"<>|')
 
-                            if ref_layer is None or not ref_layer.isValid():
-                                continue
+            if not doc_filename:
+                return (False, QApplication.translate("DocumentGenerator",
+                                                      "File name could not be generated from the data fields."))
 
-                            # Add feature
-                            bbox = self._add_feature_to_layer(ref_layer, geomWKT)
+            outputDir = self._composer_output_path()
+            if outputDir is None:
+                return (False, QApplication.translate("DocumentGenerator",
+                                                      "System could not read the location of the output directory in the registry."))
 
-                            zoom_type = spfm.zoom_type
+            qDir = QDir()
+            if not qDir.exists(outputDir):
+                return (False, QApplication.translate("DocumentGenerator",
+                                                      "Output directory does not exist"))
 
-                            # Only scale the extents if zoom type is relative
-                            if zoom_type == 'RELATIVE':
-                                bbox.scale(int(spfm.zoomLevel()))
+            absDocPath = "{0}/{1}".format(outputDir, doc_filename)
 
-                            # Workaround for zooming to single point extent
-                            if ref_layer.wkbType() == QgsWkbTypes.Point:
-                                canvas_extent = self._iface.mapCanvas().fullExtent()
-                                cnt_pnt = bbox.center()
-                                canvas_extent.scale(1.0 / 32, cnt_pnt)
-                                bbox = canvas_extent
+            write_result = self._write_output(print_layout, outputMode, absDocPath)
 
-                            # Style layer based on the spatial field mapping symbol layer
-                            symbol_layer = spfm.symbolLayer()
-                            if symbol_layer is not None:
-                                ref_layer.renderer().symbols()[0].changeSymbolLayer(0, spfm.symbolLayer())
-                            '''
-                            Add layer to map and ensure its always added at the top
-                            '''
-                            self.map_registry.addMapLayer(ref_layer)
-                            self._iface.mapCanvas().setExtent(bbox)
+            if write_result != QgsLayoutExporter.Success:
+                return False, self._export_error_message(write_result)
 
-                            # Set scale if type is FIXED
-                            if zoom_type == 'FIXED':
-                                self._iface.mapCanvas().zoomScale(int(spfm.zoomLevel()))
-                                use_fixed_scale = True
+        return True, "Success"
 
-                            self._iface.mapCanvas().refresh()
-                            # Add layer to map memory layer list
-                            self._map_memory_layers.append(ref_layer.id())
-                            self._hide_layer(ref_layer)
-                        '''
-                        Use root layer tree to get the correct ordering of layers
-                        in the legend
-                        '''
-                        self._refresh_map_item(map_item, use_fixed_scale)
+    def _export_error_message(self, write_result) -> str:
+        """
+        :return: Returns the error message corresponding to the result of
+        exporting a layout.
+        :rtype: str
+        """
+        if write_result == QgsLayoutExporter.Canceled:
+            return QApplication.translate("DocumentGenerator",
+                                          "Document generation canceled")
 
-                # Build output path and generate print_layout
-                if filePath is not None and len(dataFields) == 0:
-                    self._write_output(print_layout, outputMode, filePath)
+        if write_result == QgsLayoutExporter.MemoryError:
+            return QApplication.translate("DocumentGenerator",
+                                          "Unable to allocate memory required to export")
 
-                    self._log_info("Generating document... done.")
+        if write_result == QgsLayoutExporter.FileError:
+            return QApplication.translate("DocumentGenerator",
+                                          "Could not write to destination file, likely due to a lock held by anther application")
 
+        return QApplication.translate("DocumentGenerator",
+                                      "Document could not be exported")
 
-                elif filePath is None and len(dataFields) > 0:
-                    entity_field_name = 'id'
-                    doc_filename = self._build_file_name(data_source, entity_field_name,
-                                                        entity_field_value, dataFields, fileExtension)
+    def _set_map_items(self, print_layout: QgsPrintLayout, composerDS: ComposerDataSource,
+                       spatial_field_configs, rec):
+        """
+        Renders the spatial fields of the record in the corresponding map
+        items. The geometry is read from the WKB and bounding box returned by
+        the record query and set in a memory layer which is reused for all
+        the records. The map canvas is not used.
+        """
+        self._log_info("Creating Map Items...")
+
+        for spatial_field_config in spatial_field_configs:
+
+            map_item = spatial_field_config.map_item()
 
-                    # If doc_filname is empty - Log the incident and move on
-                    if doc_filename == "":
-                        self._log_error(f"Failed to generate document for record with column: `{fieldName}` value: {fieldValue}")
+            # Refresh non-custom map composer items
+            self._refresh_composer_maps(print_layout,
+                                        list(spatial_field_config.spatialFieldsMapping().keys()))
+
+            for mapId, spfmList in spatial_field_config.spatialFieldsMapping().items():
+                map_layers = []
+                map_extent = None
+                map_scale = None
+
+                for spfm in spfmList:
+                    spatial_field = spfm.spatialField()
+
+                    if not spatial_field:
                         continue
 
-                    # Replace unsupported characters in Windows file naming
-                    doc_filename = doc_filename.replace('/', '_').replace('\\', '_').replace(':', '_').strip('*?"<>|')
+                    geom, bbox = self._record_geometry(rec, spatial_field)
+                    if geom is None:
+                        # Remove the geometry of the previous record
+                        self._clear_layer_geometry(composerDS.name(), mapId, spfm)
+                        continue
 
-                    if not doc_filename:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "File name could not be generated from the data fields."))
+                    ref_layer = self._spatial_field_layer(composerDS.name(), mapId, spfm)
+                    if ref_layer is None:
+                        continue
 
-                    outputDir = self._composer_output_path()
-                    if outputDir is None:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "System could not read the location of the output directory in the registry."))
+                    # Use the value of the label field to name the layer
+                    lbl_field = spfm.labelField()
+                    if lbl_field and hasattr(rec, lbl_field):
+                        ref_layer.setName(str(getattr(rec, lbl_field)))
 
-                    qDir = QDir()
-                    if not qDir.exists(outputDir):
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "Output directory does not exist"))
+                    self._set_layer_geometry(ref_layer, geom)
 
-                    absDocPath = "{0}/{1}".format(outputDir, doc_filename)
+                    # Workaround for zooming to single point extent
+                    if ref_layer.wkbType() == QgsWkbTypes.Point:
+                        bbox = self._point_extent(bbox, ref_layer)
 
-                    write_result = self._write_output(print_layout, outputMode, absDocPath)
+                    zoom_type = spfm.zoom_type
 
-                    if write_result == QgsLayoutExporter.Canceled:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "Document generation canceled"))
+                    # Only scale the extents if zoom type is relative
+                    if zoom_type == 'RELATIVE':
+                        bbox.scale(int(spfm.zoomLevel()))
 
-                    if write_result == QgsLayoutExporter.MemoryError:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "Unable to allocate memory required to export"))
+                    # Set scale if type is FIXED
+                    if zoom_type == 'FIXED':
+                        map_scale = int(spfm.zoomLevel())
 
-                    if write_result == QgsLayoutExporter.FileError:
-                        return (False, QApplication.translate("DocumentGenerator",
-                                                                "Could not write to destination file, likely due to a lock held by anther application"))
+                    map_layers.append(ref_layer)
+                    map_extent = bbox
 
-            return True, "Success"
+                if map_item is None:
+                    continue
 
-        return False, "Document Print Layout could not be generated"
-    
+                # An empty list removes the layers of the previous record
+                map_item.setLayers(map_layers)
+
+                if map_extent is not None:
+                    map_item.zoomToExtent(map_extent)
+
+                if map_scale is not None:
+                    map_item.setScale(map_scale)
+
+                map_item.invalidateCache()
+
+    def _record_geometry(self, rec, spatial_field: str) -> tuple:
+        """
+        :return: Returns a tuple containing the geometry of the spatial
+        field in the record and its bounding box. The WKB and bounding box
+        columns added by _exec_query_in are used if available, otherwise
+        the geometry is converted by the database.
+        :rtype: tuple
+        """
+        wkb = getattr(rec, _geometry_label(spatial_field, 'wkb'), None)
+
+        if wkb is not None:
+            geom = QgsGeometry()
+            geom.fromWkb(bytes(wkb))
+            bbox = QgsRectangle(
+                getattr(rec, _geometry_label(spatial_field, 'xmin')),
+                getattr(rec, _geometry_label(spatial_field, 'ymin')),
+                getattr(rec, _geometry_label(spatial_field, 'xmax')),
+                getattr(rec, _geometry_label(spatial_field, 'ymax'))
+            )
 
+            return geom, bbox
 
+        geom_value = getattr(rec, spatial_field, None)
+        if geom_value is None:
+            return None, None
 
+        geom = QgsGeometry.fromWkt(self._dbSession.scalar(geom_value.ST_AsText()))
+
+        return geom, geom.boundingBox()
+
+    def _spatial_field_layer(self, ds_name: str, map_id: str, spfm) -> QgsVectorLayer:
+        """
+        Returns the memory layer used to render the spatial field in the
+        given map item. The layer is created, styled and added to the
+        project, without adding it to the layer tree, on first use.
+        """
+        key = (ds_name, map_id, spfm.spatialField())
+
+        ref_layer = self._spatial_field_layers.get(key, None)
+        if ref_layer is not None:
+            return ref_layer
+
+        # Geometry type and SRID are read from the cached schema catalog
+        geom_type, srid = geometryType(ds_name, spfm.spatialField())
+
+        ref_layer = self._build_vector_layer(
+            self._random_feature_layer_name(spfm.spatialField()),
+            geom_type,
+            srid
+        )
+
+        if ref_layer is None or not ref_layer.isValid():
+            return None
+
+        # Style layer based on the spatial field mapping symbol layer
+        symbol_layer = spfm.symbolLayer()
+        if symbol_layer is not None:
+            ref_layer.renderer().symbols()[0].changeSymbolLayer(0, spfm.symbolLayer())
+
+        self.map_registry.addMapLayer(ref_layer, False)
+        self._map_memory_layers.append(ref_layer.id())
+        self._spatial_field_layers[key] = ref_layer
+
+        return ref_layer
+
+    def _clear_layer_geometry(self, ds_name: str, map_id: str, spfm):
+        """
+        Removes the features of the memory layer of the spatial field, if
+        it has been created, for records without a geometry.
+        """
+        key = (ds_name, map_id, spfm.spatialField())
+
+        ref_layer = self._spatial_field_layers.get(key, None)
+        if ref_layer is None:
+            return
 
+        ref_layer.dataProvider().truncate()
+        ref_layer.updateExtents()
+        ref_layer.triggerRepaint()
+
+    def _set_layer_geometry(self, vlayer: QgsVectorLayer, geom: QgsGeometry):
+        """
+        Replaces the features of the memory layer with a single feature
+        of the given geometry.
+        """
+        dp = vlayer.dataProvider()
+        dp.truncate()
+
+        feat = QgsFeature()
+        feat.setGeometry(geom)
+        dp.addFeatures([feat])
+
+        vlayer.updateExtents()
+        vlayer.triggerRepaint()
 
     # ----------------------------------------------------------------------------------------------------------------
     def format_entity_field_name(self, composer_datasource, entity):
@@ -864,23 +1303,40 @@ class DocumentGenerator(QObject):
     def _random_feature_layer_name(self, sp_field):
         return "{0}-{1}".format(sp_field, str(uuid.uuid4())[0:8])
 
-    def _refresh_map_item(self, map_item: QgsLayoutItemMap, use__fixed_scale=False):
+    def _refresh_map_item(self, map_item: QgsLayoutItemMap, use__fixed_scale=False,
+                          extent=None, scale=None):
         """
         Updates the map item with the current extents and layer set in the
-        map canvas.
+        map canvas. The given extent and scale are used in headless mode
+        where there is no map canvas.
         """
+        if self._iface is not None:
+            extent = self._iface.mapCanvas().extent()
+            scale = self._iface.mapCanvas().scale()
+
         tree_layers = QgsProject.instance().layerTreeRoot().findLayers() # QList<QgsLayerTreeLayer>
         if len(tree_layers) > 0:
             layers = [tree_layers[0].layer()]
             print('LAYER: ', tree_layers[0].layer())
             #map_item.setLayers(tree_layers[0].layer())
             map_item.setLayers(layers)
-            map_item.zoomToExtent(self._iface.mapCanvas().extent())
+            if extent is not None:
+                map_item.zoomToExtent(extent)
 
-        # If use_scale is True then set NewScale based on that of the
+        # If use_scale is True then set the scale based on that of the
         # map renderer.
-        if use__fixed_scale:
-            map_item.setNewScale(self._iface.mapCanvas().scale())
+        if use__fixed_scale and scale is not None:
+            map_item.setScale(scale)
+
+    def _point_extent(self, bbox, layer: QgsVectorLayer):
+        """
+        Buffers the extent of a point feature since the canvas extent
+        cannot be used in headless mode.
+        """
+        buffer = 0.0005 if layer.crs().isGeographic() else 50
+        bbox.grow(buffer)
+
+        return bbox
 
     def _refresh_composer_maps(self, composition, ignore_ids):
         """
@@ -897,6 +1353,7 @@ class DocumentGenerator(QObject):
         Clears all memory map layers that were
         used to create the composition.
         """
+        self._spatial_field_layers = {}
         self._clear_layers(self._map_memory_layers)
 
     def clear_temporary_table_layers(self):
@@ -916,7 +1373,7 @@ class DocumentGenerator(QObject):
         if layers is None:
             return
         try:
-            for lyr_id in layers:
+            for lyr_id in list(layers):
                 self.map_registry.removeMapLayer(lyr_id)
                 layers.remove(lyr_id)
 
@@ -933,6 +1390,9 @@ class DocumentGenerator(QObject):
         :return: None
         :rtype: NoneType
         """
+        if self._iface is None:
+            return
+
         self._iface.layerTreeView().setLayerVisible(
             layer, False
         )
@@ -998,7 +1458,7 @@ class DocumentGenerator(QObject):
             return
 
         for conf in config_collection.items().values():
-            table_handler = conf.create_handler(composition, self._exec_query)
+            table_handler = conf.create_handler(composition, self._query)
             table_handler.set_data_source_record(record)
 
     def _generate_charts(self, composition, config_collection, record):
@@ -1020,7 +1480,7 @@ class DocumentGenerator(QObject):
         chart_configs = list(config_collection.values())
 
         for cc in chart_configs:
-            chart_handler = cc.create_handler(composition,  self._exec_query)
+            chart_handler = cc.create_handler(composition, self._query)
             chart_handler.set_data_source_record(record)
 
     def _generate_qr_codes(self, composition, config_collection, record):
@@ -1042,7 +1502,7 @@ class DocumentGenerator(QObject):
         qrc_configs = list(config_collection.items().values())
 
         for qrc in qrc_configs:
-            qrc_handler = qrc.create_handler(composition, self._exec_query)
+            qrc_handler = qrc.create_handler(composition, self._query)
             qrc_handler.set_data_source_record(record)
 
     def _extract_photo_info(self, composition: QgsPrintLayout,
@@ -1087,7 +1547,7 @@ class DocumentGenerator(QObject):
             document_parent_table = photo_doc_entity.parent_entity.name
 
             # Get id of base photo
-            alchemy_table, results = self._exec_query(
+            alchemy_table, results = self._query(
                 photo_tb,
                 referencing_column,
                 getattr(record, referenced_column, '')
@@ -1113,7 +1573,7 @@ class DocumentGenerator(QObject):
                     continue
 
             for r in results:
-                base_ph_table, doc_results = self._exec_query(
+                base_ph_table, doc_results = self._query(
                     supporting_doc_base,
                     'id',
                     r.supporting_doc_id
@@ -1189,6 +1649,9 @@ class DocumentGenerator(QObject):
         self._feature_ids.append(feat.id())
         vlayer.updateExtents()
 
+        if self._iface is None:
+            return geom.boundingBox()
+
         highlight = QgsHighlight(self._iface.mapCanvas(), geom, vlayer)
         highlight.setFillColor(selection_color())
         highlight.setWidth(4)
@@ -1230,12 +1693,15 @@ class DocumentGenerator(QObject):
         return  export_result
 
     def _build_file_name(self, data_source, fieldName, fieldValue, data_fields,
-                         fileExtension) -> str:
+                         fileExtension, record=None) -> str:
         """
         Build a file name based on the values of the specified data fields.
+        The record is queried from the data source if it is not specified.
         """
-
-        table, results = self._exec_query(data_source, fieldName, fieldValue)
+        if record is not None:
+            results = [record]
+        else:
+            table, results = self._exec_query(data_source, fieldName, fieldValue)
 
         if len(results) > 0:
             rec = results[0]
@@ -1267,8 +1733,7 @@ class DocumentGenerator(QObject):
         query parameters.
         Returns a tuple containing the reflected table and results of the query.
         """
-        meta = MetaData(bind=STDMDb.instance().engine)
-        dsTable = Table(dataSourceName, meta, autoload=True)
+        dsTable = self._reflect_table(dataSourceName)
         try:
             if not query_field and not query_value:
                 # Return all the rows; this is currently limited to 100 rows
@@ -1286,6 +1751,59 @@ class DocumentGenerator(QObject):
             self._dbSession.rollback()
             raise ex
 
+    def _reflect_table(self, dataSourceName) -> Table:
+        """
+        Reflects the data source table or view. The reflected table is
+        reused by subsequent queries of the same generator.
+        """
+        dsTable = self._ds_tables.get(dataSourceName, None)
+
+        if dsTable is None:
+            meta = MetaData(bind=STDMDb.instance().engine)
+            dsTable = Table(dataSourceName, meta, autoload=True)
+            self._ds_tables[dataSourceName] = dsTable
+
+        return dsTable
+
+    def _exec_query_in(self, dataSourceName, query_field: str, query_values: list,
+                       spatial_fields=None) -> list:
+        """
+        Returns the rows in the data source whose query field value is in
+        the list of query values. The values are sent in chunks of
+        QUERY_CHUNK_SIZE items. The WKB and bounding box of the given
+        spatial fields are included in each row, see _geometry_label.
+        """
+        dsTable = self._reflect_table(dataSourceName)
+        column = dsTable.c[query_field]
+
+        columns = [dsTable]
+        for sp_field in spatial_fields or []:
+            if sp_field not in dsTable.c:
+                continue
+
+            geom_col = dsTable.c[sp_field]
+            columns.extend([
+                func.ST_AsBinary(geom_col).label(_geometry_label(sp_field, 'wkb')),
+                func.ST_XMin(geom_col).label(_geometry_label(sp_field, 'xmin')),
+                func.ST_YMin(geom_col).label(_geometry_label(sp_field, 'ymin')),
+                func.ST_XMax(geom_col).label(_geometry_label(sp_field, 'xmax')),
+                func.ST_YMax(geom_col).label(_geometry_label(sp_field, 'ymax'))
+            ])
+
+        query_values = list(query_values)
+        results = []
+        try:
+            for i in range(0, len(query_values), QUERY_CHUNK_SIZE):
+                chunk = query_values[i:i + QUERY_CHUNK_SIZE]
+                results.extend(
+                    self._dbSession.query(*columns).filter(column.in_(chunk)).all()
+                )
+
+            return results
+        except SQLAlchemyError as ex:
+            self._dbSession.rollback()
+            raise ex
+
     def _composer_output_path(self) -> str:
         """
         Returns the directory name of the composer output directory.
@@ -0,0 +1,517 @@
+"""
+/***************************************************************************
+Name                 : Parallel Document Generator
+Description          : Renders documents from a template in several worker
+                       processes, each with its own QGIS application and
+                       database connection.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import traceback
+from collections import defaultdict
+
+from stdm.utils.logging_handlers import (
+    EventLogger,
+    FileHandler,
+    StdOutHandler
+)
+
+# Number of entity values sent to a worker in each work item
+WORK_ITEM_SIZE = 50
+
+# Number of times a document is rendered before it is reported as failed
+MAX_ATTEMPTS = 2
+
+# Seconds to wait for a result before checking if the workers are alive
+_RESULT_TIMEOUT = 0.5
+
+# Message types sent by the workers
+_RESULT = 'result'
+_READY = 'ready'
+_FATAL = 'fatal'
+
+_INVALID_FILE_CHARS_RX = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def document_file_name(prefix, entity_value, index, extension):
+    """
+    Builds the name of an output document. The name only depends on the
+    entity value and the index of the data source record hence it does not
+    change with the number of workers or the order in which the documents
+    are rendered.
+    :param prefix: Prefix of the file name, usually the data source name.
+    :type prefix: str
+    :param entity_value: Value of the entity record e.g. the id.
+    :type entity_value: object
+    :param index: Index of the data source record among those matching the
+    entity value. The index is omitted from the name for the first record.
+    :type index: int
+    :param extension: File extension without the dot.
+    :type extension: str
+    :return: Returns the file name.
+    :rtype: str
+    """
+    name = '{0}_{1}'.format(prefix, entity_value)
+    if index > 0:
+        name = '{0}_{1}'.format(name, index)
+
+    name = _INVALID_FILE_CHARS_RX.sub('_', name).strip('_')
+
+    return '{0}.{1}'.format(name, extension)
+
+
+def python_executable():
+    """
+    :return: Returns the path of the Python interpreter used to start the
+    worker processes. Within QGIS, sys.executable may point to the QGIS
+    executable rather than Python.
+    :rtype: str
+    """
+    exe = sys.executable
+    if exe and os.path.basename(exe).lower().startswith('python'):
+        return exe
+
+    if sys.platform.startswith('win32'):
+        candidate = os.path.join(sys.exec_prefix, 'python.exe')
+    else:
+        candidate = os.path.join(
+            sys.exec_prefix,
+            'bin',
+            'python{0}'.format(sys.version_info[0])
+        )
+
+    if os.path.exists(candidate):
+        return candidate
+
+    return exe
+
+
+def _init_worker(settings):
+    """
+    Initializes the QGIS application, STDM layout items, database
+    connection and configuration in a worker process.
+    :return: Returns the QGIS application.
+    :rtype: QgsApplication
+    """
+    from qgis.core import QgsApplication
+
+    app = QgsApplication([], False, settings['settings_dir'])
+    QgsApplication.setPrefixPath(settings['prefix_path'], True)
+    app.initQgis()
+
+    from stdm.composer.custom_layout_items import StdmCustomLayoutItems
+    from stdm.data import globals
+    from stdm.data.connection import DatabaseConnection
+    from stdm.data.database import STDMDb
+    from stdm.security.user import User
+    from stdm.settings.config_serializer import ConfigurationFileSerializer
+
+    StdmCustomLayoutItems.add_custom_item_types()
+
+    db_conn = DatabaseConnection(
+        settings['host'],
+        settings['port'],
+        settings['database']
+    )
+    db_conn.User = User(settings['user'], settings['password'])
+    globals.APP_DBCONN = db_conn
+    STDMDb.instance()
+
+    ConfigurationFileSerializer(settings['config_path']).load()
+
+    return app
+
+
+def _render_work_item(generator, settings, values, result_queue, logger):
+    """
+    Renders the documents of the given entity values. Documents that fail
+    are retried up to MAX_ATTEMPTS times. A result is sent for each value.
+    """
+    def file_path(entity_value, index):
+        file_name = document_file_name(
+            settings['file_prefix'],
+            entity_value,
+            index,
+            settings['file_extension']
+        )
+
+        return '{0}/{1}'.format(settings['output_dir'], file_name)
+
+    # Files are named using the data fields as in the document generator
+    # dialog, otherwise using document_file_name.
+    data_fields = settings['data_fields']
+    file_path_resolver = None if data_fields else file_path
+
+    attempts = defaultdict(int)
+    pending = list(values)
+
+    while len(pending) > 0:
+        retry = []
+        reported = set()
+
+        try:
+            batch = generator.run_batch(
+                settings['template_path'],
+                pending,
+                settings['output_mode'],
+                dataFields=data_fields,
+                fileExtension=settings['file_extension'],
+                data_source=settings['data_source'],
+                file_path_resolver=file_path_resolver
+            )
+
+            for entity_value, status, msg in batch:
+                # Template or data source error, applies to all the values
+                if entity_value is None:
+                    for v in pending:
+                        result_queue.put((_RESULT, v, False, msg))
+
+                    return
+
+                reported.add(entity_value)
+
+                # Skipped values are not retried
+                if status is None or status:
+                    result_queue.put((_RESULT, entity_value, status, msg))
+
+                    continue
+
+                attempts[entity_value] += 1
+                logger.log_error(
+                    'Attempt {0} for {1} failed: {2}'.format(
+                        attempts[entity_value], entity_value, msg
+                    )
+                )
+
+                if attempts[entity_value] < MAX_ATTEMPTS:
+                    retry.append(entity_value)
+                else:
+                    result_queue.put((_RESULT, entity_value, False, msg))
+
+            generator.clear_temporary_layers()
+
+        except Exception as ex:
+            generator.clear_temporary_layers()
+
+            # Discard the failed transaction, if any, before retrying
+            from stdm.data.database import STDMDb
+            STDMDb.instance().session.rollback()
+
+            msg = str(ex)
+
+            # The exception was raised while rendering the first value that
+            # has not been reported.
+            remaining = [v for v in pending if v not in reported]
+            if len(remaining) == 0:
+                # Raised after all the values were reported
+                logger.log_error(
+                    'Batch failed after rendering: {0}\n{1}'.format(
+                        msg, traceback.format_exc()
+                    )
+                )
+                pending = retry
+
+                continue
+
+            current = remaining.pop(0)
+            attempts[current] += 1
+
+            logger.log_error(
+                'Attempt {0} for {1} failed: {2}\n{3}'.format(
+                    attempts[current], current, msg, traceback.format_exc()
+                )
+            )
+
+            if attempts[current] < MAX_ATTEMPTS:
+                retry.append(current)
+            else:
+                result_queue.put((_RESULT, current, False, msg))
+
+            retry.extend(remaining)
+
+        pending = retry
+
+
+def _render_worker(settings, work_queue, result_queue, cancel_event):
+    """
+    Entry point of the worker processes. Work items are taken from the work
+    queue until a None item is received or the run is canceled.
+    """
+    logger = _make_event_logger(settings['log_mode'])
+
+    try:
+        app = _init_worker(settings)
+
+        from stdm.composer.document_generator import DocumentGenerator
+
+        generator = DocumentGenerator(None)
+    except Exception as ex:
+        logger.log_error(
+            'Worker {0} could not be initialized: {1}\n{2}'.format(
+                os.getpid(), ex, traceback.format_exc()
+            )
+        )
+        result_queue.put((_FATAL, None, False, str(ex)))
+
+        return
+
+    result_queue.put((_READY, None, True, ''))
+
+    while not cancel_event.is_set():
+        values = work_queue.get()
+        if values is None:
+            break
+
+        _render_work_item(generator, settings, values, result_queue, logger)
+
+    generator.clear_temporary_layers()
+    app.exitQgis()
+
+
+def _make_event_logger(log_mode):
+    if log_mode == 'STDOUT':
+        return EventLogger(handler=StdOutHandler)
+
+    return EventLogger(handler=FileHandler.init_logger('docgenerator'))
+
+
+class ParallelDocumentGenerator:
+    """
+    Generates the documents of a list of entity records in several worker
+    processes without blocking QGIS. The entity values are split into work
+    items which the workers take from a shared queue, so faster workers
+    process more items. Output files are written to the output directory
+    using document_file_name or, if data fields are specified, named and
+    written to the composer output directory as in DocumentGenerator.
+    Usage:
+        generator = ParallelDocumentGenerator(
+            template_path, output_dir, DocumentGenerator.PDF, 'pdf',
+            'ru_household'
+        )
+        succeeded, failed = generator.run(entity_ids, progress_func)
+    """
+
+    def __init__(self, template_path, output_dir, output_mode, file_extension,
+                 data_source, workers=None, file_prefix=None, data_fields=None):
+        """
+        :param template_path: Path to the document template.
+        :type template_path: str
+        :param output_dir: Directory where the documents will be written.
+        :type output_dir: str
+        :param output_mode: DocumentGenerator.PDF or DocumentGenerator.Image
+        :type output_mode: int
+        :param file_extension: Extension of the output files.
+        :type file_extension: str
+        :param data_source: Name of the entity table whose records will be
+        used to generate the documents.
+        :type data_source: str
+        :param workers: Number of worker processes. Defaults to the number
+        of CPUs less one.
+        :type workers: int
+        :param file_prefix: Prefix of the output file names. Defaults to the
+        data source name.
+        :type file_prefix: str
+        :param data_fields: Columns of the data source whose values are used
+        to name the output files. The files are then written to the composer
+        output directory and output_dir is not used.
+        :type data_fields: list
+        """
+        self.template_path = template_path
+        self.output_dir = output_dir
+        self.output_mode = output_mode
+        self.file_extension = file_extension
+        self.data_source = data_source
+        self.file_prefix = file_prefix or data_source
+        self.data_fields = list(data_fields or [])
+
+        if workers is None:
+            workers = max(1, multiprocessing.cpu_count() - 1)
+        self.workers = max(1, int(workers))
+
+        self._logger = _make_event_logger(self._log_mode())
+
+    @staticmethod
+    def _log_mode():
+        from stdm.settings.registryconfig import (
+            LOG_MODE,
+            registry_value
+        )
+
+        return registry_value(LOG_MODE) or 'FILE'
+
+    def _settings(self):
+        """
+        :return: Returns the picklable settings passed to the workers.
+        :rtype: dict
+        """
+        from qgis.core import QgsApplication
+        from stdm.data import globals
+
+        db_conn = globals.APP_DBCONN
+
+        return {
+            'settings_dir': QgsApplication.qgisSettingsDirPath(),
+            'prefix_path': QgsApplication.prefixPath(),
+            'host': db_conn.Host,
+            'port': db_conn.Port,
+            'database': db_conn.Database,
+            'user': db_conn.User.UserName,
+            'password': db_conn.User.Password,
+            'config_path': '{0}/.stdm/configuration.stc'.format(
+                os.path.expanduser('~')
+            ),
+            'template_path': self.template_path,
+            'output_dir': self.output_dir,
+            'output_mode': self.output_mode,
+            'file_extension': self.file_extension,
+            'file_prefix': self.file_prefix,
+            'data_source': self.data_source,
+            'data_fields': self.data_fields,
+            'log_mode': self._log_mode()
+        }
+
+    def run(self, entity_values, progress_func=None):
+        """
+        Generates the documents and blocks until all the values have been
+        processed, the run is canceled or all the workers have exited.
+        :param entity_values: Ids of the entity records.
+        :type entity_values: list
+        :param progress_func: Function called with the number of processed
+        values, the total, the entity value, status and message whenever a
+        document has been processed. The run is canceled if the function
+        returns False. It is also called with a None entity value while
+        waiting for results so that the UI can be kept responsive.
+        :type progress_func: callable
+        :return: Returns the number of documents generated and a list of
+        tuples containing the entity value and error message of the failed
+        values.
+        :rtype: tuple
+        """
+        entity_values = list(entity_values)
+        total = len(entity_values)
+        if total == 0:
+            return 0, []
+
+        ctx = multiprocessing.get_context('spawn')
+        ctx.set_executable(python_executable())
+
+        work_queue = ctx.Queue()
+        result_queue = ctx.Queue()
+        cancel_event = ctx.Event()
+
+        num_workers = min(self.workers, (total + WORK_ITEM_SIZE - 1) // WORK_ITEM_SIZE)
+
+        for i in range(0, total, WORK_ITEM_SIZE):
+            work_queue.put(entity_values[i:i + WORK_ITEM_SIZE])
+
+        # One sentinel per worker
+        for i in range(num_workers):
+            work_queue.put(None)
+
+        settings = self._settings()
+        processes = [
+            ctx.Process(
+                target=_render_worker,
+                args=(settings, work_queue, result_queue, cancel_event),
+                daemon=True
+            )
+            for i in range(num_workers)
+        ]
+
+        self._logger.log_info(
+            'Generating {0} document(s) using {1} worker(s)...'.format(
+                total, num_workers
+            )
+        )
+
+        for p in processes:
+            p.start()
+
+        processed = 0
+        succeeded = 0
+        skipped = 0
+        failed = []
+        canceled = False
+
+        try:
+            while processed < total:
+                try:
+                    msg_type, entity_value, status, msg = result_queue.get(
+                        timeout=_RESULT_TIMEOUT
+                    )
+                except queue.Empty:
+                    if progress_func is not None and \
+                            progress_func(processed, total, None, True, '') is False:
+                        canceled = True
+                        break
+
+                    # Stop waiting if the workers have exited
+                    if not any([p.is_alive() for p in processes]) and \
+                            result_queue.empty():
+                        break
+
+                    continue
+
+                if msg_type == _FATAL:
+                    self._logger.log_error(
+                        'Document worker failed to start: {0}'.format(msg)
+                    )
+                    continue
+
+                if msg_type == _READY:
+                    continue
+
+                processed += 1
+                if status:
+                    succeeded += 1
+                elif status is None:
+                    skipped += 1
+                else:
+                    failed.append((entity_value, msg))
+                    self._logger.log_error(
+                        'Document for {0} could not be generated: {1}'.format(
+                            entity_value, msg
+                        )
+                    )
+
+                if progress_func is not None and \
+                        progress_func(processed, total, entity_value, status, msg) is False:
+                    canceled = True
+                    break
+
+        finally:
+            cancel_event.set()
+            for p in processes:
+                p.join(timeout=0 if canceled else 5)
+                if p.is_alive():
+                    p.terminate()
+
+        # Values which were not processed because the workers exited
+        if not canceled and processed < total:
+            self._logger.log_error(
+                '{0} document(s) were not processed.'.format(total - processed)
+            )
+
+        self._logger.log_info(
+            'Document generation completed: {0} succeeded, {1} skipped, '
+            '{2} failed.'.format(succeeded, skipped, len(failed))
+        )
+
+        return succeeded, failed
@@ -18,14 +18,26 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import re
+
+from sqlalchemy.sql.expression import text
+
 from stdm.data.configuration import entity_model
+from stdm.data.pg_utils import (
+    _execute,
+    _execute_read,
+    unit_of_work
+)
 from stdm.settings import current_profile
 
 
 class CodeGenerator:
     """
     Generate unique code for a column using prefix, separator and leading zero
-    parameters.
+    parameters. Serial numbers are allocated from a counter, in the
+    code_counter table, for each code prefix and separator so that
+    generating a code does not depend on the number of existing codes and
+    concurrent users never get the same code.
     """
 
     def __init__(self, entity, column):
@@ -48,8 +60,8 @@ class CodeGenerator:
 
     def generate(self, prefix, separator, leading_zero, hide_prefix=False):
         """
-        Generates the next unique code by checking what is saved in the
-        database for a specific column.
+        Generates the next unique code for the given prefix and separator
+        and saves it in the code table.
         :param prefix: The code prefix in front of the serial number.
         :type prefix: String
         :param separator: The separator used to separate code prefixes and
@@ -58,89 +70,129 @@ class CodeGenerator:
         :param leading_zero: The leading zeros to be added in front of
         serial number.
         :type leading_zero: String
+        :param hide_prefix: True to return only the serial number.
+        :type hide_prefix: bool
         :return: Returns the next unique code for the column
         :rtype: String
         """
-        matches = self.search_similar_code(prefix, separator)
-        # matches is list with tuple items.
-        # To access them 0 index is used
-        record_match = []
-
-        for item in matches:
-
-            if len(item) > 0:
-                try:
-                    # for code with prefix
-                    if prefix == item[0].rsplit(separator, 1)[0]:
-                        record_match.append(item[0])
-                    # for serial number code
-                    if prefix == '':
-                        record_match.append(item[0])
-                # if the separator is empty - '', escape the value error
-                # and append.
-                except ValueError:
-                    record_match.append(item[0])
-
-        # if no match found, start with 1
-        if len(record_match) == 0:
-            code = '{0}{1}{2}1'.format(prefix, separator, leading_zero)
-            self.save_code(code)
-            if hide_prefix:
-                code = '{0}1'.format(leading_zero)
-
-            return code
-
-        else:
-            last_serial = None
-
-            if prefix == '':
-                # get the serial number
-                last_serial = record_match[len(record_match) - 1]
-            else:
-                last_code = []
-                # get the serial number
-                try:
-                    last_code = record_match[0].rsplit(separator, 1)
-                    # if the separator is empty - '', split by numbers and letters.
-                    if len(last_code) > 1:
-                        last_serial = last_code[1]
-
-                except ValueError:
-                    if separator == '':
-                        last_serial = record_match[0].replace(prefix, '')
-
-                    else:
-                        prefix_and_serial = record_match[0].split(separator)
-                        if len(prefix_and_serial) > 0:
-                            last_serial = prefix_and_serial[len(prefix_and_serial) - 1]
-
-                    # match = re.match(
-                    #     r'([a-zA-Z]+)([0-9]+)', record_match[0], re.I
-                    # )
-                #     if match:
-                #         text_numbers = match.groups()
-                #         if len(text_numbers) == 2:
-                #             last_code = text_numbers
-                #
-
-            if last_serial is None:
-                return None
-
-            # convert to integer and add 1
-            next_serial = int(last_serial) + 1
-            # Add 1 to append correct number of leading zero at the beginning.
-            leading_zero_len = len(leading_zero) + 1
-            # format again with leading 0
-            formatted_serial = "%0{}d".format(leading_zero_len) % (next_serial,)
-
-            code = '{0}{1}{2}'.format(prefix, separator, formatted_serial)
-            self.save_code(code)
-
-            if hide_prefix:
-                code = formatted_serial
-
-            # add new code with the formatted number
-            return code
+        return self.reserve(
+            prefix, separator, leading_zero, 1, hide_prefix
+        )[0]
+
+    def reserve(self, prefix, separator, leading_zero, count,
+                hide_prefix=False):
+        """
+        Reserves a block of consecutive codes, e.g. for bulk imports, and
+        saves them in the code table.
+        :param prefix: The code prefix in front of the serial number.
+        :type prefix: String
+        :param separator: The separator used to separate code prefixes and
+        serial numbers within a code.
+        :type separator: String
+        :param leading_zero: The leading zeros to be added in front of
+        serial number.
+        :type leading_zero: String
+        :param count: Number of codes to reserve.
+        :type count: int
+        :param hide_prefix: True to return only the serial numbers.
+        :type hide_prefix: bool
+        :return: Returns the reserved codes.
+        :rtype: list
+        """
+        first_serial = self.reserve_serials(prefix, separator, count)
+        # Add 1 to append correct number of leading zero at the beginning.
+        serial_format = '%0{}d'.format(len(leading_zero) + 1)
+
+        serials = [
+            serial_format % (serial,)
+            for serial in range(first_serial, first_serial + count)
+        ]
+        codes = ['{0}{1}{2}'.format(prefix, separator, s) for s in serials]
+        self.save_codes(codes)
+
+        if hide_prefix:
+            return serials
+
+        return codes
+
+    def counter_key(self, prefix, separator):
+        """
+        :return: Returns the key of the counter for the given prefix and
+        separator in the code table of the current profile.
+        :rtype: str
+        """
+        return '{0}:{1}{2}'.format(self.code_entity.name, prefix, separator)
+
+    def reserve_serials(self, prefix, separator, count=1):
+        """
+        Allocates a block of serial numbers from the counter of the given
+        prefix and separator. The counter is created, from the last serial
+        number in the code table, when first used. The counter row stays
+        locked until the allocation is committed.
+        :param prefix: The code prefix in front of the serial number.
+        :type prefix: String
+        :param separator: The separator used to separate code prefixes and
+        serial numbers within a code.
+        :type separator: String
+        :param count: Number of serial numbers to allocate.
+        :type count: int
+        :return: Returns the first serial number in the block.
+        :rtype: int
+        """
+        key = self.counter_key(prefix, separator)
+
+        with unit_of_work():
+            counter = _execute_read(
+                text('SELECT last_value FROM code_counter WHERE key = :key;'),
+                key=key
+            ).first()
+
+            if counter is None:
+                # Concurrent users may both get here but only one insert
+                # succeeds, the other waits for it then does nothing.
+                _execute(
+                    text('INSERT INTO code_counter (key, last_value) '
+                         'VALUES (:key, :seed) ON CONFLICT (key) DO NOTHING;'),
+                    key=key,
+                    seed=self.last_serial(prefix, separator)
+                )
+
+            last_value = _execute(
+                text('UPDATE code_counter SET last_value = last_value + :count '
+                     'WHERE key = :key RETURNING last_value;'),
+                key=key,
+                count=count
+            ).scalar()
+
+        return last_value - count + 1
+
+    def last_serial(self, prefix, separator):
+        """
+        Finds the largest serial number of the codes, in the code table,
+        with the given prefix and separator.
+        :param prefix: The code prefix in front of the serial number.
+        :type prefix: String
+        :param separator: The separator used to separate code prefixes and
+        serial numbers within a code.
+        :type separator: String
+        :return: Returns the largest serial number or 0 if there are no
+        codes.
+        :rtype: int
+        """
+        code_prefix = '{0}{1}'.format(prefix, separator)
+        sql = 'SELECT max(substring(code FROM :start)::numeric) AS serial ' \
+              'FROM "{0}" WHERE code ~ :pattern;'.format(self.code_entity.name)
+
+        result = _execute_read(
+            text(sql),
+            start=len(code_prefix) + 1,
+            pattern='^{0}[0-9]+$'.format(re.escape(code_prefix))
+        ).first()
+
+        if result is None or result['serial'] is None:
+            return 0
+
+        return int(result['serial'])
 
     def save_code(self, code):
         """
@@ -153,25 +205,24 @@ class CodeGenerator:
         self.code_model_obj.code = code
         self.code_model_obj.save()
 
-    def search_similar_code(self, prefix, separator):
+    def save_codes(self, codes):
         """
-        Queries the database on the column to get all the values matching
-        the supplied prefix.
-        :param prefix: The code prefix in front of the serial number.
-        :type prefix: String
-        :param separator: The separator used to separate code prefixes and
-        serial numbers within a code.
-        :type separator: String
-        :return: Matching database result
-        :rtype: SQLAlchemy result proxy
+        Saves the codes to the code table in one go.
+        :param codes: The unique codes generated.
+        :type codes: list
         """
-        column_obj = getattr(self.code_model, 'code')
-        matches = self.code_model_obj.queryObject([column_obj]
-                                                  ).filter(
-            column_obj.op('~')('^{}{}[0-9]'.format(prefix, separator))
-        ).order_by(column_obj.desc()).all()
+        if len(codes) == 1:
+            self.save_code(codes[0])
+            return
+
+        code_objs = []
+        for code in codes:
+            code_obj = self.code_model()
+            code_obj.code = code
+            code_objs.append(code_obj)
+
+        self.code_model_obj.saveMany(code_objs)
 
-        return matches
     #
     # def search_code(self, code):
     #     """
@@ -1,3 +1,5 @@
+import threading
+
 from sqlalchemy import (
     MetaData
 )
@@ -16,6 +18,35 @@ from stdm.data.database import (
     STDMDb
 )
 
+# Registry of mapped classes created by entity_model, keyed by entity name,
+# entity_only and with_supporting_document flags.
+_entity_models = {}
+_entity_models_lock = threading.RLock()
+# Incremented each time the registry is invalidated
+_entity_models_version = 0
+
+
+def entity_models_version():
+    """
+    :return: Returns the version of the mapped classes in the entity model
+    registry. The version changes each time the registry is invalidated.
+    :rtype: int
+    """
+    return _entity_models_version
+
+
+def invalidate_entity_models():
+    """
+    Clears the registry of mapped classes created by entity_model so that
+    the tables are reflected afresh on the next call. This should be called
+    whenever the structure of the entities in the database changes.
+    """
+    global _entity_models_version
+
+    with _entity_models_lock:
+        _entity_models.clear()
+        _entity_models_version += 1
+
 
 def _bind_metadata(metadata):
     # Ensures there is a connectable set in the metadata
@@ -57,13 +88,37 @@ def entity_model(entity, entity_only=False, with_supporting_document=False):
     not be reflected.
     :type entity_only: bool
     :return: An SQLAlchemy model reflected from the table in the database
-    corresponding to the specified entity object.
+    corresponding to the specified entity object. Models are reflected once
+    and reused from the registry until invalidate_entity_models is called.
     """
 
     if entity.TYPE_INFO == 'ENTITY_SUPPORTING_DOCUMENT':
         raise TypeError('<EntitySupportingDocument> type not supported. '
                         'Please use the parent entity.')
 
+    key = (entity.name, entity_only, with_supporting_document)
+
+    with _entity_models_lock:
+        model = _entity_models.get(key, None)
+        if model is not None:
+            return model
+
+        model = _reflect_entity_model(
+            entity,
+            entity_only,
+            with_supporting_document
+        )
+
+        # Do not register models whose tables do not exist yet
+        mapped_cls = model[0] if isinstance(model, tuple) else model
+        if mapped_cls is not None:
+            _entity_models[key] = model
+
+        return model
+
+
+def _reflect_entity_model(entity, entity_only, with_supporting_document):
+    # Reflects the tables and creates the mapped classes for entity_model
     rf_entities = [entity.name]
 
     if not entity_only:
@@ -36,6 +36,7 @@ from sqlalchemy import (
     Index
 )
 from sqlalchemy.engine import reflection
+from sqlalchemy.exc import SQLAlchemyError
 
 from stdm.exceptions import DummyException
 from stdm.data.configuration.db_items import DbItem
@@ -43,6 +44,7 @@ from stdm.data.database import (
     metadata
 )
 from stdm.data.pg_utils import (
+    create_search_index,
     drop_cascade_column
 )
 from . import _bind_metadata
@@ -190,6 +192,19 @@ def _update_col(column, table, data_type, columns):
         except DummyException:
             pass
 
+    # Index searchable text columns for the prefix searches in View STR
+    if column.searchable and column.TYPE_INFO in ('VARCHAR', 'TEXT') and \
+            column.action != DbItem.DROP:
+        try:
+            create_search_index(column.entity.name, column.name)
+        except SQLAlchemyError as db_error:
+            LOGGER.debug(
+                'Search index for %s.%s could not be created: %s',
+                column.entity.name,
+                column.name,
+                str(db_error)
+            )
+
     return alchemy_column
 
 
@@ -26,7 +26,10 @@ from qgis.PyQt.QtCore import (
 from qgis.core import QgsApplication
 from sqlalchemy.exc import SQLAlchemyError
 
-from stdm.data.configuration import profile_foreign_keys
+from stdm.data.configuration import (
+    invalidate_entity_models,
+    profile_foreign_keys
+)
 from stdm.data.configuration.db_items import DbItem
 from stdm.data.configuration.exception import ConfigurationException
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
@@ -34,6 +37,7 @@ from stdm.data.database import (
     metadata,
     STDMDb
 )
+from stdm.data.schema_catalog import SchemaCatalog
 
 LOGGER = logging.getLogger('stdm')
 
@@ -100,6 +104,9 @@ class ConfigurationSchemaUpdater(QObject):
             # Delete removed profile objects
             self._clean_removed_profiles()
 
+            SchemaCatalog.instance().invalidate()
+            invalidate_entity_models()
+
             self.update_completed.emit(True)
 
         except SQLAlchemyError as sae:
@@ -109,6 +116,9 @@ class ConfigurationSchemaUpdater(QObject):
 
             LOGGER.debug(msg)
 
+            SchemaCatalog.instance().invalidate()
+            invalidate_entity_models()
+
             self.update_completed.emit(False)
 
     def _clean_removed_profiles(self):
@@ -158,6 +168,7 @@ class ConfigurationSchemaUpdater(QObject):
                     continue
 
                 status = er.drop_foreign_key_constraint()
+                SchemaCatalog.instance().invalidate()
 
                 if not status:
                     msg = self.tr('Error in removing {0} foreign key '
@@ -207,6 +218,7 @@ class ConfigurationSchemaUpdater(QObject):
         # Create basic STR database view
         try:
             profile.social_tenure.create_view(self.engine)
+            SchemaCatalog.instance().invalidate()
 
         except ConfigurationException as ce:
             msg = str(ce)
@@ -235,6 +247,11 @@ class ConfigurationSchemaUpdater(QObject):
 
                 e.update(self.engine, self.metadata)
 
+                # Tables are created/altered outside pg_utils hence the
+                # schema catalog and entity models have to be reloaded.
+                SchemaCatalog.instance().invalidate()
+                invalidate_entity_models()
+
             QgsApplication.processEvents()
 
     def update_entity_relations(self, profile):
@@ -256,6 +273,7 @@ class ConfigurationSchemaUpdater(QObject):
                     continue
 
                 status = er.create_foreign_key_constraint()
+                SchemaCatalog.instance().invalidate()
                 if not status:
                     msg = self.tr('Error in creating {0} foreign key '
                                   'constraint.'.format(er.name))
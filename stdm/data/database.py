@@ -25,12 +25,15 @@ from collections import (
 )
 
 from sqlalchemy import (
+    BigInteger,
     Column,
     Integer,
     String
 )
 from sqlalchemy import (
     create_engine,
+    DDL,
+    event,
     ForeignKey,
     Table,
     MetaData,
@@ -58,6 +61,14 @@ metadata = MetaData()
 table_registry = defaultdict(set)
 LOGGER = logging.getLogger('stdm')
 
+# Connection pool settings for the STDM engine
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_TIMEOUT = 30
+# Recycle connections after an hour so that server-side idle timeouts do not
+# leave stale connections in the pool.
+POOL_RECYCLE = 3600
+
 
 def mapper(cls, table=None, *args, **kwargs):
     tb_mapper = _mapper(cls, table, *args, **kwargs)
@@ -119,7 +130,15 @@ class STDMDb:
         if globals.APP_DBCONN is None:
             return
 
-        self.engine = create_engine(globals.APP_DBCONN.toAlchemyConnection(), echo=False)
+        self.engine = create_engine(
+            globals.APP_DBCONN.toAlchemyConnection(),
+            echo=False,
+            pool_size=POOL_SIZE,
+            max_overflow=POOL_MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=True
+        )
 
         # Check for PostGIS extension
         self.postgis_state = self._check_spatial_extension()
@@ -128,6 +147,27 @@ class STDMDb:
         self.session = Session()
         self.createMetadata()
 
+    def read_only_connection(self):
+        """
+        :return: Returns a pooled connection which runs each statement in
+        autocommit mode. Use this for catalog lookups and SELECT statements
+        which do not require an explicit transaction.
+        :rtype: Connection
+        """
+        return self.engine.connect().execution_options(
+            isolation_level='AUTOCOMMIT'
+        )
+
+    def dispose(self):
+        """
+        Closes the connections checked into the engine's pool.
+        """
+        if self.session is not None:
+            self.session.close()
+
+        if self.engine is not None:
+            self.engine.dispose()
+
     def createMetadata(self):
         """
         Creates STDM database schema
@@ -350,6 +390,25 @@ content_roles_table = Table("content_roles", Base.metadata,
                             )
 
 
+class CodeCounter(Model, Base):
+    """
+    Last serial number allocated by the auto code generator for each code
+    prefix. Rows are updated atomically so that concurrent users never get
+    the same serial number.
+    """
+    __tablename__ = "code_counter"
+    key = Column(String, primary_key=True)
+    last_value = Column(BigInteger, nullable=False, default=0)
+
+
+# All STDM roles allocate codes hence the counters are shared
+event.listen(
+    CodeCounter.__table__,
+    'after_create',
+    DDL('GRANT SELECT, INSERT, UPDATE ON code_counter TO PUBLIC')
+)
+
+
 class AdminSpatialUnitSet(Model, Base):
     """
     Hierarchy of administrative units.
@@ -0,0 +1,245 @@
+"""
+/***************************************************************************
+Name                 : Display Value Resolver
+Description          : Fetches, in bulk, the display column values of the
+                       records referenced by foreign key columns and keeps
+                       them in a bounded cache shared by the value
+                       formatters of the same parent table.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import (
+    event,
+    inspect
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import text
+
+from stdm.data.pg_utils import _execute_read
+from stdm.data.schema_catalog import SchemaCatalog
+
+LOGGER = logging.getLogger('stdm')
+
+# Maximum number of records whose display values are cached per table
+DISPLAY_CACHE_SIZE = 10000
+
+# Maximum number of ids in each query
+RESOLVE_CHUNK_SIZE = 1000
+
+_resolvers = {}
+_resolvers_lock = threading.RLock()
+
+
+def _quote(identifier):
+    return '"{0}"'.format(identifier.replace('"', '""'))
+
+
+class DisplayValueResolver:
+    """
+    Resolves the ids of the records in a table to the values of their
+    display columns. Ids which are not in the cache are fetched together
+    in one 'id = ANY(...)' query and the least recently used records are
+    evicted once the cache is full.
+    """
+
+    def __init__(self, table_name, columns, cache_size=DISPLAY_CACHE_SIZE):
+        """
+        :param table_name: Name of the table containing the records.
+        :type table_name: str
+        :param columns: Names of the display columns.
+        :type columns: list
+        :param cache_size: Maximum number of records in the cache.
+        :type cache_size: int
+        """
+        self._table_name = table_name
+        self._columns = []
+        self._cache_size = max(1, int(cache_size))
+        self._lock = threading.RLock()
+        # {id: {column: value}} or {id: None} for missing records
+        self._cache = OrderedDict()
+
+        self.add_columns(columns)
+
+    @property
+    def table_name(self):
+        """
+        :return: Returns the name of the table containing the records.
+        :rtype: str
+        """
+        return self._table_name
+
+    @property
+    def columns(self):
+        """
+        :return: Returns the names of the display columns.
+        :rtype: list
+        """
+        return list(self._columns)
+
+    def add_columns(self, columns):
+        """
+        Adds display columns to those fetched by the resolver. The cache is
+        cleared if any of the columns is new.
+        :param columns: Names of the display columns.
+        :type columns: list
+        """
+        with self._lock:
+            new_columns = [c for c in columns if c not in self._columns]
+            if len(new_columns) > 0:
+                self._columns.extend(new_columns)
+                self._cache.clear()
+
+    def clear(self, ids=None):
+        """
+        Removes the records with the given ids, or all the records if no
+        ids are specified, from the cache.
+        :param ids: Ids of the records.
+        :type ids: list
+        """
+        with self._lock:
+            if ids is None:
+                self._cache.clear()
+            else:
+                for record_id in ids:
+                    self._cache.pop(record_id, None)
+
+    def _query_columns(self):
+        # Only query the display columns which exist in the table
+        table_columns = SchemaCatalog.instance().column_names(self._table_name)
+        if len(table_columns) == 0:
+            return list(self._columns)
+
+        return [c for c in self._columns if c in table_columns and c != 'id']
+
+    def _fetch(self, ids):
+        columns = self._query_columns()
+        sql = 'SELECT {0} FROM {1} WHERE id = ANY(:ids)'.format(
+            ', '.join(['id'] + [_quote(c) for c in columns]),
+            _quote(self._table_name)
+        )
+
+        records = {}
+        for i in range(0, len(ids), RESOLVE_CHUNK_SIZE):
+            chunk = ids[i:i + RESOLVE_CHUNK_SIZE]
+            for r in _execute_read(text(sql), ids=chunk):
+                records[r['id']] = dict(r.items())
+
+        return records
+
+    def resolve(self, ids):
+        """
+        Fetches the display values of the records with the given ids which
+        are not in the cache.
+        :param ids: Ids of the records.
+        :type ids: list
+        :return: Returns the display values, indexed by column name, of
+        each record or None if the record does not exist.
+        :rtype: dict
+        """
+        ids = set([i for i in ids if i is not None])
+
+        with self._lock:
+            missing = [i for i in ids if i not in self._cache]
+            if len(missing) > 0:
+                try:
+                    records = self._fetch(missing)
+                except Exception as ex:
+                    LOGGER.debug(
+                        'Display values of %s could not be fetched: %s',
+                        self._table_name,
+                        str(ex)
+                    )
+                    records = {}
+
+                for record_id in missing:
+                    self._cache[record_id] = records.get(record_id, None)
+
+            values = {}
+            for record_id in ids:
+                self._cache.move_to_end(record_id)
+                values[record_id] = self._cache[record_id]
+
+            while len(self._cache) > max(self._cache_size, len(ids)):
+                self._cache.popitem(last=False)
+
+        return values
+
+    def record(self, record_id):
+        """
+        :param record_id: Id of the record.
+        :type record_id: int
+        :return: Returns the display values, indexed by column name, of the
+        record with the given id or None if it does not exist.
+        :rtype: dict
+        """
+        return self.resolve([record_id]).get(record_id, None)
+
+
+def display_value_resolver(table_name, columns):
+    """
+    Returns the resolver shared by the formatters of the given table.
+    :param table_name: Name of the table containing the records.
+    :type table_name: str
+    :param columns: Names of the display columns required by the caller.
+    :type columns: list
+    :return: Display value resolver.
+    :rtype: DisplayValueResolver
+    """
+    with _resolvers_lock:
+        resolver = _resolvers.get(table_name, None)
+        if resolver is None:
+            resolver = DisplayValueResolver(table_name, columns)
+            _resolvers[table_name] = resolver
+        else:
+            resolver.add_columns(columns)
+
+        return resolver
+
+
+def invalidate_display_values(table_name=None):
+    """
+    Clears the cached display values of the given table or of all tables
+    if no table is specified.
+    :param table_name: Name of the table.
+    :type table_name: str
+    """
+    with _resolvers_lock:
+        if table_name is None:
+            resolvers = list(_resolvers.values())
+        else:
+            resolvers = [r for t, r in _resolvers.items() if t == table_name]
+
+    for resolver in resolvers:
+        resolver.clear()
+
+
+def _on_after_flush(session, flush_context):
+    # Discards the cached display values of the records being changed
+    if len(_resolvers) == 0:
+        return
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(inspect(obj).mapper.local_table, 'name', None)
+        resolver = _resolvers.get(table, None)
+        if resolver is not None:
+            resolver.clear([getattr(obj, 'id', None)])
+
+
+if not event.contains(Session, 'after_flush', _on_after_flush):
+    event.listen(Session, 'after_flush', _on_after_flush)
@@ -7,8 +7,3 @@ APP_DBCONN = None
 Registry of entity formatters
 """
 ENTITY_FORMATTERS = {}
-
-"""
-Entity table model
-"""
-ENTITY_TABLE_MODEL = {}
@@ -0,0 +1,282 @@
+"""
+/***************************************************************************
+Name                 : Bulk Import
+Description          : Streams rows into a database table in batches using
+                       PostgreSQL's COPY command via a staging table.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import io
+import logging
+import struct
+from collections import OrderedDict
+from datetime import (
+    date,
+    datetime
+)
+
+from stdm.data.database import STDMDb
+
+LOGGER = logging.getLogger('stdm')
+
+# Number of rows sent to the database in each COPY/commit cycle
+BULK_BATCH_SIZE = 5000
+
+# EWKB flag indicating that an SRID follows the geometry type
+_EWKB_SRID_FLAG = 0x20000000
+
+
+class _ColumnDefault:
+    def __repr__(self):
+        return 'COLUMN_DEFAULT'
+
+
+# Row value of a column which is left out of the insert so that the column
+# default applies, as for the attributes that are not set on a model object
+COLUMN_DEFAULT = _ColumnDefault()
+
+
+def ewkb_hex(wkb, srid):
+    """
+    Converts little or big endian WKB, as returned by OGR, to hex-encoded
+    EWKB which embeds the SRID. PostGIS accepts this representation as the
+    text input of a geometry column.
+    :param wkb: Well-known binary representation of the geometry.
+    :type wkb: bytes
+    :param srid: Spatial reference identifier of the geometry.
+    :type srid: int
+    :return: Hex-encoded EWKB.
+    :rtype: str
+    """
+    wkb = bytes(wkb)
+    byte_order = '<' if wkb[0] == 1 else '>'
+    geom_type = struct.unpack(byte_order + 'I', wkb[1:5])[0]
+    ewkb = wkb[0:1] + struct.pack(
+        byte_order + 'II',
+        geom_type | _EWKB_SRID_FLAG,
+        int(srid)
+    ) + wkb[5:]
+
+    return ewkb.hex()
+
+
+def copy_text_value(value):
+    """
+    Formats a Python value for the text format of the COPY command.
+    :param value: Value to format.
+    :type value: object
+    :return: Returns the escaped value or \\N for None.
+    :rtype: str
+    """
+    if value is None:
+        return '\\N'
+
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+
+    return str(value).replace(
+        '\\', '\\\\'
+    ).replace(
+        '\t', '\\t'
+    ).replace(
+        '\n', '\\n'
+    ).replace(
+        '\r', '\\r'
+    )
+
+
+class BulkTableWriter:
+    """
+    Writes rows to a table in batches. Each batch is streamed into a
+    temporary staging table using COPY ... FROM STDIN and then moved to the
+    target table using INSERT ... SELECT before the transaction is committed.
+    Only the current batch is held in memory. Rows are grouped by the
+    columns that are not set to COLUMN_DEFAULT, each group being copied and
+    inserted separately in the same transaction.
+    Usage:
+        with BulkTableWriter('ru_parcel', ['code', 'geom']) as writer:
+            for row in rows:
+                writer.add_row(row)
+    """
+
+    def __init__(self, table_name, columns, batch_size=BULK_BATCH_SIZE):
+        """
+        :param table_name: Name of the target table.
+        :type table_name: str
+        :param columns: Names of the columns in the order in which values
+        will be passed in add_row.
+        :type columns: list
+        :param batch_size: Number of rows to write in each transaction.
+        :type batch_size: int
+        """
+        self._table_name = table_name
+        self._columns = list(columns)
+        self._batch_size = max(1, int(batch_size))
+        self._staging_table = 'stdm_import_{0}'.format(table_name)
+        self._conn = None
+        self._buffers = OrderedDict()
+        self._buffered_rows = 0
+
+        # Number of rows that have been committed to the target table
+        self.committed_rows = 0
+
+    @staticmethod
+    def _quote(identifier):
+        return '"{0}"'.format(identifier.replace('"', '""'))
+
+    def open(self):
+        """
+        Checks out a connection from the pool and creates the staging table.
+        """
+        self._conn = STDMDb.instance().engine.raw_connection()
+
+        cols = ', '.join([self._quote(c) for c in self._columns])
+        cursor = self._conn.cursor()
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS {0} AS SELECT {1} FROM {2} '
+            'WITH NO DATA'.format(
+                self._quote(self._staging_table),
+                cols,
+                self._quote(self._table_name)
+            )
+        )
+        cursor.execute('TRUNCATE {0}'.format(self._quote(self._staging_table)))
+        cursor.close()
+        self._conn.commit()
+
+    def add_row(self, values):
+        """
+        Adds a row to the current batch. The batch is written to the database
+        once it reaches the batch size.
+        :param values: Row values in the same order as the columns. Columns
+        whose value is COLUMN_DEFAULT are set to their default.
+        :type values: list
+        :return: Returns True if the batch was written to the database.
+        :rtype: bool
+        """
+        indices = tuple([
+            i for i, v in enumerate(values) if v is not COLUMN_DEFAULT
+        ])
+
+        buffered = self._buffers.get(indices, None)
+        if buffered is None:
+            buffered = [io.StringIO(), 0]
+            self._buffers[indices] = buffered
+
+        buffer = buffered[0]
+        buffer.write(
+            '\t'.join([copy_text_value(values[i]) for i in indices])
+        )
+        buffer.write('\n')
+        buffered[1] += 1
+        self._buffered_rows += 1
+
+        if self._buffered_rows >= self._batch_size:
+            self.flush()
+
+            return True
+
+        return False
+
+    def flush(self):
+        """
+        Writes the rows in the current batch to the target table and commits
+        the transaction. The transaction is rolled back if an error occurs.
+        """
+        if self._buffered_rows == 0:
+            return
+
+        staging = self._quote(self._staging_table)
+        table = self._quote(self._table_name)
+
+        cursor = self._conn.cursor()
+        try:
+            for indices, (buffer, num_rows) in self._buffers.items():
+                if len(indices) == 0:
+                    for i in range(num_rows):
+                        cursor.execute(
+                            'INSERT INTO {0} DEFAULT VALUES'.format(table)
+                        )
+
+                    continue
+
+                cols = ', '.join(
+                    [self._quote(self._columns[i]) for i in indices]
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY {0} ({1}) FROM STDIN'.format(staging, cols),
+                    buffer
+                )
+                cursor.execute(
+                    'INSERT INTO {0} ({1}) SELECT {1} FROM {2}'.format(
+                        table,
+                        cols,
+                        staging
+                    )
+                )
+                cursor.execute('TRUNCATE {0}'.format(staging))
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+        self.committed_rows += self._buffered_rows
+        self._buffered_rows = 0
+        self._buffers = OrderedDict()
+
+    def close(self):
+        """
+        Drops the staging table and returns the connection to the pool.
+        Rows which have not been flushed are discarded.
+        """
+        if self._conn is None:
+            return
+
+        try:
+            self._conn.rollback()
+            cursor = self._conn.cursor()
+            cursor.execute(
+                'DROP TABLE IF EXISTS {0}'.format(
+                    self._quote(self._staging_table)
+                )
+            )
+            cursor.close()
+            self._conn.commit()
+        except Exception as ex:
+            LOGGER.debug(str(ex))
+        finally:
+            self._conn.close()
+            self._conn = None
+            self._buffers = OrderedDict()
+            self._buffered_rows = 0
+
+    def __enter__(self):
+        self.open()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Write the remaining rows only if there were no errors
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close()
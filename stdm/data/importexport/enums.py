@@ -17,13 +17,14 @@ drivers = {
     "csv": "CSV",
     "tab": "MapInfo File",
     "gpx": "GPX",
-    "dxf": "DXF"
+    "dxf": "DXF",
+    "gpkg": "GPKG"
 }
 
 ogrTypes = {
     "character varying": ogr.OFTString,
-    "bigint": ogr.OFTInteger,
-    "bigserial": ogr.OFTInteger,
+    "bigint": ogr.OFTInteger64,
+    "bigserial": ogr.OFTInteger64,
     "boolean": ogr.OFTString,
     "bytea": ogr.OFTBinary,
     "character": ogr.OFTString,
@@ -18,6 +18,7 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import logging
 from winreg import *
 from datetime import datetime
 
@@ -47,22 +48,140 @@ from stdm.settings import (
 from sqlalchemy.exc import DataError, IntegrityError
 from stdm.data.database import STDMDb
 
+from stdm.data.importexport.bulk_import import (
+    BULK_BATCH_SIZE,
+    COLUMN_DEFAULT,
+    BulkTableWriter,
+    ewkb_hex
+)
 from stdm.data.importexport.value_translators import (
     IgnoreType,
     ValueTranslatorManager
 )
- 
+
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.entity import Entity
 from stdm.data.configuration.exception import ConfigurationException
+from stdm.data.table_model_cache import TableModelCache
 from stdm.ui.sourcedocument import SourceDocumentManager
 
+LOGGER = logging.getLogger('stdm')
+
+_INTEGER_TYPES = ['INT', 'LOOKUP', 'ADMIN_SPATIAL_UNIT', 'FOREIGN_KEY']
+_FK_TYPES = ['LOOKUP', 'ADMIN_SPATIAL_UNIT', 'FOREIGN_KEY']
+
+
+def _is_null_text(value):
+    return isinstance(value, str) and \
+           (not bool(value.strip()) or value.strip().lower() == 'null')
+
+
+def _fix_float(value):
+    if _is_null_text(value):
+        value = None
+
+    try:
+        if value is not None:
+            value = float(value)
+
+    except ValueError:
+        value = None
+
+    return value
+
+
+def _fix_integer(value, is_fk):
+    if _is_null_text(value):
+        value = None
+
+    try:
+        if value is not None:
+            value = int(value)
+            # Zero is not a valid reference to a parent record
+            if value == 0 and is_fk:
+                value = None
+    except ValueError:
+        # TODO show warning to the user that
+        #  some values cannot be converted to integer.
+        value = None
+
+    return value
+
+
+def _fix_percent(value):
+    if _is_null_text(value):
+        value = None
+    if isinstance(value, str) and '%' in value:
+        value = value.replace('%', '')
+
+    return _fix_float(value)
+
+
+def _fix_date(value):
+    if not bool(value) or value.lower() == 'null':
+        value = None
+
+    return value
+
+
+def _fix_yes_no(value):
+    if not isinstance(value, str):
+        return value
+
+    if _is_null_text(value):
+        return None
+
+    bool_value = value.strip().lower()
+    if bool_value in ('yes', 'true'):
+        value = True
+    elif bool_value in ('no', 'false'):
+        value = False
+
+    return value
+
+
+def column_value_converter(column):
+    """
+    Creates the function for fixing empty and wrongly formatted source values
+    for the given column based on its type.
+    :param column: Destination column.
+    :type column: BaseColumn
+    :return: Returns a function which takes the source value and returns the
+    converted value, None if no conversion is required for the column type.
+    :rtype: function
+    """
+    type_info = column.TYPE_INFO
+
+    if type_info == 'DOUBLE':
+        return _fix_float
+
+    if type_info in _INTEGER_TYPES:
+        is_fk = type_info in _FK_TYPES
+
+        return lambda value: _fix_integer(value, is_fk)
+
+    if type_info == 'PERCENT':
+        return _fix_percent
+
+    if type_info in ['DATE', 'DATETIME']:
+        return _fix_date
+
+    if type_info == 'BOOL':
+        return _fix_yes_no
+
+    return None
+
 
 class ImportFeatureException(Exception):
     """
     Raised when an error occurs during feature import
     """
 
+    def __init__(self, msg, imported_count=0):
+        super().__init__(msg)
+        # Number of source rows committed before the error occurred
+        self.imported_count = imported_count
+
 class OGRReader:
     def __init__(self, source_file: str):
         self._ds = ogr.Open(source_file)
@@ -73,6 +192,8 @@ class OGRReader:
         self._mapped_doc_cls = None
         self._current_profile = current_profile()
         self._source_doc_manager = None
+        # Value converters of the destination columns
+        self._converters = {}
 
         self.date_formatter = DateFormatter()
 
@@ -165,17 +286,7 @@ class OGRReader:
         entity = self._data_source_entity(target_table)
 
         if entity.columns[col_name].TYPE_INFO == 'PERCENT':
-            if isinstance(value, str):
-                if not bool(value.strip()) or value.strip().lower() == 'null':
-                    value = None
-            if '%' in value:
-                value = value.replace('%', '')
-            try:
-                if value is not None:
-                    value = float(value)
-
-            except ValueError:
-                value = None
+            value = _fix_percent(value)
 
         return value
 
@@ -192,40 +303,13 @@ class OGRReader:
         :rtype: Any
         """
         entity = self._data_source_entity(target_table)
-        integer_types = ['INT', 'LOOKUP', 'ADMIN_SPATIAL_UNIT',
-                         'FOREIGN_KEY', 'DOUBLE']
-        float_type = ['DOUBLE']
-        int_type = ['INT', 'LOOKUP', 'ADMIN_SPATIAL_UNIT',
-                    'FOREIGN_KEY']
 
         if col_name in entity.columns.keys():
-            if entity.columns[col_name].TYPE_INFO in integer_types:
-                if isinstance(value, str):
-                    if not bool(value.strip()) or value.strip().lower() == 'null':
-                        value = None
-                if entity.columns[col_name].TYPE_INFO in float_type:
-                    try:
-                        if value is not None:
-                            value = float(value)
-
-                    except ValueError:
-                        value = None
-
-                elif entity.columns[col_name].TYPE_INFO in int_type:
-
-                    try:
-                        if value is not None:
-                            value = int(value)
-                            if isinstance(value, int):
-                                if value == 0:
-                                    if entity.columns[col_name].TYPE_INFO in \
-                                            ['LOOKUP', 'ADMIN_SPATIAL_UNIT',
-                                             'FOREIGN_KEY']:
-                                        value = None
-                    except ValueError:
-                        # TODO show warning to the user that
-                        #  some values cannot be converted to integer.
-                        value = None
+            type_info = entity.columns[col_name].TYPE_INFO
+            if type_info == 'DOUBLE':
+                value = _fix_float(value)
+            elif type_info in _INTEGER_TYPES:
+                value = _fix_integer(value, type_info in _FK_TYPES)
 
         return value
 
@@ -243,11 +327,8 @@ class OGRReader:
         """
         entity = self._data_source_entity(target_table)
 
-        date_types = ['DATE', 'DATETIME']
-
-        if entity.columns[col_name].TYPE_INFO in date_types:
-            if not bool(value) or value.lower() == 'null':
-                value = None
+        if entity.columns[col_name].TYPE_INFO in ['DATE', 'DATETIME']:
+            value = _fix_date(value)
 
         return value
 
@@ -264,19 +345,10 @@ class OGRReader:
         :rtype: Any
         """
         entity = self._data_source_entity(target_table)
-        yes_no_types = ['BOOL']
 
-        if entity.columns[col_name].TYPE_INFO in yes_no_types:
-            if not bool(value.strip()) or value.strip().lower() == 'null':
-                value = None
-            elif value.strip().lower() == 'yes':
-                value = True
-            elif value.strip().lower() == 'no':
-                value = False
-            elif value.strip().lower() == 'true':
-                value = True
-            elif value.strip().lower() == 'false':
-                value = False
+        if entity.columns[col_name].TYPE_INFO == 'BOOL':
+            value = _fix_yes_no(value)
+
         return value
 
     def _insertRow(self, target_table, columnValueMapping):
@@ -287,13 +359,11 @@ class OGRReader:
         model_instance = self._mapped_cls()
         for col, value in columnValueMapping.items():
             if hasattr(model_instance, col):
-                # 'documents' is not a column so exclude it.
-                if col != 'documents' and 'collection' not in col:
-                    value = self.auto_fix_float_integer(target_table, col,
-                                                        value)
-                    value = self.auto_fix_percent(target_table, col, value)
-                    value = self.auto_fix_date(target_table, col, value)
-                    value = self.auto_fix_yes_no(target_table, col, value)
+                # 'documents' and collections are not in the converters
+                converter = self._converters.get(col, None)
+                if converter is not None and \
+                        not isinstance(value, IgnoreType):
+                    value = converter(value)
 
                 if not isinstance(value, IgnoreType):
                     setattr(model_instance, col, value)
@@ -309,28 +379,44 @@ class OGRReader:
         :type source_geom_type: String
         :param destination_geom_type: Destination geometry type
         :type destination_geom_type: String
-        :return: WkB geometry and the output layer geometry type.
+        :return: WKT geometry and the output layer geometry type.
         :rtype: Tuple
         """
-        # Convert polygon to multipolygon if the destination table is multi-polygon.
-        if source_geom_type.lower() == 'polygon' and \
-                destination_geom_type.lower() == 'multipolygon':
-            geom_wkb, geom_type = self.to_ogr_multi_type(geom,
-                                                         ogr.wkbMultiPolygon)
+        target_geom = self.to_target_geometry(geom, source_geom_type,
+                                              destination_geom_type)
 
-        elif source_geom_type.lower() == 'linestring' and \
-                destination_geom_type.lower() == 'multilinestring':
-            geom_wkb, geom_type = self.to_ogr_multi_type(geom,
-                                                         ogr.wkbMultiLineString)
+        return target_geom.ExportToWkt(), target_geom.GetGeometryName()
 
-        elif source_geom_type.lower() == 'point' and \
-                destination_geom_type.lower() == 'multipoint':
-            geom_wkb, geom_type = self.to_ogr_multi_type(geom, ogr.wkbMultiPoint)
-        else:
-            geom_wkb = geom.ExportToWkt()
-            geom_type = geom.GetGeometryName()
+    def to_target_geometry(self, geom, source_geom_type, destination_geom_type):
+        """
+        Converts single geometry type to multi type if the destination is multi type.
+        :param geom: The OGR geometry
+        :type geom: OGRGeometry
+        :param source_geom_type: Source geometry type
+        :type source_geom_type: String
+        :param destination_geom_type: Destination geometry type
+        :type destination_geom_type: String
+        :return: The converted geometry or the source geometry if no
+        conversion is required.
+        :rtype: OGRGeometry
+        """
+        multi_types = {
+            ('polygon', 'multipolygon'): ogr.wkbMultiPolygon,
+            ('linestring', 'multilinestring'): ogr.wkbMultiLineString,
+            ('point', 'multipoint'): ogr.wkbMultiPoint
+        }
+        ogr_type = multi_types.get(
+            (source_geom_type.lower(), destination_geom_type.lower()),
+            None
+        )
+
+        if ogr_type is None:
+            return geom
 
-        return geom_wkb, geom_type
+        multi_geom = ogr.Geometry(ogr_type)
+        multi_geom.AddGeometry(geom)
+
+        return multi_geom
 
     def to_ogr_multi_type(self, geom, ogr_type):
         """
@@ -349,7 +435,8 @@ class OGRReader:
         return geom_wkb, geom_type
 
     def featToDb(self, targettable, columnmatch, append, parentdialog,
-                 geomColumn=None, geomCode=-1, translator_manager=None):
+                 geomColumn=None, geomCode=-1, translator_manager=None,
+                 bulk=True, batch_size=BULK_BATCH_SIZE, start_offset=0):
         """
         Performs the data import from the source layer to the STDM database.
         :param targettable: Destination table name
@@ -359,6 +446,17 @@ class OGRReader:
         :param translator_manager: Instance of 'stdm.data.importexport.ValueTranslatorManager'
         containing value translators defined for the destination table columns.
         :type translator_manager: ValueTranslatorManager
+        :param bulk: True to stream the features to the database in batches
+        using COPY. The ORM will be used if the destination entity has
+        supporting documents or multiple select columns.
+        :type bulk: bool
+        :param batch_size: Number of features committed in each batch when
+        bulk is True.
+        :type batch_size: int
+        :param start_offset: Number of source features to skip. Use the
+        'imported_count' of a previous ImportFeatureException to resume
+        an interrupted bulk import.
+        :type start_offset: int
         """
         # Check current profile
         if self._current_profile is None:
@@ -376,167 +474,372 @@ class OGRReader:
         if not append:
             delete_table_data(targettable)
 
-        # Container for mapping column names to their corresponding values
-
         lyr = self.getLayer()
         lyr.ResetReading()
         feat_defn = lyr.GetLayerDefn()
         numFeat = lyr.GetFeatureCount()
 
+        # Set entity for use in translators
+        destination_entity = self._data_source_entity(targettable)
+
+        # Create mapped class only once
+        if self._mapped_cls is None:
+            mapped_cls, mapped_doc_cls = self._get_mapped_class(targettable)
+
+            if mapped_cls is None:
+                msg = QApplication.translate(
+                    "OGRReader",
+                    "Something happened that caused the "
+                    "database table not to be mapped to the "
+                    "corresponding model class. Please contact"
+                    " your system administrator."
+                )
+
+                raise RuntimeError(msg)
+
+            self._mapped_cls = mapped_cls
+            self._mapped_doc_cls = mapped_doc_cls
+
+            # Create source document manager if the entity supports them
+            if destination_entity.supports_documents:
+                self._source_doc_manager = SourceDocumentManager(
+                    destination_entity.supporting_doc,
+                    self._mapped_doc_cls
+                )
+
+        if geomColumn is not None:
+            # Use geometry column SRID in the target table
+            self._geomType, self._targetGeomColSRID = \
+                geometryType(targettable, geomColumn)
+
+        # Compile the value converters of the destination columns once
+        self._converters = {}
+        for c in destination_entity.columns.values():
+            converter = column_value_converter(c)
+            if converter is not None:
+                self._converters[c.name] = converter
+
+        # Resolve the referenced values of the translators in bulk
+        translator_manager.prepare()
+        self._prefetch_translator_values(translator_manager)
+
         # Configure progress dialog
-        init_val = 0
-        progress = QProgressDialog("", "&Cancel", init_val, numFeat,
+        progress = QProgressDialog("", "&Cancel", 0, numFeat,
                                    parentdialog)
         progress.setWindowModality(Qt.WindowModal)
-        lblMsgTemp = "Importing {0} of {1} to STDM..."
 
-        # Set entity for use in translators
-        destination_entity = self._data_source_entity(targettable)
+        try:
+            if bulk and self._supports_bulk_import(destination_entity,
+                                                   columnmatch):
+                self._bulk_feat_to_db(
+                    targettable,
+                    columnmatch,
+                    progress,
+                    geomColumn,
+                    translator_manager,
+                    batch_size,
+                    start_offset
+                )
+            else:
+                self._orm_feat_to_db(
+                    targettable,
+                    columnmatch,
+                    progress,
+                    geomColumn,
+                    translator_manager,
+                    start_offset
+                )
+        finally:
+            progress.setValue(numFeat)
+            progress.close()
+            progress.deleteLater()
+            del progress
+
+            for name, stats in translator_manager.cache_stats().items():
+                hits, misses = stats
+                LOGGER.debug(
+                    '%s translator cache: %s hits, %s misses (%.1f%% hit rate)',
+                    name, hits, misses,
+                    100.0 * hits / (hits + misses) if hits + misses else 0.0
+                )
+
+    def _prefetch_translator_values(self, translator_manager):
+        """
+        Scans the source layer for the distinct values of the columns used
+        by translators which search large referenced tables, and passes them
+        to the translators so that they can be resolved in batches.
+        """
+        translators = [t for t in translator_manager.translators().values()
+                       if t.requires_source_values()]
+
+        if len(translators) == 0:
+            return
+
+        lyr = self.getLayer()
+        lyr.ResetReading()
+        feat_defn = lyr.GetLayerDefn()
+        distinct_values = [{} for _ in translators]
 
         for feat in lyr:
-            column_value_mapping = {}
-            column_count = 0
-            progress.setValue(init_val)
-            progressMsg = lblMsgTemp.format((init_val + 1), numFeat)
-            progress.setLabelText(progressMsg)
+            for translator, values in zip(translators, distinct_values):
+                field_values = self._map_column_values(
+                    feat,
+                    feat_defn,
+                    translator.source_column_names()
+                )
+                values.setdefault(
+                    tuple(sorted(field_values.items())),
+                    field_values
+                )
+
+        lyr.ResetReading()
+
+        for translator, values in zip(translators, distinct_values):
+            translator.prefetch(list(values.values()))
+
+    def _supports_bulk_import(self, destination_entity, columnmatch):
+        """
+        Supporting documents and multiple select values are saved through
+        relationships of the mapped class hence cannot be copied in bulk.
+        """
+        if destination_entity.supports_documents:
+            return False
+
+        for dest_column in columnmatch.values():
+            col_obj = destination_entity.column(dest_column)
+            if col_obj is not None and col_obj.TYPE_INFO == 'MULTIPLE_SELECT':
+                return False
+
+        return True
+
+    def _features(self, progress, start_offset):
+        """
+        Generator for the source features beginning at the given offset.
+        Updates the progress dialog and stops if the user cancels.
+        """
+        lyr = self.getLayer()
+        lyr.ResetReading()
+        numFeat = lyr.GetFeatureCount()
+        lblMsgTemp = "Importing {0} of {1} to STDM..."
+
+        for i, feat in enumerate(lyr):
+            if i < start_offset:
+                continue
 
-            if progress.wasCanceled():
-                break
+            # Refreshing the dialog processes events, limit the frequency
+            if i % 100 == 0:
+                progress.setValue(i)
+                progress.setLabelText(lblMsgTemp.format((i + 1), numFeat))
+
+                if progress.wasCanceled():
+                    break
+
+            yield feat
+
+    def _column_value_mapping(self, feat, feat_defn, columnmatch,
+                              destination_entity, geomColumn,
+                              translator_manager):
+        """
+        Extracts the destination column values from the source feature.
+        :return: Collection of destination column names and corresponding
+        values.
+        :rtype: dict
+        """
+        column_value_mapping = {}
+
+        for f in range(feat_defn.GetFieldCount()):
+            field_defn = feat_defn.GetFieldDefn(f)
+            field_name = field_defn.GetNameRef()
+
+            # Append value only if it has been defined by the user
+            if field_name in columnmatch:
+                dest_column = columnmatch[field_name]
+
+                field_value = feat.GetField(f)
+
+                '''
+                Check if there is a value translator defined for the
+                specified destination column.
+                '''
+                value_translator = translator_manager.translator(dest_column)
+
+                if value_translator is not None:
+                    # Set destination table entity
+                    value_translator.entity = destination_entity
+
+                    source_col_names = value_translator.source_column_names()
+                    field_value_mappings = self._map_column_values(
+                        feat,
+                        feat_defn,
+                        source_col_names
+                    )
+                    # Set source document manager if required
+                    if value_translator.requires_source_document_manager:
+                        value_translator.source_document_manager = self._source_doc_manager
+
+                    field_value = value_translator.referencing_column_value(
+                        field_value_mappings
+                    )
+
+                if not isinstance(field_value, IgnoreType):
+                    # Check column type and rename if multiple select for
+                    # SQLAlchemy compatibility
+                    col_obj = destination_entity.column(dest_column)
+                    if col_obj.TYPE_INFO == 'MULTIPLE_SELECT':
+                        lk_name = col_obj.value_list.name
+                        dest_column = '{0}_collection'.format(lk_name)
+
+                    if col_obj.TYPE_INFO == 'DATE':
+                        if not self.date_formatter.compare_date_format(field_value):
+                            raise ImportFeatureException(
+                                    (f"Date format on your CSV should match system date format."
+                                     f"`{self.date_formatter.system_date_format}`")
+                                    )
+                        else:
+                            field_value = self.date_formatter.to_postgres_format(field_value)
+
+                    column_value_mapping[dest_column] = field_value
+
+                # Set supporting documents
+                if destination_entity.supports_documents:
+                    column_value_mapping['documents'] = \
+                        self._source_doc_manager.model_objects()
+
+        # Only insert geometry if it has been defined by the user
+        if geomColumn is not None:
+            geom = feat.GetGeometryRef()
+            if geom is not None:
+                column_value_mapping[geomColumn] = self._target_geometry(geom)
+
+        return column_value_mapping
+
+    def _target_geometry(self, geom):
+        """
+        Converts the source geometry to the geometry type of the destination
+        column. A TypeError is raised if the types are incompatible.
+        :return: Returns the converted geometry.
+        :rtype: ogr.Geometry
+        """
+        # Check if the geometry types match
+        layerGeomType = geom.GetGeometryName()
+        target_geom = self.to_target_geometry(geom, layerGeomType,
+                                              self._geomType)
+        geom_type = target_geom.GetGeometryName()
+
+        if geom_type.lower() != self._geomType.lower():
+            raise TypeError(
+                "The geometries of the source and destination columns do not match.\n"
+                "Source Geometry Type: {0}, Destination Geometry Type: {1}".format(
+                    geom_type,
+                    self._geomType))
+
+        return target_geom
+
+    def _orm_feat_to_db(self, targettable, columnmatch, progress, geomColumn,
+                        translator_manager, start_offset):
+        # Creates a mapped class instance for each feature and commits once
+        lyr = self.getLayer()
+        feat_defn = lyr.GetLayerDefn()
+        destination_entity = self._data_source_entity(targettable)
 
+        for feat in self._features(progress, start_offset):
             # Reset source document manager for new records
             if destination_entity.supports_documents:
                 if self._source_doc_manager is not None:
                     self._source_doc_manager.reset()
 
-            for f in range(feat_defn.GetFieldCount()):
-                field_defn = feat_defn.GetFieldDefn(f)
-                field_name = field_defn.GetNameRef()
-
-                # Append value only if it has been defined by the user
-                if field_name in columnmatch:
-                    dest_column = columnmatch[field_name]
-
-                    field_value = feat.GetField(f)
-
-                    # Create mapped class only once
-                    if self._mapped_cls is None:
-                        mapped_cls, mapped_doc_cls = self._get_mapped_class(
-                            targettable)
-
-                        if mapped_cls is None:
-                            msg = QApplication.translate(
-                                "OGRReader",
-                                "Something happened that caused the "
-                                "database table not to be mapped to the "
-                                "corresponding model class. Please contact"
-                                " your system administrator."
-                            )
-
-                            raise RuntimeError(msg)
-
-                        self._mapped_cls = mapped_cls
-                        self._mapped_doc_cls = mapped_doc_cls
-
-                        # Create source document manager if the entity supports them
-                        if destination_entity.supports_documents:
-                            self._source_doc_manager = SourceDocumentManager(
-                                destination_entity.supporting_doc,
-                                self._mapped_doc_cls
-                            )
-
-                        if geomColumn is not None:
-                            # Use geometry column SRID in the target table
-                            self._geomType, self._targetGeomColSRID = \
-                                geometryType(targettable, geomColumn)
-
-                    '''
-                    Check if there is a value translator defined for the
-                    specified destination column.
-                    '''
-                    value_translator = translator_manager.translator(dest_column)
-
-                    if value_translator is not None:
-                        # Set destination table entity
-                        value_translator.entity = destination_entity
-
-                        source_col_names = value_translator.source_column_names()
-                        field_value_mappings = self._map_column_values(
-                            feat,
-                            feat_defn,
-                            source_col_names
-                        )
-                        # Set source document manager if required
-                        if value_translator.requires_source_document_manager:
-                            value_translator.source_document_manager = self._source_doc_manager
-
-                        field_value = value_translator.referencing_column_value(
-                            field_value_mappings
-                        )
-
-                    if not isinstance(field_value, IgnoreType):
-                        # Check column type and rename if multiple select for
-                        # SQLAlchemy compatibility
-                        col_obj = destination_entity.column(dest_column)
-                        if col_obj.TYPE_INFO == 'MULTIPLE_SELECT':
-                            lk_name = col_obj.value_list.name
-                            dest_column = '{0}_collection'.format(lk_name)
-
-                        if col_obj.TYPE_INFO == 'DATE':
-                            if not self.date_formatter.compare_date_format(field_value):
-                                raise ImportFeatureException(
-                                        (f"Date format on your CSV should match system date format."
-                                         f"`{self.date_formatter.system_date_format}`")
-                                        )
-                            else:
-                                field_value = self.date_formatter.to_postgres_format(field_value)
-
-                        column_value_mapping[dest_column] = field_value
-
-                    # Set supporting documents
-                    if destination_entity.supports_documents:
-                        column_value_mapping['documents'] = \
-                            self._source_doc_manager.model_objects()
-
-                    column_count += 1
-
-            # Only insert geometry if it has been defined by the user
-            if geomColumn is not None:
-                geom = feat.GetGeometryRef()
-                if geom is not None:
-                    # Check if the geometry types match
-                    layerGeomType = geom.GetGeometryName()
-
-                    # Convert polygon to multipolygon if the destination table is multi-polygon.
-                    geom_wkb, geom_type = self.auto_fix_geom_type(
-                        geom, layerGeomType, self._geomType)
-                    column_value_mapping[geomColumn] = "SRID={0!s};{1}".format(
-                        self._targetGeomColSRID, geom_wkb)
-
-                    if geom_type.lower() != self._geomType.lower():
-                        raise TypeError(
-                            "The geometries of the source and destination columns do not match.\n"
-                            "Source Geometry Type: {0}, Destination Geometry Type: {1}".format(
-                                geom_type,
-                                self._geomType))
+            column_value_mapping = self._column_value_mapping(
+                feat,
+                feat_defn,
+                columnmatch,
+                destination_entity,
+                geomColumn,
+                translator_manager
+            )
+
+            if geomColumn in column_value_mapping:
+                column_value_mapping[geomColumn] = "SRID={0!s};{1}".format(
+                    self._targetGeomColSRID,
+                    column_value_mapping[geomColumn].ExportToWkt()
+                )
 
             # Insert the record
             self._insertRow(targettable, column_value_mapping)
 
-            init_val += 1
-
         try:
             self._dbSession.commit()
         except (DataError, IntegrityError) as e:
             self._dbSession.rollback()
-            progress.close()
-            progress.deleteLater()
-            del progress
-            raise ImportFeatureException(str(e))
+            raise ImportFeatureException(str(e), start_offset)
 
-        progress.setValue(numFeat)
+    def _bulk_feat_to_db(self, targettable, columnmatch, progress, geomColumn,
+                         translator_manager, batch_size, start_offset):
+        # Streams the features to the database in batches using COPY
+        lyr = self.getLayer()
+        feat_defn = lyr.GetLayerDefn()
+        destination_entity = self._data_source_entity(targettable)
+
+        # Destination columns in a fixed order for COPY
+        dest_columns = []
+        for dest_column in columnmatch.values():
+            if dest_column not in dest_columns:
+                dest_columns.append(dest_column)
+        if geomColumn is not None and geomColumn not in dest_columns:
+            dest_columns.append(geomColumn)
+
+        converters = [self._converters.get(c, None) for c in dest_columns]
+        writer = BulkTableWriter(targettable, dest_columns, batch_size)
+
+        try:
+            with writer:
+                for feat in self._features(progress, start_offset):
+                    column_value_mapping = self._column_value_mapping(
+                        feat,
+                        feat_defn,
+                        columnmatch,
+                        destination_entity,
+                        geomColumn,
+                        translator_manager
+                    )
+
+                    row = []
+                    for col, converter in zip(dest_columns, converters):
+                        # Ignored values are not in the mapping, the column
+                        # default applies as in _insertRow
+                        value = column_value_mapping.get(col, COLUMN_DEFAULT)
+
+                        if value is COLUMN_DEFAULT:
+                            row.append(value)
+                            continue
+
+                        if col == geomColumn:
+                            if value is not None:
+                                value = ewkb_hex(
+                                    value.ExportToWkb(),
+                                    self._targetGeomColSRID
+                                )
+                        elif converter is not None:
+                            value = converter(value)
+
+                        row.append(value)
+
+                    writer.add_row(row)
+
+        except ImportFeatureException as ife:
+            ife.imported_count = start_offset + writer.committed_rows
+            raise ife
+
+        except Exception as e:
+            LOGGER.debug(str(e))
+            raise ImportFeatureException(
+                str(e),
+                start_offset + writer.committed_rows
+            )
 
-        progress.deleteLater()
-        del progress
+        finally:
+            # Rows written using COPY bypass the session events
+            if writer.committed_rows > 0:
+                TableModelCache.instance().invalidate_table(targettable)
 
     def _enumeration_column_type(self, column_name, value):
         """
@@ -30,7 +30,7 @@ from qgis.PyQt.QtWidgets import (
     QApplication,
     QVBoxLayout
 )
-from sqlalchemy import func, cast, String
+from sqlalchemy import func, cast, String, tuple_
 from sqlalchemy.schema import (
     Table,
     MetaData
@@ -59,6 +59,34 @@ class IgnoreType:
     pass
 
 
+# Referenced tables with up to this number of rows are loaded in full prior
+# to an import, larger ones are queried for the distinct source values.
+PREFETCH_ROW_LIMIT = 50000
+
+# Maximum number of values in an IN (...) clause when prefetching
+PREFETCH_BATCH_SIZE = 1000
+
+# Placeholders for source values which have no match in the referenced
+# table and those which have not been searched for yet.
+_NO_MATCH = object()
+_NOT_LOADED = object()
+
+
+def _text_key(value):
+    """
+    :return: Returns the text representation of a source value, similar to
+    casting it to a string in the database, for use as a cache key.
+    :rtype: str
+    """
+    if value is None:
+        return None
+
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return str(value)
+
+
 class SourceValueTranslator:
     """
     Abstract class for translating values from one or more columns in the
@@ -71,6 +99,9 @@ class SourceValueTranslator:
     def __init__(self, parent=None):
         self._parent = None
         self._db_session = STDMDb.instance().session
+        self._tables = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
         self.clear()
 
         # Primary entity
@@ -220,6 +251,42 @@ class SourceValueTranslator:
         """
         return False
 
+    def prepare(self):
+        """
+        Called once prior to an import to reset the cached values and
+        counters. Subclasses can use it to prefetch the referenced values.
+        """
+        self._tables = {}
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def requires_source_values(self):
+        """
+        :return: True if the subclass would like to prefetch the referenced
+        values for the distinct source values through 'prefetch', otherwise
+        False (default).
+        :rtype: bool
+        """
+        return False
+
+    def prefetch(self, field_values_list):
+        """
+        Resolves the referenced values for the given source values in bulk.
+        To be implemented by subclasses which require source values.
+        :param field_values_list: Distinct column name-value pairings in the
+        same format passed to 'referencing_column_value'.
+        :type field_values_list: list
+        """
+        pass
+
+    def cache_stats(self):
+        """
+        :return: Number of values resolved from memory (hits) and those that
+        required a database query (misses).
+        :rtype: tuple
+        """
+        return self._cache_hits, self._cache_misses
+
     def referencing_column_value(self, field_values):
         """
         Abstract method to be implemented by subclasses.
@@ -282,9 +349,13 @@ class SourceValueTranslator:
         :param name: Table Name
         :type name: str
         """
-        meta = MetaData(bind=STDMDb.instance().engine)
+        table = self._tables.get(name, None)
+        if table is None:
+            meta = MetaData(bind=STDMDb.instance().engine)
+            table = Table(name, meta, autoload=True)
+            self._tables[name] = table
 
-        return Table(name, meta, autoload=True)
+        return table
 
 
 class ValueTranslatorManager:
@@ -365,6 +436,23 @@ class ValueTranslatorManager:
         if isinstance(translator, SourceValueTranslator):
             self.remove_translator_by_name(translator.name())
 
+    def prepare(self):
+        """
+        Prepares all translators for a new import.
+        """
+        for translator in self._translators.values():
+            translator.prepare()
+
+    def cache_stats(self):
+        """
+        :return: Number of cache hits and misses for each translator.
+        :rtype: dict
+        """
+        return {
+            name: translator.cache_stats()
+            for name, translator in self._translators.items()
+        }
+
 
 class RelatedTableTranslator(SourceValueTranslator):
     """
@@ -375,6 +463,105 @@ class RelatedTableTranslator(SourceValueTranslator):
     def __init__(self):
         SourceValueTranslator.__init__(self)
 
+        # {tuple of text values: output value}
+        self._values = {}
+        # True if all the rows in the referenced table have been loaded
+        self._all_values_loaded = False
+        self._query_cols = None
+
+    def prepare(self):
+        super(RelatedTableTranslator, self).prepare()
+
+        self._values = {}
+        self._all_values_loaded = False
+        self._query_cols = None
+
+        if not self._referenced_table or len(self._query_columns()) == 0:
+            return
+
+        link_table = self._table(self._referenced_table)
+        num_rows = self._db_session.query(func.count()).select_from(
+            link_table
+        ).scalar()
+
+        if num_rows <= PREFETCH_ROW_LIMIT:
+            self._load_values()
+            self._all_values_loaded = True
+
+    def requires_source_values(self):
+        return not self._all_values_loaded
+
+    def _query_columns(self):
+        """
+        :return: Pairs of source and linked table column names whose values
+        are used to search for the record in the linked table.
+        :rtype: list
+        """
+        if self._query_cols is None:
+            link_table_columns = self._table_columns(self._referenced_table)
+            self._query_cols = [
+                (source_col, ref_col)
+                for source_col, ref_col in self._input_referenced_columns.items()
+                if getIndex(link_table_columns, ref_col) != -1
+            ]
+
+        return self._query_cols
+
+    def _value_key(self, field_values):
+        # Tuple of text values of the query columns. An empty tuple is
+        # returned if a value is missing.
+        key = []
+        for source_col, ref_col in self._query_columns():
+            if source_col not in field_values:
+                return ()
+
+            val = _text_key(field_values[source_col])
+            # NULL values never match
+            if val is None:
+                return None
+
+            key.append(val)
+
+        return tuple(key)
+
+    def _load_values(self, keys=None):
+        """
+        Loads the output values from the linked table for the given keys
+        or all the rows if no keys are specified.
+        """
+        link_table = self._table(self._referenced_table)
+        query_cols = [cast(getattr(link_table.c, ref_col), String)
+                      for _, ref_col in self._query_columns()]
+        output_col = getattr(link_table.c, self._output_referenced_column)
+
+        query = self._db_session.query(output_col, *query_cols)
+
+        if keys is not None:
+            if len(query_cols) == 1:
+                query = query.filter(query_cols[0].in_([k[0] for k in keys]))
+            else:
+                query = query.filter(tuple_(*query_cols).in_(keys))
+
+            # Keys without a matching record
+            for k in keys:
+                self._values.setdefault(k, _NO_MATCH)
+
+        for row in query:
+            key = tuple(row[1:])
+            # Mimic first() by retaining the first matching record
+            if self._values.get(key, _NO_MATCH) is _NO_MATCH:
+                self._values[key] = row[0]
+
+    def prefetch(self, field_values_list):
+        keys = []
+        for field_values in field_values_list:
+            key = self._value_key(field_values)
+            if key is not None and key not in self._values:
+                keys.append(key)
+
+        for i in range(0, len(keys), PREFETCH_BATCH_SIZE):
+            self._load_values(keys[i:i + PREFETCH_BATCH_SIZE])
+
     def referencing_column_value(self, field_values):
         """
         Searches a corresponding record from the linked table using one or more
@@ -385,6 +572,31 @@ class RelatedTableTranslator(SourceValueTranslator):
         :return: Value of the referenced column in the linked table.
         :rtype: object
         """
+        key = self._value_key(field_values)
+
+        if key is None:
+            return IgnoreType()
+
+        # Incomplete search criteria, use a single query
+        if len(key) == 0:
+            return self._query_value(field_values)
+
+        value = self._values.get(key, _NOT_LOADED)
+        if value is _NOT_LOADED and not self._all_values_loaded:
+            self._cache_misses += 1
+            self._load_values([key])
+            value = self._values.get(key, _NO_MATCH)
+        else:
+            self._cache_hits += 1
+
+        if value is _NOT_LOADED or value is _NO_MATCH:
+            return IgnoreType()
+
+        return value
+
+    def _query_value(self, field_values):
+        # Searches the record in the linked table using a single query
+        self._cache_misses += 1
         link_table_columns = self._table_columns(self._referenced_table)
 
         query_attrs = {}
@@ -422,6 +634,7 @@ class LookupValueTranslator(RelatedTableTranslator):
 
         self._default_value = kwargs.get('default', '')
         self._lk_value_column = 'value'
+        self._default_id = None
 
     def set_default_value(self, deflt_value):
         self._default_value = deflt_value
@@ -457,28 +670,58 @@ class LookupValueTranslator(RelatedTableTranslator):
 
         # Assume the source column is the first (and only) one in field_values
         source_column = list(field_values.keys())[0]
-        lookup_value = field_values.get(source_column)
-
-        # Create lookup table object
-        lookup_table = self._table(self._referenced_table)
+        lookup_value = _text_key(field_values.get(source_column))
 
-        lk_value_column_obj = getattr(lookup_table.c, self._lk_value_column)
+        if not self._all_values_loaded:
+            self._cache_misses += 1
+            self._load_lookup_values()
+        else:
+            self._cache_hits += 1
 
-        # Get corresponding lookup value record
-        lookup_rec = self._db_session.query(lookup_table).filter(
-            func.lower(lk_value_column_obj) == func.lower(cast(lookup_value, String))
-        ).first()
+        lookup_id = None
+        if lookup_value is not None:
+            lookup_id = self._values.get(lookup_value.lower(), None)
 
         # Use default value if record is empty
-        if lookup_rec is None and self._default_value:
-            lookup_rec = self._db_session.query(lookup_table).filter(
-                lk_value_column_obj == self._default_value
-            ).first()
+        if lookup_id is None and self._default_value:
+            lookup_id = self._default_id
 
-        if lookup_rec is None:
+        if lookup_id is None:
             return IgnoreType()
 
-        return getattr(lookup_rec, 'id', IgnoreType())
+        return lookup_id
+
+    def prepare(self):
+        SourceValueTranslator.prepare(self)
+
+        self._values = {}
+        self._all_values_loaded = False
+        self._default_id = None
+
+    def requires_source_values(self):
+        return False
+
+    def _load_lookup_values(self):
+        # Loads the ids of all the values in the lookup table
+        lookup_table = self._table(self._referenced_table)
+        lk_value_column_obj = getattr(lookup_table.c, self._lk_value_column)
+
+        self._values = {}
+        self._default_id = None
+
+        for lk_id, lk_value in self._db_session.query(
+                lookup_table.c.id, lk_value_column_obj
+        ):
+            if lk_value is None:
+                continue
+
+            # Mimic first() by retaining the first matching record
+            self._values.setdefault(lk_value.lower(), lk_id)
+
+            if lk_value == self._default_value and self._default_id is None:
+                self._default_id = lk_id
+
+        self._all_values_loaded = True
 
 
 class MultipleEnumerationTranslator(SourceValueTranslator):
@@ -494,6 +737,14 @@ class MultipleEnumerationTranslator(SourceValueTranslator):
         # Container for lookup id and corresponding values
         self._lk_up_id_vals = {}
 
+        # Lookup objects indexed by the lower case value
+        self._lk_objs = None
+
+    def prepare(self):
+        super(MultipleEnumerationTranslator, self).prepare()
+
+        self._lk_objs = None
+
     def separator(self):
         """
         :return: The enum separator in the source table's column.
@@ -553,6 +804,19 @@ class MultipleEnumerationTranslator(SourceValueTranslator):
         lk_entity = dest_col_obj.value_list
         lookup_mapped_cls = entity_model(lk_entity)
 
+        # Load all the lookup objects once for case-insensitive searches
+        if self._lk_objs is None:
+            self._cache_misses += 1
+            self._lk_objs = {}
+            for lookup_obj in self._db_session.query(lookup_mapped_cls):
+                if lookup_obj.value is not None:
+                    self._lk_objs.setdefault(
+                        lookup_obj.value.lower(),
+                        lookup_obj
+                    )
+        else:
+            self._cache_hits += 1
+
         # Lookup objects corresponding to the values in the source string
         lk_objs = []
         lk_vals = delimited_source_value.split(self._separator)
@@ -561,11 +825,7 @@ class MultipleEnumerationTranslator(SourceValueTranslator):
         for kv in lk_vals:
             kv = kv.strip()
             if kv:
-                # Get corresponding lookup value object based on a
-                # case-insensitive search
-                lookup_obj = self._db_session.query(lookup_mapped_cls).filter(
-                    func.lower(lookup_mapped_cls.value) == func.lower(kv)
-                ).first()
+                lookup_obj = self._lk_objs.get(kv.lower(), None)
                 if lookup_obj:
                     lk_objs.append(lookup_obj)
 
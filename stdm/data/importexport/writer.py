@@ -6,6 +6,7 @@ about:            Wrapper class for writing PostgreSQL/PostGIS tables to user-de
 """
 
 import datetime
+from decimal import Decimal
 
 from qgis.PyQt.QtCore import (
     QFileInfo,
@@ -23,10 +24,10 @@ from osgeo import osr
 from stdm.exceptions import DummyException
 from stdm.data.pg_utils import (
     columnType,
-    geometryType
-)
-from stdm.settings import (
-    current_profile
+    geometryType,
+    report_filter_count,
+    stream_report_filter,
+    STREAM_FETCH_SIZE
 )
 from stdm.data.importexport.enums import (
     ogrTypes,
@@ -34,6 +35,9 @@ from stdm.data.importexport.enums import (
     drivers
 )
 
+# Number of features written in each OGR transaction
+EXPORT_TRANSACTION_SIZE = 10000
+
 
 class OGRWriter():
     OGR_STRING_TYPE = 4
@@ -50,7 +54,7 @@ class OGRWriter():
     def getDriverName(self):
         # Return the name of the driver derived from the file extension
         fi = QFileInfo(self._targetFile)
-        fileExt = str(fi.suffix())
+        fileExt = str(fi.suffix()).lower()
 
         return drivers[fileExt]
 
@@ -75,8 +79,18 @@ class OGRWriter():
 
         return field_defn
 
-    def db2Feat(self, parent, table, results, columns, geom=""):
-        # Execute the export process
+    def _create_layer(self, table, columns, geom=""):
+        """
+        Creates the data source, the layer and its fields.
+        :param table: Name of the source table or view.
+        :type table: str
+        :param columns: Names of the attribute columns.
+        :type columns: list
+        :param geom: Name of the geometry column, if any.
+        :type geom: str
+        :return: Returns the layer in the new data source.
+        :rtype: ogr.Layer
+        """
         # Create driver
         drv = ogr.GetDriverByName(self.getDriverName())
         if drv is None:
@@ -114,67 +128,188 @@ class OGRWriter():
             if lyr.CreateField(field_defn) != 0:
                 raise Exception("Creating %s field failed" % (c))
 
-        # Add Geometry column to list for referencing in the result set
-        if geom != "":
-            columns.append(geom)
+        return lyr
 
-        featGeom = None
+    @staticmethod
+    def _field_value(value):
+        """
+        Converts a value returned by the database driver to a type that can
+        be passed to ogr.Feature.SetField while retaining numeric values.
+        """
+        if isinstance(value, bool):
+            return str(value)
+
+        if isinstance(value, (int, float, str)):
+            return value
+
+        if isinstance(value, Decimal):
+            return float(value)
+
+        # Dates are written as strings, datetime strings are parsed by OGR
+        return str(value)
+
+    @staticmethod
+    def _feature_geometry(value):
+        """
+        Creates an OGR geometry from WKB or, for backwards compatibility,
+        WKT returned by the database.
+        """
+        if value is None:
+            return None
+
+        if isinstance(value, str):
+            return ogr.CreateGeometryFromWkt(value)
+
+        return ogr.CreateGeometryFromWkb(bytes(value))
+
+    def _write_features(self, parent, lyr, batches, num_feat, num_fields,
+                        has_geom, transaction_size):
+        """
+        Writes the rows to the layer in transactions of transaction_size
+        features. The geometry, if any, is expected in the last column.
+        :param batches: Iterable of lists of rows.
+        :type batches: iterable
+        :return: Returns the number of features written to the layer.
+        :rtype: int
+        """
+        transaction_size = max(1, int(transaction_size))
 
         # Configure progress dialog
         initVal = 0
-        numFeat = results.rowcount
-        progress = QProgressDialog("", "&Cancel", initVal, numFeat, parent)
+        progress = QProgressDialog("", "&Cancel", initVal, num_feat, parent)
         progress.setWindowModality(Qt.WindowModal)
         lblMsgTemp = QApplication.translate(
             'OGRWriter', 'Writing {0} of {1} to file...')
 
-        entity = current_profile().entity_by_name(table)
-        # Iterate the result set
-        for r in results:
-            # Progress dialog
-            progress.setValue(initVal)
-            progressMsg = lblMsgTemp.format(str(initVal + 1), str(numFeat))
-            progress.setLabelText(progressMsg)
-
-            if progress.wasCanceled():
-                break
-
-            # Create OGR Feature
-            feat = ogr.Feature(lyr.GetLayerDefn())
-
-            for i in range(len(columns)):
-                colName = columns[i]
-
-                # Check if its the geometry column in the iteration
-                if colName == geom:
-                    if r[i] is not None:
-                        featGeom = ogr.CreateGeometryFromWkt(r[i])
-                    else:
-                        featGeom = ogr.CreateGeometryFromWkt("")
-
-                    feat.SetGeometry(featGeom)
-
-                else:
-                    field_value = r[i]
-                    feat.SetField(i, str(field_value))
-
-            if lyr.CreateFeature(feat) != 0:
-                progress.close()
-                progress.deleteLater()
-                del progress
-                raise Exception(
-                    "Failed to create feature in %s" % (self._targetFile)
-                )
-
-            if featGeom is not None:
-                featGeom.Destroy()
-
-            feat.Destroy()
-            initVal += 1
-
-        progress.setValue(numFeat)
-        progress.deleteLater()
-        del progress
+        lyr_defn = lyr.GetLayerDefn()
+        # SetFieldNull is only available from GDAL 2.2
+        set_null = hasattr(ogr.Feature, 'SetFieldNull')
+        in_transaction = False
+
+        try:
+            for rows in batches:
+                # Progress dialog
+                progress.setValue(initVal)
+                progressMsg = lblMsgTemp.format(str(initVal + 1), str(num_feat))
+                progress.setLabelText(progressMsg)
+
+                if progress.wasCanceled():
+                    break
+
+                for r in rows:
+                    if not in_transaction:
+                        lyr.StartTransaction()
+                        in_transaction = True
+
+                    # Create OGR Feature
+                    feat = ogr.Feature(lyr_defn)
+
+                    for i in range(num_fields):
+                        field_value = r[i]
+                        if field_value is None:
+                            if set_null:
+                                feat.SetFieldNull(i)
+                        else:
+                            feat.SetField(i, self._field_value(field_value))
+
+                    if has_geom:
+                        featGeom = self._feature_geometry(r[num_fields])
+                        if featGeom is not None:
+                            feat.SetGeometry(featGeom)
+
+                    if lyr.CreateFeature(feat) != 0:
+                        raise Exception(
+                            "Failed to create feature in %s" % (self._targetFile)
+                        )
+
+                    feat = None
+                    initVal += 1
+
+                    if initVal % transaction_size == 0:
+                        lyr.CommitTransaction()
+                        in_transaction = False
+
+            if in_transaction:
+                lyr.CommitTransaction()
+                in_transaction = False
+
+        except Exception:
+            if in_transaction:
+                lyr.RollbackTransaction()
+            raise
+
+        finally:
+            progress.setValue(num_feat)
+            progress.close()
+            progress.deleteLater()
+            del progress
+
+        return initVal
+
+    def export_table(self, parent, table, columns, geom="", where="",
+                     fetch_size=STREAM_FETCH_SIZE,
+                     transaction_size=EXPORT_TRANSACTION_SIZE):
+        """
+        Exports the records in the table, that match the filter, to the
+        target file. Records are read using a server-side cursor and the
+        geometry is transferred as WKB so that memory use stays constant
+        irrespective of the size of the table.
+        :param parent: Parent widget of the progress dialog.
+        :type parent: QWidget
+        :param table: Name of the source table or view.
+        :type table: str
+        :param columns: Names of the attribute columns to export.
+        :type columns: list
+        :param geom: Name of the geometry column, if any.
+        :type geom: str
+        :param where: Filter expression without the WHERE keyword.
+        :type where: str
+        :param fetch_size: Number of rows fetched from the database in each
+        round trip.
+        :type fetch_size: int
+        :param transaction_size: Number of features written in each OGR
+        transaction.
+        :type transaction_size: int
+        :return: Returns the number of features that were exported.
+        :rtype: int
+        """
+        num_feat = report_filter_count(table, where)
+
+        lyr = self._create_layer(table, columns, geom)
+
+        query_cols = list(columns)
+        if geom != "":
+            query_cols.append("ST_AsBinary({0})".format(geom))
+
+        batches = stream_report_filter(
+            table, ",".join(query_cols), where, fetch_size=fetch_size
+        )
+
+        try:
+            return self._write_features(
+                parent, lyr, batches, num_feat, len(columns), geom != "",
+                transaction_size
+            )
+        finally:
+            batches.close()
+            # Flush the data source to disk
+            self._ds = None
+
+    def db2Feat(self, parent, table, results, columns, geom=""):
+        # Execute the export process on a result set which has already
+        # been retrieved. Use export_table for large tables.
+        lyr = self._create_layer(table, columns, geom)
+
+        num_fields = len(columns)
+        # Add Geometry column to list for referencing in the result set
+        if geom != "":
+            columns.append(geom)
+
+        self._write_features(
+            parent, lyr, iter(lambda: results.fetchmany(STREAM_FETCH_SIZE), []),
+            results.rowcount, num_fields, geom != "",
+            EXPORT_TRANSACTION_SIZE
+        )
 
     @staticmethod
     def is_date(string):
@@ -17,6 +17,8 @@ email                : gkahiu@gmail.com
  *                                                                         *
  ***************************************************************************/
 """
+import threading
+from contextlib import contextmanager
 from typing import List
 
 from geoalchemy2 import WKBElement
@@ -40,6 +42,10 @@ from stdm.data.database import (
     STDMDb,
     Base
 )
+from stdm.data.schema_catalog import (
+    is_ddl_statement,
+    SchemaCatalog
+)
 from stdm.exceptions import DummyException
 from stdm.utils.util import (
     getIndex,
@@ -59,19 +65,21 @@ _text_col_types = ["character varying", "text"]
 VIEWS = 2500
 TABLES = 2501
 
+# Number of rows fetched in each round trip by server-side cursors
+STREAM_FETCH_SIZE = 2000
+
+# Holds the connection of the unit of work active in the current thread
+_unit_of_work = threading.local()
+
 
 def spatial_tables(exclude_views=False):
     """
     Returns a list of spatial table names in the STDM database.
     """
-    t = text("select DISTINCT f_table_name from geometry_columns")
-    result = _execute(t)
-
     spTables = []
     views = pg_views()
 
-    for r in result:
-        spTable = r["f_table_name"]
+    for spTable in sorted(SchemaCatalog.instance().spatial_tables()):
         if exclude_views:
             tableIndex = getIndex(views, spTable)
             if tableIndex == -1:
@@ -88,15 +96,9 @@ def pg_tables(schema="public", exclude_lookups=False):
     Views are also excluded. See separate function for retrieving views.
     :rtype: list
     """
-    t = text("SELECT table_name FROM information_schema.tables WHERE table_schema = :tschema and table_type = :tbtype "
-             "ORDER BY table_name ASC")
-    result = _execute(t, tschema=schema, tbtype="BASE TABLE")
-
     pgTables = []
 
-    for r in result:
-        tableName = r["table_name"]
-
+    for tableName in sorted(SchemaCatalog.instance().tables(schema)):
         # Remove default PostGIS tables
         tableIndex = getIndex(_postGISTables, tableName)
         if tableIndex != -1:
@@ -119,16 +121,9 @@ def pg_views(schema="public"):
     """
     Returns the views in the given schema minus the default PostGIS views.
     """
-    t = text("SELECT table_name FROM information_schema.tables WHERE table_schema = :tschema and table_type = :tbtype "
-             "ORDER BY table_name ASC")
-    result = _execute(t, tschema=schema, tbtype="VIEW")
-
     pgViews = []
 
-    for r in result:
-
-        viewName = r["table_name"]
-
+    for viewName in sorted(SchemaCatalog.instance().views(schema)):
         # Remove default PostGIS tables
         viewIndex = getIndex(_postGISViews, viewName)
         if viewIndex == -1:
@@ -152,7 +147,7 @@ def view_details(self, view):
                  'WHERE viewname=:view_name;'
                  )
 
-        result = _execute(t, view_name=view)
+        result = _execute_read(t, view_name=view)
 
         definition = []
         for row in result:
@@ -207,15 +202,15 @@ def pg_table_exists(table_name, include_views=True, schema="public"):
     currently connected database.
     :rtype: bool
     """
-    tables = pg_tables(schema=schema)
-    if include_views:
-        tables.extend(pg_views(schema=schema))
+    catalog = SchemaCatalog.instance()
 
-    if getIndex(tables, table_name) == -1:
-        return False
+    if table_name in catalog.tables(schema):
+        return table_name not in _postGISTables
 
-    else:
-        return True
+    if include_views and table_name in catalog.views(schema):
+        return table_name not in _postGISViews
+
+    return False
 
 
 def pg_table_record_count(table_name):
@@ -228,7 +223,7 @@ def pg_table_record_count(table_name):
     sql_str = "Select COUNT(*) cnt from {0}".format(table_name)
     sql = text(sql_str)
 
-    results = _execute(sql)
+    results = _execute_read(sql)
     for result in results:
         cnt = result['cnt']
 
@@ -255,7 +250,91 @@ def process_report_filter(tableName, columns, whereStr="", sortStmnt=""):
 
     t = text(sql)
 
-    return _execute(t)
+    return _execute_read(t)
+
+
+def report_filter_count(tableName, whereStr=""):
+    """
+    :param tableName: Name of the table or view.
+    :type tableName: str
+    :param whereStr: Optional filter expression without the WHERE keyword.
+    :type whereStr: str
+    :return: Returns the number of records that match the filter.
+    :rtype: int
+    """
+    sql = "SELECT COUNT(*) AS cnt FROM {0}".format(tableName)
+
+    if whereStr != "":
+        sql += " WHERE {0} ".format(whereStr)
+
+    result = _execute_read(text(sql))
+
+    for r in result:
+        return r["cnt"]
+
+    return 0
+
+
+def stream_report_filter(tableName, columns, whereStr="", sortStmnt="",
+                         fetch_size=STREAM_FETCH_SIZE):
+    """
+    Executes the report builder filter using a server-side cursor so that
+    only fetch_size rows are held in memory at any given time.
+    :param tableName: Name of the table or view.
+    :type tableName: str
+    :param columns: Comma separated list of column expressions.
+    :type columns: str
+    :param whereStr: Optional filter expression without the WHERE keyword.
+    :type whereStr: str
+    :param sortStmnt: Optional ORDER BY clause.
+    :type sortStmnt: str
+    :param fetch_size: Number of rows fetched in each round trip.
+    :type fetch_size: int
+    :return: Yields lists of at most fetch_size rows.
+    :rtype: list
+    """
+    sql = "SELECT {0} FROM {1}".format(columns, tableName)
+
+    if whereStr != "":
+        sql += " WHERE {0} ".format(whereStr)
+
+    if sortStmnt != "":
+        sql += sortStmnt
+
+    fetch_size = max(1, int(fetch_size))
+
+    active_conn = _active_connection()
+    if active_conn is not None:
+        result = active_conn.execution_options(
+            stream_results=True
+        ).execute(text(sql))
+        try:
+            rows = result.fetchmany(fetch_size)
+            while rows:
+                yield rows
+                rows = result.fetchmany(fetch_size)
+        finally:
+            result.close()
+
+        return
+
+    # Named cursors have to be declared within a transaction hence the
+    # autocommit connection cannot be used.
+    conn = STDMDb.instance().engine.connect().execution_options(
+        stream_results=True
+    )
+    trans = conn.begin()
+    try:
+        result = conn.execute(text(sql))
+        rows = result.fetchmany(fetch_size)
+        while rows:
+            yield rows
+            rows = result.fetchmany(fetch_size)
+        result.close()
+    finally:
+        # Nothing has been written so there is nothing to commit
+        trans.rollback()
+        conn.close()
 
 
 def export_data(table_name):
@@ -263,7 +342,7 @@ def export_data(table_name):
 
     t = text(sql)
 
-    return _execute(t)
+    return _execute_read(t)
 
 def run_query(query: str):
     t = text(query)
@@ -274,7 +353,7 @@ def fetch_with_filter(sql_str):
 
     t = text(sql)
 
-    return _execute(t)
+    return _execute_read(t)
 
 
 def fetch_from_table(table_name, limit):
@@ -293,7 +372,7 @@ def fetch_from_table(table_name, limit):
 
     t = text(sql)
 
-    return _execute(t)
+    return _execute_read(t)
 
 
 def export_data_from_columns(columns, table_name):
@@ -301,7 +380,7 @@ def export_data_from_columns(columns, table_name):
 
     t = text(sql)
 
-    return _execute(t)
+    return _execute_read(t)
 
 
 def fix_sequence(table_name):
@@ -350,25 +429,14 @@ def table_column_names(tableName, spatialColumns=False, creation_order=False) ->
     If 'spatialColumns' then the function will lookup for spatial columns in the given
     table or view.
     """
-    if spatialColumns:
-        sql = "select f_geometry_column from geometry_columns where f_table_name = :tbname ORDER BY f_geometry_column ASC"
-        columnName = "f_geometry_column"
-    else:
-        if not creation_order:
-            sql = "select column_name from information_schema.columns where table_name = :tbname ORDER BY column_name ASC"
-            columnName = "column_name"
-        else:
-            sql = "select column_name from information_schema.columns where table_name = :tbname"
-            columnName = "column_name"
-
-    t = text(sql)
-    result = _execute(t, tbname=tableName)
+    catalog = SchemaCatalog.instance()
 
-    columnNames = []
+    if spatialColumns:
+        return sorted(catalog.geometry_column_names(tableName))
 
-    for r in result:
-        colName = r[columnName]
-        columnNames.append(colName)
+    columnNames = catalog.column_names(tableName)
+    if not creation_order:
+        columnNames.sort()
 
     return columnNames
 
@@ -408,21 +476,11 @@ def geometryType(tableName, spatialColumnName, schemaName="public"):
     Returns a tuple of geometry type and EPSG code of the given column name in
     the table within the given schema.
     """
-    sql = "select type,srid from geometry_columns where f_table_name = :tbname " \
-          "and f_geometry_column = :spcolumn and f_table_schema = :tbschema"
-    t = text(sql)
-
-    result = _execute(t, tbname=tableName, spcolumn=spatialColumnName, tbschema=schemaName)
-
-    geomType, epsg_code = "", -1
-
-    for r in result:
-        geomType = r["type"]
-        epsg_code = r["srid"]
-
-        break
-
-    return geomType, epsg_code
+    return SchemaCatalog.instance().geometry_type(
+        tableName,
+        spatialColumnName,
+        schemaName
+    )
 
 
 def unique_column_values(tableName, columnName, quoteDataTypes=["character varying"]):
@@ -441,7 +499,7 @@ def unique_column_values(tableName, columnName, quoteDataTypes=["character varyi
 
         sql = "SELECT DISTINCT {0} FROM {1}".format(str(columnName), tableName)
     t = text(sql)
-    result = _execute(t)
+    result = _execute_read(t)
 
     uniqueVals = []
 
@@ -466,36 +524,11 @@ def columnType(tableName, columnName):
     """
     Returns the PostgreSQL data type of the specified column.
     """
-    view = tableName in pg_views()
-    if not view:
-        sql = "SELECT data_type FROM information_schema.columns where table_name='{}' AND column_name='{}'". \
-            format(tableName, columnName)
-    else:
-        # if ' ' in columnName:
-        #     columnName = u'"{}"'.format(columnName)
-        if '"' in columnName:
-            sql = 'SELECT pg_typeof({}) from {} limit 1;'.format(
-                columnName, tableName
-            )
-        else:
-            sql = 'SELECT pg_typeof("{}") from {} limit 1;'.format(
-                columnName, tableName
-            )
-
-    t = text(sql)
-
-    result = _execute(t)
-
-    dataType = ""
-    for r in result:
-        if view:
-            if len(r) > 0:
-                dataType = r[0]
-        else:
-            dataType = r["data_type"]
-
-        break
-    return dataType
+    # Quoted column names are used for views
+    return SchemaCatalog.instance().column_type(
+        tableName,
+        columnName.strip('"')
+    )
 
 
 def columns_by_type(table, data_types):
@@ -575,10 +608,69 @@ def qgsgeometry_from_wkbelement(wkb_element):
     return QgsGeometry.fromWkt(geom_wkt)
 
 
+def _active_connection():
+    """
+    :return: Returns the connection of the unit of work that is active in
+    the current thread, otherwise None.
+    :rtype: Connection
+    """
+    return getattr(_unit_of_work, 'connection', None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Context manager that runs all the statements issued through _execute
+    and _execute_read, within its scope, on a single connection and in one
+    transaction. The transaction is committed on exit or rolled back if an
+    exception is raised. Nested units of work join the outer one.
+    Usage:
+        with unit_of_work():
+            _execute(sql1)
+            _execute(sql2)
+    """
+    conn = _active_connection()
+    if conn is not None:
+        yield conn
+        return
+
+    conn = STDMDb.instance().engine.connect()
+    trans = conn.begin()
+    _unit_of_work.connection = conn
+    _unit_of_work.ddl = False
+
+    try:
+        yield conn
+        trans.commit()
+    except BaseException:
+        trans.rollback()
+        raise
+    finally:
+        _unit_of_work.connection = None
+        conn.close()
+
+        # Reload the catalog from the committed state in case it was read
+        # after the structural changes within the unit of work.
+        if _unit_of_work.ddl:
+            SchemaCatalog.instance().invalidate()
+
+
 def _execute(sql, **kwargs):
     """
     Execute the passed in sql statement
     """
+    # Structural changes render the cached schema catalog stale
+    ddl = is_ddl_statement(sql)
+    if ddl:
+        SchemaCatalog.instance().invalidate()
+
+    active_conn = _active_connection()
+    if active_conn is not None:
+        if ddl:
+            _unit_of_work.ddl = True
+
+        return active_conn.execute(sql, **kwargs)
+
     try:
         conn = STDMDb.instance().engine.connect()
         trans = conn.begin()
@@ -595,6 +687,23 @@ def _execute(sql, **kwargs):
         raise db_error
 
 
+def _execute_read(sql, **kwargs):
+    """
+    Execute the passed in read-only sql statement, such as a catalog lookup
+    or SELECT query, on an autocommit connection hence no explicit
+    transaction is opened.
+    """
+    active_conn = _active_connection()
+    if active_conn is not None:
+        return active_conn.execute(sql, **kwargs)
+
+    conn = STDMDb.instance().read_only_connection()
+    try:
+        return conn.execute(sql, **kwargs)
+    finally:
+        conn.close()
+
+
 def reset_content_roles():
     rolesSet = "truncate table content_base cascade;"
     _execute(text(rolesSet))
@@ -605,25 +714,31 @@ def reset_content_roles():
 def delete_table_keys(table):
     # clean_delete_table(table)
     capabilities = ["Create", "Select", "Update", "Delete"]
-    for action in capabilities:
-        init_key = action + " " + str(table).title()
-        sql = "DELETE FROM content_roles WHERE content_base_id IN" \
-              " (SELECT id FROM content_base WHERE name = '{0}');".format(init_key)
-        sql2 = "DELETE FROM content_base WHERE content_base.id IN" \
-               " (SELECT id FROM content_base WHERE name = '{0}');".format(init_key)
-        r = text(sql)
-        r2 = text(sql2)
-        _execute(r)
-        _execute(r2)
-        Base.metadata._remove_table(table, 'public')
+    with unit_of_work():
+        for action in capabilities:
+            init_key = action + " " + str(table).title()
+            sql = "DELETE FROM content_roles WHERE content_base_id IN" \
+                  " (SELECT id FROM content_base WHERE name = '{0}');".format(init_key)
+            sql2 = "DELETE FROM content_base WHERE content_base.id IN" \
+                   " (SELECT id FROM content_base WHERE name = '{0}');".format(init_key)
+            r = text(sql)
+            r2 = text(sql2)
+            _execute(r)
+            _execute(r2)
+
+    Base.metadata._remove_table(table, 'public')
 
 
 def safely_delete_tables(tables):
+    with unit_of_work():
+        for table in tables:
+            sql = "DROP TABLE  if exists {0} CASCADE".format(table)
+            _execute(text(sql))
+
     for table in tables:
-        sql = "DROP TABLE  if exists {0} CASCADE".format(table)
-        _execute(text(sql))
         Base.metadata._remove_table(table, 'public')
-        flush_session_activity()
+
+    flush_session_activity()
 
 
 def flush_session_activity():
@@ -682,27 +797,6 @@ def foreign_key_parent_tables(table_name, search_parent=True, filter_exp=None):
     name, corresponding foreign column name and constraint name.
     :rtype: list
     """
-    # Check if the view for listing foreign key references exists
-    fk_ref_view = pg_table_exists("foreign_key_references")
-
-    # Create if it does not exist
-    if not fk_ref_view:
-        script_path = PLUGIN_DIR + "/scripts/foreign_key_references.sql"
-
-        script_file = QFile(script_path)
-        if script_file.exists():
-            if not script_file.open(QIODevice.ReadOnly):
-                return None
-
-            reader = QTextStream(script_file)
-            sql = reader.readAll()
-            if sql:
-                t = text(sql)
-                _execute(t)
-
-        else:
-            return None
-
     if search_parent:
         ref_table = "foreign_table_name"
         search_table = "table_name"
@@ -710,17 +804,12 @@ def foreign_key_parent_tables(table_name, search_parent=True, filter_exp=None):
         ref_table = "table_name"
         search_table = "foreign_table_name"
 
-    # Fetch foreign key references
-    sql = "SELECT column_name,{0},foreign_column_name, constraint_name FROM " \
-          "foreign_key_references where {1} =:tb_name".format(ref_table,
-                                                              search_table)
-
-    t = text(sql)
-    result = _execute(t, tb_name=table_name)
-
     fk_refs = []
 
-    for r in result:
+    for r in SchemaCatalog.instance().foreign_keys():
+        if r[search_table] != table_name:
+            continue
+
         rel_table = r[ref_table]
 
         fk_ref = r["column_name"], rel_table, \
@@ -774,13 +863,13 @@ def table_view_dependencies(table_name, column_name=None):
         if sql:
             t = text(sql)
             if column_name is None:
-                result = _execute(
+                result = _execute_read(
                     t,
                     table_name=table_name
                 )
 
             else:
-                result = _execute(
+                result = _execute_read(
                     t,
                     table_name=table_name,
                     column_name=column_name
@@ -941,7 +1030,7 @@ def postgis_exists():
     """
     sql = "SELECT * FROM pg_available_extensions WHERE name='postgis';"
     t = text(sql)
-    results = _execute(t)
+    results = _execute_read(t)
     for result in results:
         if result['name'] == 'postgis':
             return True
@@ -957,6 +1046,64 @@ def create_postgis():
     _execute(t)
 
 
+def trigram_search_available():
+    """
+    Checks if the pg_trgm extension is installed in the STDM database and
+    tries to install it, if it is available, when there is no active unit
+    of work.
+    :return: Returns True if trigram indexes can be created.
+    :rtype: bool
+    """
+    sql = "SELECT name, installed_version FROM pg_available_extensions " \
+          "WHERE name = 'pg_trgm';"
+    results = list(_execute_read(text(sql)))
+    if len(results) == 0:
+        return False
+
+    if results[0]['installed_version'] is not None:
+        return True
+
+    # A failed statement would abort the whole unit of work
+    if _active_connection() is not None:
+        return False
+
+    try:
+        _execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm;'))
+    except SQLAlchemyError:
+        # Most likely the user is not allowed to create extensions
+        return False
+
+    return True
+
+
+def create_search_index(table_name, column_name):
+    """
+    Creates an index for case-insensitive prefix searches i.e.
+    lower(column) LIKE 'prefix%' on a text column. A trigram index is
+    created if the pg_trgm extension is available, otherwise a btree index
+    using the text_pattern_ops operator class.
+    :param table_name: Name of the table.
+    :type table_name: str
+    :param column_name: Name of the text column.
+    :type column_name: str
+    :return: Returns the name of the index.
+    :rtype: str
+    """
+    idx_name = 'idx_{0}_{1}_search'.format(table_name, column_name)
+
+    if trigram_search_available():
+        using = 'gin (lower("{0}") gin_trgm_ops)'.format(column_name)
+    else:
+        using = 'btree (lower("{0}") text_pattern_ops)'.format(column_name)
+
+    sql = 'CREATE INDEX IF NOT EXISTS "{0}" ON "{1}" USING {2};'.format(
+        idx_name, table_name, using
+    )
+    _execute(text(sql))
+
+    return idx_name
+
+
 def profile_sequences(prefix):
     """
     Returns all sequences of a given profile based on the profile prefix.
@@ -966,7 +1113,7 @@ def profile_sequences(prefix):
     :rtype: List
     """
     sql = 'SELECT sequence_name FROM information_schema.sequences;'
-    result = _execute(sql)
+    result = _execute_read(sql)
     profile_sequences = []
     column_name = 'sequence_name'
     for r in result:
@@ -995,24 +1142,25 @@ def set_child_dependencies_null_on_delete(table):
     if deps is None or len(deps) == 0:
         return False
 
-    for d in deps:
-        local_col, fk_table, fk_col, fk_name = d[0], d[1], d[2], d[3]
+    with unit_of_work():
+        for d in deps:
+            local_col, fk_table, fk_col, fk_name = d[0], d[1], d[2], d[3]
 
-        # Drop the constraint
-        sql = 'ALTER TABLE {0} DROP CONSTRAINT IF EXISTS {1};'.format(
-            fk_table, fk_name
-        )
-        _execute(sql)
-
-        # Recreate constraint
-        sql = 'ALTER TABLE {0} ADD CONSTRAINT {1} FOREIGN KEY ({2}) ' \
-              'REFERENCES {3}({4}) ON DELETE SET NULL;'.format(
-            fk_table,
-            fk_name,
-            fk_col,
-            table,
-            local_col
-        )
-        _execute(sql)
+            # Drop the constraint
+            sql = 'ALTER TABLE {0} DROP CONSTRAINT IF EXISTS {1};'.format(
+                fk_table, fk_name
+            )
+            _execute(sql)
+
+            # Recreate constraint
+            sql = 'ALTER TABLE {0} ADD CONSTRAINT {1} FOREIGN KEY ({2}) ' \
+                  'REFERENCES {3}({4}) ON DELETE SET NULL;'.format(
+                fk_table,
+                fk_name,
+                fk_col,
+                table,
+                local_col
+            )
+            _execute(sql)
 
     return True
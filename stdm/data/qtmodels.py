@@ -19,6 +19,8 @@ email                : gkahiu@gmail.com
  ***************************************************************************/
 """
 
+import sys
+from collections import OrderedDict
 from decimal import Decimal
 
 from qgis.PyQt.QtCore import (
@@ -35,6 +37,10 @@ from qgis.PyQt.QtGui import (
     QColor,
     QFont
 )
+from sqlalchemy import (
+    and_,
+    or_
+)
 
 from stdm.data.modelformatters import (
     LookupFormatter,
@@ -623,6 +629,9 @@ class VerticalHeaderSortFilterProxyModel(QSortFilterProxyModel):
         if not super().filterAcceptsRow(source_row, source_parent):
             return False
 
+        if not self.filter_params:
+            return True
+
         for col in range(self.sourceModel().columnCount()):
             attribute_name = self.sourceModel().data(self.sourceModel().index(source_row, col, QModelIndex()),
                                                      BaseSTDMTableModel.ROLE_ATTRIBUTE_NAME)
@@ -642,6 +651,488 @@ class VerticalHeaderSortFilterProxyModel(QSortFilterProxyModel):
         return True
 
 
+class PagedEntityTableModel(BaseSTDMTableModel):
+    """
+    Table model which lazily loads the records of an entity in pages using
+    keyset pagination i.e. each page is fetched with a 'WHERE id > :last
+    ORDER BY id LIMIT n' query rather than an offset. Pages are fetched
+    when the view requests more rows (canFetchMore/fetchMore), only a
+    bounded number of rows are kept in memory and cell values are formatted
+    when they are requested by the view.
+    """
+    # Number of rows fetched from the database in each page
+    PAGE_SIZE = 200
+
+    def __init__(self, model_cls, headerdata, parent=None, attribute_names=None, formatters=None,
+                 criteria=None, sort_column=None, sort_descending=False, max_cached_rows=0,
+                 page_size=PAGE_SIZE):
+        """
+        :param model_cls: SQLAlchemy model class of the entity.
+        :type model_cls: Model
+        :param headerdata: Column headers.
+        :type headerdata: list
+        :param attribute_names: Names of the model attributes in the same
+        order as the headers. The first attribute should be the 'id'.
+        :type attribute_names: list
+        :param formatters: Objects, indexed by attribute name, whose
+        format_column_value is used to format the display values.
+        :type formatters: dict
+        :param criteria: SQLAlchemy filter criteria applied to all the
+        queries. None returns an empty model.
+        :type criteria: list
+        :param sort_column: Name of the attribute used to sort the records,
+        records are always sorted by id within equal sort values.
+        :type sort_column: str
+        :param sort_descending: True to sort in descending order.
+        :type sort_descending: bool
+        :param max_cached_rows: Maximum number of rows whose values are kept
+        in memory. Zero or less disables the limit.
+        :type max_cached_rows: int
+        :param page_size: Number of rows in each page.
+        :type page_size: int
+        """
+        BaseSTDMTableModel.__init__(self, [], headerdata, parent, attribute_names=attribute_names)
+
+        self._model_cls = model_cls
+        self._formatters = formatters or {}
+        self._criteria = criteria
+        self._sort_column = self._valid_sort_column(sort_column)
+        self._sort_descending = sort_descending
+        self._page_size = max(1, int(page_size))
+        self._max_cached_rows = int(max_cached_rows)
+        if self._max_cached_rows > 0:
+            self._max_cached_rows = max(self._max_cached_rows, 2 * self._page_size)
+
+        self._clear()
+
+    def _valid_sort_column(self, sort_column):
+        if sort_column is None or sort_column == 'id':
+            return None
+
+        sort_attr = getattr(self._model_cls, sort_column, None)
+        # Only plain columns can be used in the keyset
+        if not hasattr(getattr(sort_attr, 'property', None), 'columns'):
+            return None
+
+        return sort_column
+
+    def is_sortable(self, attribute_name):
+        """
+        :param attribute_name: Name of the model attribute.
+        :type attribute_name: str
+        :return: Returns True if the records can be sorted using the given
+        attribute.
+        :rtype: bool
+        """
+        return attribute_name == 'id' or self._valid_sort_column(attribute_name) is not None
+
+    def set_query(self, criteria, sort_column=None, sort_descending=False):
+        """
+        Sets the filter criteria and sort order of the records then
+        discards the loaded rows so that the matching records are fetched
+        in pages as requested by the view.
+        :param criteria: SQLAlchemy filter criteria or None for an empty
+        model.
+        :type criteria: list
+        :param sort_column: Name of the attribute used to sort the records.
+        :type sort_column: str
+        :param sort_descending: True to sort in descending order.
+        :type sort_descending: bool
+        """
+        self.beginResetModel()
+        self._criteria = criteria
+        self._sort_column = self._valid_sort_column(sort_column)
+        self._sort_descending = sort_descending
+        self._clear()
+        self.endResetModel()
+
+    def _clear(self):
+        # Keys of the rows in view order. Keys are record ids except for
+        # rows which have been inserted but not yet assigned an id.
+        self._row_keys = []
+        self._key_set = set()
+        # LRU cache of {id: [raw values, {column: display value}]}
+        self._rows = OrderedDict()
+        # Estimated size, in bytes, of the raw values in the cache
+        self._cached_bytes = 0
+        # Inserted rows without an id, these are never evicted
+        self._pending = {}
+        self._new_key = 0
+        # Sort value and id of the last fetched record
+        self._last_key = None
+        self._exhausted = self._criteria is None
+
+    def reload(self):
+        """
+        Discards the loaded rows so that they are fetched afresh from the
+        database when requested by the view.
+        """
+        self.beginResetModel()
+        self._clear()
+        self.endResetModel()
+
+    def _query(self):
+        query = self._model_cls().queryObject()
+        if self._criteria:
+            query = query.filter(*self._criteria)
+
+        return query
+
+    def _order_by(self):
+        id_col = self._model_cls.id
+        if self._sort_column is None:
+            return [id_col.asc()]
+
+        col = getattr(self._model_cls, self._sort_column)
+        if self._sort_descending:
+            return [col.desc().nullsfirst(), id_col.asc()]
+
+        return [col.asc().nullslast(), id_col.asc()]
+
+    def _keyset_criterion(self, last_key=None):
+        # Criterion for selecting the records after the last fetched one,
+        # or the given key, based on the sort order.
+        id_col = self._model_cls.id
+        sort_value, last_id = last_key or self._last_key
+
+        if self._sort_column is None:
+            return id_col > last_id
+
+        col = getattr(self._model_cls, self._sort_column)
+        if self._sort_descending:
+            # NULL values come first
+            if sort_value is None:
+                return or_(and_(col.is_(None), id_col > last_id), col.isnot(None))
+
+            return or_(col < sort_value, and_(col == sort_value, id_col > last_id))
+
+        # NULL values come last
+        if sort_value is None:
+            return and_(col.is_(None), id_col > last_id)
+
+        return or_(col > sort_value, and_(col == sort_value, id_col > last_id), col.is_(None))
+
+    def total_count(self):
+        """
+        :return: Returns the number of records matching the criteria of the
+        model, including those that have not been fetched.
+        :rtype: int
+        """
+        if self._criteria is None:
+            return len(self._row_keys)
+
+        return self._query().order_by(None).count()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+
+        return not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+
+        query = self._query()
+        if self._last_key is not None:
+            query = query.filter(self._keyset_criterion())
+
+        records = query.order_by(*self._order_by()).limit(self._page_size).all()
+        if len(records) < self._page_size:
+            self._exhausted = True
+
+        if len(records) > 0:
+            last = records[-1]
+            sort_value = getattr(last, self._sort_column) if self._sort_column else None
+            self._last_key = (sort_value, last.id)
+
+        # Skip records that have already been added to the view
+        records = [r for r in records if r.id not in self._key_set]
+        if len(records) == 0:
+            return
+
+        position = len(self._row_keys)
+        self.beginInsertRows(QModelIndex(), position, position + len(records) - 1)
+
+        rows = []
+        for r in records:
+            values = self._record_values(r)
+            rows.append(values)
+            self._row_keys.append(r.id)
+            self._key_set.add(r.id)
+            self._cache_row(r.id, values)
+
+        self._prefetch_display_values(rows)
+
+        self.endInsertRows()
+
+        self._evict()
+
+    def _record_values(self, record):
+        return [getattr(record, attr) for attr in self._attribute_names]
+
+    @staticmethod
+    def _values_size(values):
+        return sys.getsizeof(values) + sum([sys.getsizeof(v) for v in values])
+
+    def _cache_row(self, key, raw_values, entry=None):
+        self._uncache_row(key)
+        self._rows[key] = entry or [raw_values, {}]
+        self._cached_bytes += self._values_size(self._rows[key][0])
+
+    def _uncache_row(self, key):
+        entry = self._rows.pop(key, None)
+        if entry is not None:
+            self._cached_bytes -= self._values_size(entry[0])
+
+        return entry
+
+    def _evict(self, keep=None):
+        if self._max_cached_rows <= 0:
+            return
+
+        keep = keep or set()
+        while len(self._rows) > self._max_cached_rows:
+            key = next(iter(self._rows))
+            if key in keep:
+                break
+            self._uncache_row(key)
+
+    def memory_usage(self):
+        """
+        :return: Returns the estimated memory usage, in bytes, of the rows
+        held by the model.
+        :rtype: int
+        """
+        return self._cached_bytes + sys.getsizeof(self._row_keys)
+
+    def refresh_rows(self, updated_ids, deleted_ids):
+        """
+        Refreshes the rows of records which have been changed in the
+        database. Deleted records are removed from the model while the
+        cached values of updated records are discarded so that they are
+        fetched afresh when requested by the view. Records which have not
+        been fetched yet, such as new ones, are picked up by subsequent
+        fetches.
+        :param updated_ids: Ids of the inserted or updated records.
+        :type updated_ids: set
+        :param deleted_ids: Ids of the deleted records.
+        :type deleted_ids: set
+        """
+        deleted_rows = [
+            r for r, key in enumerate(self._row_keys) if key in deleted_ids
+        ]
+        for r in reversed(deleted_rows):
+            self.removeRows(r, 1)
+
+        for r, key in enumerate(self._row_keys):
+            if key in updated_ids and key in self._rows:
+                self._uncache_row(key)
+                self.dataChanged.emit(
+                    self.index(r, 0), self.index(r, self.columnCount() - 1)
+                )
+
+        if len(updated_ids - self._key_set) > 0 and self._criteria is not None:
+            self._exhausted = False
+
+    def _load_page(self, row):
+        # Fetches the values of the rows in the page containing the given
+        # row which are no longer in the cache.
+        start = row - row % self._page_size
+        keys = self._row_keys[start:start + self._page_size]
+        ids = [k for k in keys if k not in self._pending and k not in self._rows]
+        if len(ids) == 0:
+            return
+
+        records = self._query().filter(self._model_cls.id.in_(ids)).all()
+        rows = []
+        for r in records:
+            values = self._record_values(r)
+            rows.append(values)
+            self._cache_row(r.id, values)
+
+        self._prefetch_display_values(rows)
+        self._evict(set(ids))
+
+    def _prefetch_display_values(self, rows):
+        # Lets the formatters load the data they require for the values in
+        # the given rows in bulk rather than for each cell.
+        for column, attr in enumerate(self._attribute_names):
+            formatter = self._formatters.get(attr, None)
+            prefetch = getattr(formatter, 'prefetch_column_values', None)
+            if prefetch is None:
+                continue
+
+            values = [r[column] for r in rows if r[column] is not None]
+            if len(values) > 0:
+                prefetch(values)
+
+    def _row(self, row):
+        key = self._row_keys[row]
+        if key in self._pending:
+            return self._pending[key]
+
+        if key not in self._rows:
+            self._load_page(row)
+
+        entry = self._rows.get(key, None)
+        if entry is None:
+            # The record has since been deleted from the database
+            return [[None] * self.columnCount(), {}]
+
+        self._rows.move_to_end(key)
+
+        return entry
+
+    def _display_value(self, entry, column):
+        display_values = entry[1]
+        if column in display_values:
+            return display_values[column]
+
+        val = entry[0][column]
+        attr = self._attribute_names[column]
+        if val is not None and attr in self._formatters:
+            val = self._formatters[attr].format_column_value(val)
+
+        # Decimal not supported by QVariant so we adapt it to a supported type
+        if isinstance(val, Decimal):
+            val = str(val)
+
+        display_values[column] = val
+
+        return val
+
+    def all_rows(self):
+        """
+        Fetches, in pages, all the records matching the criteria of the
+        model in its sort order, regardless of the rows fetched by the view.
+        The fetched records are not added to the model.
+        :return: Returns the display values of the records.
+        :rtype: list
+        """
+        rows = []
+        if self._criteria is None:
+            return rows
+
+        last_key = None
+        while True:
+            query = self._query()
+            if last_key is not None:
+                query = query.filter(self._keyset_criterion(last_key))
+
+            records = query.order_by(*self._order_by()).limit(self._page_size).all()
+
+            page = [self._record_values(r) for r in records]
+            self._prefetch_display_values(page)
+            for values in page:
+                entry = [values, {}]
+                rows.append([self._display_value(entry, c) for c in range(self.columnCount())])
+
+            if len(records) < self._page_size:
+                return rows
+
+            last = records[-1]
+            sort_value = getattr(last, self._sort_column) if self._sort_column else None
+            last_key = (sort_value, last.id)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self._row_keys)
+
+    def data(self, index, role):
+        if not index.isValid():
+            return None
+
+        row, column = index.row(), index.column()
+        if row < 0 or row >= len(self._row_keys):
+            return None
+
+        if column < 0 or column >= self.columnCount():
+            return None
+
+        if role == BaseSTDMTableModel.ROLE_ATTRIBUTE_NAME:
+            return self._attribute_names[column]
+        elif role == BaseSTDMTableModel.ROLE_ROW_ID:
+            key = self._row_keys[row]
+            return None if key in self._pending else key
+        elif role == BaseSTDMTableModel.ROLE_RAW_VALUE:
+            return self._row(row)[0][column]
+        elif role == Qt.DisplayRole:
+            return self._display_value(self._row(row), column)
+
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+
+        row, column = index.row(), index.column()
+        if role == Qt.EditRole:
+            self._row(row)[1][column] = value
+        elif role == BaseSTDMTableModel.ROLE_RAW_VALUE:
+            entry = self._row(row)
+            if self._row_keys[row] in self._rows:
+                self._cached_bytes += sys.getsizeof(value) - sys.getsizeof(entry[0][column])
+            entry[0][column] = value
+            entry[1].pop(column, None)
+        elif role == BaseSTDMTableModel.ROLE_ROW_ID:
+            self._set_row_id(row, value)
+        else:
+            return False
+
+        self.dataChanged.emit(index, index)
+
+        return True
+
+    def _set_row_id(self, row, record_id):
+        key = self._row_keys[row]
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            entry = self._row(row)
+            self._uncache_row(key)
+        self._key_set.discard(key)
+
+        self._row_keys[row] = record_id
+        self._key_set.add(record_id)
+        self._cache_row(record_id, entry[0], entry)
+        self._evict({record_id})
+
+    def insertRows(self, position, rows, parent=QModelIndex()):
+        if position < 0 or position > len(self._row_keys):
+            return False
+
+        self.beginInsertRows(parent, position, position + rows - 1)
+
+        for i in range(rows):
+            self._new_key -= 1
+            key = ('new', self._new_key)
+            self._pending[key] = [[None] * self.columnCount(), {}]
+            self._row_keys.insert(position, key)
+
+        self.endInsertRows()
+
+        return True
+
+    def removeRows(self, position, count, parent=QModelIndex()):
+        if position < 0 or position >= len(self._row_keys):
+            return False
+
+        count = min(count, len(self._row_keys) - position)
+        self.beginRemoveRows(parent, position, position + count - 1)
+
+        for key in self._row_keys[position:position + count]:
+            self._pending.pop(key, None)
+            self._uncache_row(key)
+            self._key_set.discard(key)
+        del self._row_keys[position:position + count]
+
+        self.endRemoveRows()
+
+        return True
+
+
 class STRTreeViewModel(QAbstractItemModel):
     """
     Model for rendering social tenure relationship nodes in a tree view.
@@ -661,6 +1152,30 @@ class STRTreeViewModel(QAbstractItemModel):
 
         return parentNode.childCount()
 
+    def hasChildren(self, parent=QModelIndex()):
+        return self._getNode(parent).hasChildren()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """
+        True if the node at the parent index has children that are loaded
+        when it is first expanded.
+        """
+        return self._getNode(parent).canFetchMore()
+
+    def fetchMore(self, parent=QModelIndex()):
+        """
+        Loads the remaining children of the node at the parent index.
+        """
+        parentNode = self._getNode(parent)
+        children = parentNode.fetchChildren()
+        if len(children) == 0:
+            return
+
+        position = parentNode.childCount()
+        self.beginInsertRows(parent, position, position + len(children) - 1)
+        parentNode.addChildren(children)
+        self.endInsertRows()
+
     def columnCount(self, parent=QModelIndex()):
         return self._rootNode.columnCount()
 
@@ -0,0 +1,266 @@
+"""
+/***************************************************************************
+Name                 : Schema Catalog
+Description          : Process-wide, in-memory cache of the tables, views,
+                       columns, geometry columns and foreign key references
+                       in the STDM database.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import re
+import threading
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+
+from sqlalchemy.sql.expression import text
+
+from stdm.data.database import (
+    Singleton,
+    STDMDb
+)
+
+LOGGER = logging.getLogger('stdm')
+
+# Statements which change the structure of the database
+_DDL_RX = re.compile(r'^\s*(CREATE|ALTER|DROP|COMMENT)\b', re.IGNORECASE)
+
+_TABLES_SQL = "SELECT table_name, table_type FROM information_schema.tables " \
+              "WHERE table_schema = :tschema"
+
+_COLUMNS_SQL = "SELECT table_name, column_name, data_type, udt_name " \
+               "FROM information_schema.columns WHERE table_schema = :tschema " \
+               "ORDER BY table_name, ordinal_position"
+
+_GEOMETRY_COLUMNS_SQL = "SELECT f_table_name, f_geometry_column, type, srid " \
+                        "FROM geometry_columns WHERE f_table_schema = :tschema"
+
+# Same definition as the foreign_key_references view in
+# scripts/foreign_key_references.sql
+_FOREIGN_KEYS_SQL = "SELECT tc.constraint_name, tc.table_name, kcu.column_name, " \
+                    "ccu.table_name AS foreign_table_name, " \
+                    "ccu.column_name AS foreign_column_name " \
+                    "FROM information_schema.table_constraints AS tc " \
+                    "JOIN information_schema.key_column_usage AS kcu " \
+                    "ON tc.constraint_name = kcu.constraint_name " \
+                    "JOIN information_schema.constraint_column_usage AS ccu " \
+                    "ON ccu.constraint_name = tc.constraint_name " \
+                    "WHERE constraint_type = 'FOREIGN KEY'"
+
+
+def is_ddl_statement(sql):
+    """
+    :param sql: SQL statement as a string or TextClause.
+    :type sql: object
+    :return: Returns True if the statement changes the database structure
+    i.e. CREATE, ALTER, DROP or COMMENT.
+    :rtype: bool
+    """
+    return _DDL_RX.match(str(sql)) is not None
+
+
+class _SchemaSnapshot:
+    """
+    Holds the catalog items of a single schema.
+    """
+
+    def __init__(self):
+        self.tables = set()
+        self.views = set()
+        # {table: OrderedDict(column: data type)} in creation order
+        self.columns = defaultdict(OrderedDict)
+        # {table: OrderedDict(geometry column: (type, srid))}
+        self.geometry_columns = defaultdict(OrderedDict)
+
+
+@Singleton
+class SchemaCatalog:
+    """
+    Loads the tables, views, columns, data types, geometry columns and
+    foreign key references of a schema in a few bulk queries and answers
+    subsequent lookups from memory. The catalog has to be invalidated
+    whenever the database structure changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._snapshots = {}
+        self._foreign_keys = None
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        """
+        Discards the cached catalog items. They will be reloaded on the
+        next lookup.
+        """
+        with self._lock:
+            self._snapshots = {}
+            self._foreign_keys = None
+
+        LOGGER.debug('Schema catalog invalidated.')
+
+    def stats(self):
+        """
+        :return: Returns the number of lookups answered from memory (hits)
+        and those that required the catalog to be loaded (misses).
+        :rtype: dict
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        """
+        Resets the hit and miss counters.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _execute(sql, **kwargs):
+        # Imported here to avoid a circular import with pg_utils
+        from stdm.data.pg_utils import _execute_read
+
+        return _execute_read(text(sql), **kwargs)
+
+    def _snapshot(self, schema):
+        with self._lock:
+            snapshot = self._snapshots.get(schema, None)
+            if snapshot is not None:
+                self.hits += 1
+
+                return snapshot
+
+            self.misses += 1
+            snapshot = self._load(schema)
+
+            # Do not cache an empty catalog when there is no connection
+            if STDMDb.instance().engine is not None:
+                self._snapshots[schema] = snapshot
+
+            return snapshot
+
+    def _load(self, schema):
+        snapshot = _SchemaSnapshot()
+
+        for r in self._execute(_TABLES_SQL, tschema=schema):
+            if r['table_type'] == 'VIEW':
+                snapshot.views.add(r['table_name'])
+            else:
+                snapshot.tables.add(r['table_name'])
+
+        for r in self._execute(_COLUMNS_SQL, tschema=schema):
+            table_name = r['table_name']
+            data_type = r['data_type']
+
+            # Use the actual type name of view columns based on custom types
+            # such as geometry, similar to pg_typeof.
+            if table_name in snapshot.views and data_type == 'USER-DEFINED':
+                data_type = r['udt_name']
+
+            snapshot.columns[table_name][r['column_name']] = data_type
+
+        for r in self._execute(_GEOMETRY_COLUMNS_SQL, tschema=schema):
+            snapshot.geometry_columns[r['f_table_name']][
+                r['f_geometry_column']] = (r['type'], r['srid'])
+
+        LOGGER.debug('Schema catalog loaded for %s schema.', schema)
+
+        return snapshot
+
+    def tables(self, schema='public'):
+        """
+        :return: Returns the names of the base tables in the given schema.
+        :rtype: set
+        """
+        return self._snapshot(schema).tables
+
+    def views(self, schema='public'):
+        """
+        :return: Returns the names of the views in the given schema.
+        :rtype: set
+        """
+        return self._snapshot(schema).views
+
+    def spatial_tables(self, schema='public'):
+        """
+        :return: Returns the names of the tables and views which have
+        geometry columns.
+        :rtype: list
+        """
+        return list(self._snapshot(schema).geometry_columns.keys())
+
+    def column_names(self, table_name, schema='public'):
+        """
+        :return: Returns the column names of the given table or view in
+        creation order.
+        :rtype: list
+        """
+        return list(self._snapshot(schema).columns.get(table_name, {}).keys())
+
+    def column_type(self, table_name, column_name, schema='public'):
+        """
+        :return: Returns the PostgreSQL data type of the column or an empty
+        string if the column does not exist.
+        :rtype: str
+        """
+        columns = self._snapshot(schema).columns.get(table_name, {})
+
+        return columns.get(column_name, '')
+
+    def geometry_column_names(self, table_name, schema='public'):
+        """
+        :return: Returns the names of the geometry columns in the given table
+        or view.
+        :rtype: list
+        """
+        geom_cols = self._snapshot(schema).geometry_columns.get(table_name, {})
+
+        return list(geom_cols.keys())
+
+    def geometry_type(self, table_name, column_name, schema='public'):
+        """
+        :return: Returns a tuple of the geometry type and SRID of the given
+        geometry column. An empty string and -1 are returned if the column
+        does not exist.
+        :rtype: tuple
+        """
+        geom_cols = self._snapshot(schema).geometry_columns.get(table_name, {})
+
+        return geom_cols.get(column_name, ('', -1))
+
+    def foreign_keys(self):
+        """
+        :return: Returns all the foreign key references in the database as
+        a list of dictionaries with constraint_name, table_name, column_name,
+        foreign_table_name and foreign_column_name keys.
+        :rtype: list
+        """
+        with self._lock:
+            if self._foreign_keys is not None:
+                self.hits += 1
+
+                return self._foreign_keys
+
+            self.misses += 1
+            foreign_keys = [
+                dict(r.items()) for r in self._execute(_FOREIGN_KEYS_SQL)
+            ]
+
+            if STDMDb.instance().engine is not None:
+                self._foreign_keys = foreign_keys
+
+            return foreign_keys
@@ -82,18 +82,51 @@ def document_models(entity, link_column, link_value):
     if not hasattr(_doc_model, link_column):
         return []
 
+    return document_models_by_link(
+        entity, link_column, [link_value]
+    ).get(link_value, OrderedDict())
+
+
+def document_models_by_link(entity, link_column, link_values):
+    """
+    Create the supporting document models of several records in one query.
+    :param entity: The entity in which the supporting document are uploaded.
+    :type entity: Class
+    :param link_column: Name of the column linking the
+    source document tables to the primary entity table.
+    :type link_column: str
+    :param link_values: Values of the linked column.
+    :type link_values: list
+    :return: Instances of supporting document models, grouped by document
+    type, indexed by the value of the linked column. Records without
+    documents are omitted.
+    :rtype: dict
+    """
+    _str_model, _doc_model = entity_model(
+        entity, False, True
+    )
+
+    if _doc_model is None:
+        return {}
+
+    if not hasattr(_doc_model, link_column):
+        return {}
+
     _doc_obj = _doc_model()
     # get the column object for column entity id
     # in entity supporting_document table.
     entity_doc_col_obj = getattr(_doc_model, link_column)
     result = _doc_obj.queryObject().filter(
-        entity_doc_col_obj == link_value
+        entity_doc_col_obj.in_(list(link_values))
     ).all()
 
-    doc_objs = defaultdict(list)
+    doc_objs = defaultdict(lambda: defaultdict(list))
 
     for doc_obj in result:
-        doc_objs[doc_obj.document_type].append(doc_obj)
+        link_value = getattr(doc_obj, link_column)
+        doc_objs[link_value][doc_obj.document_type].append(doc_obj)
 
-    doc_objs = OrderedDict(doc_objs)
-    return doc_objs
+    return {
+        link_value: OrderedDict(docs)
+        for link_value, docs in doc_objs.items()
+    }
@@ -0,0 +1,212 @@
+"""
+/***************************************************************************
+Name                 : Table Model Cache
+Description          : Keeps the table models of recently browsed entities
+                       within a memory budget and refreshes them when the
+                       records in the corresponding tables change.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+from collections import OrderedDict
+
+from sqlalchemy import (
+    event,
+    inspect
+)
+from sqlalchemy.orm import Session
+
+from stdm.data.configuration import entity_models_version
+from stdm.data.database import Singleton
+
+LOGGER = logging.getLogger('stdm')
+
+# Default memory budget, in megabytes, of the cached table models
+DEFAULT_CACHE_SIZE = 64
+
+# Key in Session.info for the records changed in the current transaction
+_CHANGES_KEY = 'stdm_changed_records'
+
+
+@Singleton
+class TableModelCache:
+    """
+    Least recently used cache of PagedEntityTableModel objects indexed by
+    a key whose first item is the table name. The models are kept until
+    their estimated memory usage exceeds the memory budget. Records
+    inserted, updated or deleted through the SQLAlchemy session are
+    refreshed in the cached models once the transaction is committed.
+    """
+
+    def __init__(self):
+        # {key: (model, entity models version)}
+        self._models = OrderedDict()
+        self.memory_budget = DEFAULT_CACHE_SIZE * 1024 * 1024
+
+    def model(self, key):
+        """
+        :param key: Key whose first item is the table name.
+        :type key: tuple
+        :return: Returns the model with the given key or None if it is not
+        in the cache or if the entity models have since been reflected
+        afresh.
+        :rtype: PagedEntityTableModel
+        """
+        entry = self._models.get(key, None)
+        if entry is None:
+            return None
+
+        model, version = entry
+        if version != entity_models_version():
+            del self._models[key]
+
+            return None
+
+        self._models.move_to_end(key)
+
+        return model
+
+    def add(self, key, model):
+        """
+        Adds a model to the cache and evicts the least recently used models
+        if the memory budget is exceeded.
+        :param key: Key whose first item is the table name.
+        :type key: tuple
+        :param model: Table model.
+        :type model: PagedEntityTableModel
+        """
+        self._models[key] = (model, entity_models_version())
+        self._models.move_to_end(key)
+        model.rowsInserted.connect(self.enforce_budget)
+
+        self.enforce_budget()
+
+    def remove(self, key):
+        """
+        Removes the model with the given key from the cache.
+        """
+        self._models.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all the models from the cache.
+        """
+        self._models.clear()
+
+    def __len__(self):
+        return len(self._models)
+
+    def memory_usage(self):
+        """
+        :return: Returns the estimated memory usage, in bytes, of the cached
+        models.
+        :rtype: int
+        """
+        return sum([m.memory_usage() for m, _ in self._models.values()])
+
+    def enforce_budget(self, *args):
+        """
+        Evicts the least recently used models until the memory usage is
+        within the budget. The most recently used model is always kept.
+        """
+        usage = self.memory_usage()
+        while usage > self.memory_budget and len(self._models) > 1:
+            key, (model, _) = self._models.popitem(last=False)
+            usage -= model.memory_usage()
+            LOGGER.debug('Table model for %s evicted from the cache.', key[0])
+
+    def has_table(self, table_name):
+        """
+        :return: Returns True if there is a cached model for the given table.
+        :rtype: bool
+        """
+        return any([k[0] == table_name for k in self._models])
+
+    def _table_models(self, table_name):
+        return [m for k, (m, _) in self._models.items() if k[0] == table_name]
+
+    def invalidate_table(self, table_name):
+        """
+        Discards the loaded rows of the models of the given table so that
+        they are fetched afresh. Use this when the table is changed outside
+        the SQLAlchemy session e.g. by the bulk importer.
+        :param table_name: Name of the table.
+        :type table_name: str
+        """
+        for model in self._table_models(table_name):
+            model.reload()
+
+    def refresh_records(self, table_name, updated_ids, deleted_ids):
+        """
+        Refreshes the given records in the models of the given table. The
+        values of updated records are fetched when next requested by the
+        views since no SQL can be emitted while the session is committing.
+        :param table_name: Name of the table.
+        :type table_name: str
+        :param updated_ids: Ids of the inserted or updated records.
+        :type updated_ids: set
+        :param deleted_ids: Ids of the deleted records.
+        :type deleted_ids: set
+        """
+        for model in self._table_models(table_name):
+            model.refresh_rows(updated_ids, deleted_ids)
+
+
+def _on_after_flush(session, flush_context):
+    # Records the ids of the flushed records in tables with cached models.
+    # The new, dirty and deleted collections still reflect the pre-flush
+    # state at this point.
+    cache = TableModelCache.instance()
+    if len(cache) == 0:
+        return
+
+    changes = session.info.setdefault(_CHANGES_KEY, {})
+    for objects, deleted in ((session.new, False), (session.dirty, False),
+                             (session.deleted, True)):
+        for obj in objects:
+            table = getattr(inspect(obj).mapper.local_table, 'name', None)
+            record_id = getattr(obj, 'id', None)
+            if table is None or record_id is None or not cache.has_table(table):
+                continue
+
+            updated_ids, deleted_ids = changes.setdefault(table, (set(), set()))
+            if deleted:
+                deleted_ids.add(record_id)
+            else:
+                updated_ids.add(record_id)
+
+
+def _on_after_commit(session):
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if not changes:
+        return
+
+    cache = TableModelCache.instance()
+    for table, (updated_ids, deleted_ids) in changes.items():
+        try:
+            cache.refresh_records(table, updated_ids - deleted_ids, deleted_ids)
+        except Exception as ex:
+            LOGGER.debug('Cached table model for %s could not be refreshed: %s', table, str(ex))
+            cache.invalidate_table(table)
+
+
+def _on_after_rollback(session, previous_transaction):
+    session.info.pop(_CHANGES_KEY, None)
+
+
+if not event.contains(Session, 'after_flush', _on_after_flush):
+    event.listen(Session, 'after_flush', _on_after_flush)
+    event.listen(Session, 'after_commit', _on_after_commit)
+    event.listen(Session, 'after_soft_rollback', _on_after_rollback)
@@ -18,8 +18,10 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
+import logging
 import os
 import time
+from collections import OrderedDict
 
 from qgis.PyQt import QtCore 
 
@@ -29,6 +31,13 @@ from qgis.PyQt.QtCore import (
 from qgis.PyQt.QtCore import QFile, QIODevice
 from qgis.PyQt.QtWidgets import QVBoxLayout
 from qgis.PyQt.QtXml import QDomDocument
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import (
+    Session,
+    make_transient
+)
+from sqlalchemy.sql.expression import text
 
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.columns import GeometryColumn
@@ -37,14 +46,9 @@ from stdm.geoodk.importer.geometry_provider import STDMGeometry
 from stdm.settings import current_profile
 from stdm.ui.sourcedocument import SourceDocumentManager
 
-from stdm.utils.util import (
-    entity_attr_to_id, 
-    entity_attr_to_model
-)
-
 from stdm.data.pg_utils import (
-    export_data,
-    run_query
+    _execute_read,
+    unit_of_work
 )
 
 from typing import (
@@ -68,17 +72,167 @@ HOME = QDir.home().path()
 
 CONFIG_FILE = HOME + '/.stdm/geoodk/instances'
 
+# Number of instances written in each transaction
+IMPORT_BATCH_SIZE = 50
+
+LOGGER = logging.getLogger('stdm')
+
+
+class ImportCache():
+    """
+    Keeps the entities, mapped classes, multiple select columns and lookup
+    values used while importing GeoODK instances so that they are only
+    read once per import session.
+    """
+    def __init__(self, profile=None):
+        self.profile = profile if profile is not None else current_profile()
+        self._entities = {}
+        self._mappers = {}
+        self._column_types = {}
+        self._ms_columns = {}
+        # {(table name, column name): {value: id}}
+        self._value_ids = {}
+
+    def entity(self, entity_name: str):
+        """
+        :param entity_name: Name of the entity or 'social_tenure' for the
+        social tenure relationship.
+        :type entity_name: str
+        :return: Returns the entity with the given name.
+        :rtype: Entity
+        """
+        entity = self._entities.get(entity_name, None)
+        if entity is None:
+            if entity_name == 'social_tenure':
+                entity = self.profile.social_tenure
+            else:
+                entity = self.profile.entity_by_name(entity_name)
+            self._entities[entity_name] = entity
+
+        return entity
+
+    def mapper(self, entity):
+        """
+        :param entity: Entity
+        :type entity: Entity
+        :return: Returns the mapped class of the entity and of its
+        supporting documents, if the entity supports documents.
+        :rtype: tuple
+        """
+        mapped = self._mappers.get(entity.name, None)
+        if mapped is None:
+            if entity.supports_documents:
+                mapped = entity_model(entity, with_supporting_document=True)
+            else:
+                mapped = entity_model(entity), None
+            self._mappers[entity.name] = mapped
+
+        return mapped
+
+    def column_types(self, entity) -> Dict[FieldName, str]:
+        """
+        :param entity: Entity
+        :type entity: Entity
+        :return: Returns the type info of the columns of the entity indexed
+        by column name.
+        :rtype: dict
+        """
+        types = self._column_types.get(entity.name, None)
+        if types is None:
+            types = {c.name: c.TYPE_INFO for c in entity.columns.values()}
+            self._column_types[entity.name] = types
+
+        return types
+
+    def multiple_select_columns(self, entity, entity_name: str) -> dict:
+        """
+        Find all multiple select columns in a given entity.
+        :param entity: Entity object
+        :type entity: Entity
+        :param entity_name: Name of the entity in the instance.
+        :type entity_name: str
+        :return: Returns a new dictionary, so that the selections of each
+        record can be stored in it, of the details of each multiple select
+        column.
+        :rtype: dict
+        """
+        key = (entity.name, entity_name)
+        columns = self._ms_columns.get(key, None)
+        if columns is None:
+            prefix = entity.profile.prefix
+            columns = OrderedDict()
+            for column in entity.columns.values():
+                if column.TYPE_INFO == 'MULTIPLE_SELECT':
+                    columns[column.name] = {
+                        'entity_name': entity_name,
+                        'multiple_select_table_name': prefix + '_' + column.name,
+                        'lookup_table_name': prefix + '_' + column.association.first_parent.short_name
+                    }
+            self._ms_columns[key] = columns
+
+        return OrderedDict((k, dict(v)) for k, v in columns.items())
+
+    def value_ids(self, table_name: str, column_name: str) -> Dict[str, EntityID]:
+        """
+        Reads, once, the ids of the records in a lookup or administrative
+        unit table indexed by the value of the given column.
+        :param table_name: Name of the table.
+        :type table_name: str
+        :param column_name: Name of the column.
+        :type column_name: str
+        :return: Returns the id of the first record with each value.
+        :rtype: dict
+        """
+        key = (table_name, column_name)
+        ids = self._value_ids.get(key, None)
+        if ids is None:
+            ids = {}
+            sql = 'SELECT * FROM {0} ORDER BY id'.format(table_name)
+            for r in _execute_read(text(sql)):
+                value = r[column_name]
+                if value is not None:
+                    ids.setdefault(str(value), r['id'])
+            self._value_ids[key] = ids
+
+        return ids
+
+    def attr_to_model_id(self, entity, column_name: str, value):
+        """
+        :return: Returns the id of the first record of the entity whose
+        column has the given value or None if there is no such record.
+        :rtype: int
+        """
+        if value is None:
+            return None
+
+        return self.value_ids(entity.name, column_name).get(str(value), None)
+
+    def attr_to_id(self, entity, column_name: str, value):
+        """
+        Cached equivalent of entity_attr_to_id.
+        :return: Returns the id of the first record of the entity whose
+        column has the given value or the value itself if there is no such
+        record.
+        :rtype: int
+        """
+        attr_id = self.attr_to_model_id(entity, column_name, value)
+        if attr_id is None:
+            return value
+
+        return attr_id
+
 
 class EntityImporter():
     """
     class constructor
     """
 
-    def __init__(self, instance):
+    def __init__(self, instance, cache=None):
         """
         Initialize variables
         """
         self.instance = instance
+        self.cache = cache
         self.instance_doc = QDomDocument()
         self.set_instance_document(self.instance)
         self.key_watch = 0
@@ -133,7 +287,7 @@ class EntityImporter():
         :return:
         """
         if attributes and ids:
-            entity_add = Save2DB('social_tenure', attributes, ids)
+            entity_add = Save2DB('social_tenure', attributes, ids, self.cache)
             entity_add.objects_from_supporting_doc(self.instance)
             entity_add.save_to_db()
 
@@ -142,34 +296,33 @@ class Save2DB():
     """
     Class to insert entity data into db
     """
-    def __init__(self, entity_name:str, entity_data:DictWithOrder[FieldName, FieldValue], parent_data:ParentEntityData):
+    def __init__(self, entity_name:str, entity_data:DictWithOrder[FieldName, FieldValue], parent_data:ParentEntityData,
+                 cache:ImportCache=None):
         """
         Initialize class and class variable
         """
+        self.cache = cache if cache is not None else ImportCache()
         self.entity_data = entity_data
         self.form_entity = entity_name
         self.doc_model = None
         self._doc_manager = None
+        self.has_documents = False
         self.entity = self.object_from_entity_name(entity_name)
         self.model = self.dbmodel_from_entity()
         self.key = 0
         self.parent_data = parent_data
         self.geom = 4326
         self.entity_mapping = {}
-        self.multiple_select_columns = {}
-        self.ms_columns(self.entity.profile.prefix, self.entity,
-                        self.multiple_select_columns)
+        self.multiple_select_columns = self.cache.multiple_select_columns(
+            self.entity, self.form_entity
+        )
 
     def object_from_entity_name(self, entity):
         """
 
         :return:
         """
-        if entity == 'social_tenure':
-            return current_profile().social_tenure
-        else:
-            user_entity = current_profile().entity_by_name(entity)
-            return user_entity
+        return self.cache.entity(entity)
 
     def entity_has_supporting_docs(self) ->bool:
         """
@@ -191,13 +344,13 @@ class Save2DB():
         Format model attributes from passed entity attributes
         :return:
         """
-        if self.entity_has_supporting_docs():
-            entity_object, self.doc_model = entity_model(self.entity, with_supporting_document=True)
-            if entity_object is None:
-                return
+        entity_object, self.doc_model = self.cache.mapper(self.entity)
+        if entity_object is None:
+            return
 
-            entity_object_model = entity_object()
+        entity_object_model = entity_object()
 
+        if self.doc_model is not None:
             if hasattr(entity_object_model, 'documents'):
                 if self.entity.TYPE_INFO == 'SOCIAL_TENURE':
                     obj_doc_col = current_profile().social_tenure.supporting_doc
@@ -207,9 +360,6 @@ class Save2DB():
                 self._doc_manager = SourceDocumentManager(
                     obj_doc_col, self.doc_model
                 )
-        else:
-            entity_object = entity_model(self.entity)
-            entity_object_model = entity_object()
         return entity_object_model
 
     def objects_from_supporting_doc(self, instance_file=None):
@@ -220,7 +370,7 @@ class Save2DB():
         """
         entity_supports_docs = False
 
-        if instance_file:
+        if instance_file and self._doc_manager is not None:
             f_dir, file_name = os.path.split(instance_file)
             for document, val in self.entity_data.items():
                 if str(document).endswith('supporting_document'):
@@ -232,7 +382,8 @@ class Save2DB():
                             self.supporting_document_model(abs_path, doc)
                             entity_supports_docs = True
 
-        self.entity.supports_documents = entity_supports_docs
+        # The entity is shared by all the records in the import
+        self.has_documents = entity_supports_docs
 
     def supporting_document_model(self, doc_path, doc):
         """
@@ -245,7 +396,7 @@ class Save2DB():
         # Create document container
         doc_container = QVBoxLayout()
         supporting_doc_entity = self.entity.supporting_doc.document_type_entity
-        document_type_id = entity_attr_to_id(supporting_doc_entity, 'value', doc, lower=False)
+        document_type_id = self.cache.attr_to_id(supporting_doc_entity, 'value', doc)
         # Register container
         self._doc_manager.registerContainer(
             doc_container,
@@ -282,50 +433,56 @@ class Save2DB():
         else:
             return formatted_doc_list[0]
 
-    def save_to_db(self):
+    def social_tenure_references(self, attributes:DictWithOrder[FieldName, FieldValue]) -> Dict[FieldName, EntityID]:
         """
-        Format object attribute data from entity and save them into database
-        :return:
+        Get the ids of the party and the spatial unit referenced by a social
+        tenure relationship from the parent data.
+        :param attributes: Social tenure relationship data. The party and
+        spatial_unit fields, if captured, name the referenced entities
+        otherwise the first party and spatial unit are used.
+        :type attributes: dict
+        :return: Foreign key column values indexed by column name.
+        :rtype: dict
         """
-        self.column_info()
-
-        attributes = self.entity_data
-
-        try:
-            if self.entity.short_name == 'social_tenure_relationship':
-                # try
-                list_val = list(self.entity_data.values())[0]
-                prefix  = current_profile().prefix + '_'
-                full_party_ref_column = ''
-                full_spatial_ref_ = ''
-                if 'party' in list_val.keys():
-                    full_party_ref_column = list_val.get('party')
-                    party_ref_column = full_party_ref_column + '_id'
-
-                else:
-                    full_party_ref_column = current_profile().social_tenure.parties[0].name
-                    party_ref_column = full_party_ref_column.replace(prefix, '') + '_id'
+        references = OrderedDict()
+        prefix = self.entity.profile.prefix + '_'
+        ref_entities = (
+            attributes.get('party', None) or self.entity.parties[0].name,
+            attributes.get('spatial_unit', None) or self.entity.spatial_units[0].name
+        )
 
-                party_id = self.parent_data.get(full_party_ref_column)[0]
-                if party_id:
-                    setattr(self.model, party_ref_column, party_id)
+        for ref_entity in ref_entities:
+            if not ref_entity.startswith(prefix):
+                ref_entity = prefix + ref_entity
 
-                if 'spatial_unit' in list_val.keys():
-                    full_spatial_ref_ = list_val.get('spatial_unit')
-                    spatial_ref_column = full_spatial_ref_ + '_id'
+            parent = self.parent_data.get(ref_entity, None)
+            if not parent or not parent[0]:
+                continue
 
-                else:
-                    full_spatial_ref_column = current_profile().social_tenure.spatial_units[0].name
-                    spatial_ref_column = full_spatial_ref_column.replace(prefix, '') + '_id'
+            for col in self.entity.columns.values():
+                if col.TYPE_INFO == 'FOREIGN_KEY' and col.parent is not None \
+                        and col.parent.name == ref_entity:
+                    references[col.name] = parent[0]
+                    break
 
-                spatial_id = self.parent_data.get(full_spatial_ref_column)[0]
-                if spatial_id:
-                    setattr(self.model, spatial_ref_column, spatial_id)
+        return references
 
-                attributes = self.entity_data['social_tenure']
+    def column_values(self) -> DictWithOrder[FieldName, object]:
+        """
+        Format the entity data into the values of the entity columns.
+        Foreign key values are taken from the parent data and the
+        selections of multiple select columns are kept in
+        multiple_select_columns.
+        :return: Column values indexed by column name.
+        :rtype: OrderedDict
+        """
+        self.column_info()
+        values = OrderedDict()
 
-        except DummyException:
-            pass
+        attributes = self.entity_data
+        if self.entity.short_name == 'social_tenure_relationship':
+            attributes = self.entity_data.get('social_tenure', self.entity_data)
+            values.update(self.social_tenure_references(attributes))
 
         for k, v in attributes.items():
             # Check for multiple select column
@@ -336,12 +493,20 @@ class Save2DB():
             if hasattr(self.model, k):
                 col_type = self.entity_mapping.get(k)
                 col_prop = self.entity.columns[k]
-                var = self.attribute_formatter(col_type, col_prop, v)
-                setattr(self.model, k, var)
+                values[k] = self.attribute_formatter(col_type, col_prop, v)
+
+        return values
+
+    def save_to_db(self):
+        """
+        Format object attribute data from entity and save them into database
+        :return:
+        """
+        for k, v in self.column_values().items():
+            setattr(self.model, k, v)
 
-        if self.entity_has_supporting_docs():
-            if self._doc_manager:
-                self.model.documents = self._doc_manager.model_objects()
+        if self.has_documents:
+            self.model.documents = self._doc_manager.model_objects()
 
         self.model.save()
         self.key = self.model.id
@@ -357,29 +522,33 @@ class Save2DB():
         attribute
         :return:
         """
-        self.column_info()
-        for k, v in self.entity_data.items():
-
-            if k in self.multiple_select_columns:
-                self.process_multiple_select_columns(k, v)
-                continue
+        return self.save_to_db()
 
-            if hasattr(self.model, k):
-                col_type = self.entity_mapping.get(k)
-                col_prop = self.entity.columns[k]
-                var = self.attribute_formatter(col_type, col_prop, v)
-                setattr(self.model, k, var)
-
-        if self.entity_has_supporting_docs():
-            self.model.documents = self._doc_manager.model_objects()
-
-        self.model.save()
-        self.key = self.model.id
-
-        if len(self.multiple_select_columns) > 0:
-            self.save_multiple_selection(self.multiple_select_columns, self.key)
+    def pending_record(self):
+        """
+        Format the entity data into a record to be inserted by
+        InstanceWriter together with the other records in the batch.
+        :return: Record whose id is set once it has been inserted.
+        :rtype: PendingRecord
+        """
+        table = self.model.__table__
+        values = OrderedDict(
+            (k, v) for k, v in self.column_values().items() if k in table.c
+        )
 
-        return self.key
+        documents = []
+        doc_column = None
+        if self.has_documents:
+            documents = self._doc_manager.model_objects()
+            doc_column = self.entity.supporting_doc.entity_reference.name
+
+        return PendingRecord(
+            table,
+            values,
+            documents,
+            doc_column,
+            _multiple_selection_links(self.multiple_select_columns)
+        )
 
     def save_foreign_key_table(self):
         """
@@ -397,10 +566,7 @@ class Save2DB():
     def column_info(self):
         """
         """
-        self.entity_mapping = {}
-        cols = list(self.entity.columns.values())
-        for c in cols:
-            self.entity_mapping[c.name] = c.TYPE_INFO
+        self.entity_mapping = self.cache.column_types(self.entity)
 
     def get_srid(self, srid):
         """
@@ -443,22 +609,19 @@ class Save2DB():
                 return None
             if len(var) < 4:
                 if var == 'Yes' or var == 'No':
-                    return entity_attr_to_model(col_prop.parent, 'value', var).id
+                    return self.cache.attr_to_model_id(col_prop.parent, 'value', var)
                 if var != 'Yes' and var != 'No':
-                    lk_code = entity_attr_to_id(col_prop.parent, "code", var)
+                    lk_code = self.cache.attr_to_id(col_prop.parent, "code", var)
                     if not str(lk_code).isdigit():
                         return None
                     else:
                         return lk_code
 
             if len(var) > 3:
-                if not str(entity_attr_to_id(col_prop.parent, 'code', var)).isdigit():
-                    id_value = entity_attr_to_model(col_prop.parent, 'value', var)
-                    if id_value is not None:
-                        return id_value.id
-                    # return entity_attr_to_model(col_prop.parent, 'value', var).id
+                if not str(self.cache.attr_to_id(col_prop.parent, 'code', var)).isdigit():
+                    return self.cache.attr_to_model_id(col_prop.parent, 'value', var)
                 else:
-                    lk_code = entity_attr_to_id(col_prop.parent, "code", var)
+                    lk_code = self.cache.attr_to_id(col_prop.parent, "code", var)
                     if not str(lk_code).isdigit():
                         return None
                     else:
@@ -471,21 +634,21 @@ class Save2DB():
                 if len(var) < 1 or var is None:
                     return None
                 elif not len(var) > 3:
-                    var_code = entity_attr_to_id(col_prop.parent, "code", var)
+                    var_code = self.cache.attr_to_id(col_prop.parent, "code", var)
                     if var_code and var_code == var:
                         return None
                     else:
                         return var_code
 
-                elif len(var) > 3 and entity_attr_to_id(col_prop.parent, "name", var) is not None:
-                    var_code = entity_attr_to_id(col_prop.parent, "name", var)
+                elif len(var) > 3 and self.cache.attr_to_id(col_prop.parent, "name", var) is not None:
+                    var_code = self.cache.attr_to_id(col_prop.parent, "name", var)
                     if var_code and var_code == var:
                         return None
                     else:
                         return var_code
                 else:
-                    if entity_attr_to_id(col_prop.parent, "name", var) is None:
-                        var_code = entity_attr_to_id(col_prop.parent, "code", var)
+                    if self.cache.attr_to_id(col_prop.parent, "name", var) is None:
+                        var_code = self.cache.attr_to_id(col_prop.parent, "code", var)
                         if not var_code or var_code == var:
                             return None
             except DummyException:
@@ -499,7 +662,7 @@ class Save2DB():
                 lk_val_list = list(col_parent.values.values())
                 choices_list = []
                 for code in lk_val_list:
-                    choices_list.append(entity_attr_to_id(
+                    choices_list.append(self.cache.attr_to_id(
                         col_parent.association.first_parent, 'value', code.value))
 
                 if len(choices_list) > 1:
@@ -559,26 +722,6 @@ class Save2DB():
         self._doc_manager = None
 
 
-    def ms_columns(self, prefix: str, entity, columns: dict):
-        """
-        Find and cache all multiple select columns in a given entity.
-
-        :param prefix: Two character profile prefix
-        :type prefix: str
-        :param entity: Entity object
-        :type entity: Entity
-        :param columns: Dictionary to hold all multiple select columns
-        :type columns: Dict
-        """
-        #'lookup_table_name': prefix+'_check_'+column.name
-        for column in entity.columns.values():
-            if column.TYPE_INFO =='MULTIPLE_SELECT':
-                columns[column.name] = {
-                        'entity_name':self.form_entity,
-                        'multiple_select_table_name':prefix+'_'+column.name,
-                        'lookup_table_name': prefix+'_'+column.association.first_parent.short_name
-                        }
-
     def process_multiple_select_columns(self, field:str, selected_value):
         """
         Find the ID's of the multiple select values from the lookup tables.
@@ -590,38 +733,354 @@ class Save2DB():
         :type selected_value: str
         """
         lookup_table = self.multiple_select_columns[field]['lookup_table_name']
-        lookup_data = export_data(lookup_table)
-        lookup_values = lookup_data.fetchall()
+        lookup_ids = self.cache.value_ids(lookup_table, 'value')
 
-        values = [f for f in lookup_values]
         sel_list = selected_value.split(' ')
         
         results=[]
         item=''
         for i in range(len(sel_list)):
             item = item+sel_list[i]+' '
-            found = False
-            id = -1
-            for val in values:
-                if item.strip() == val[2]:
-                    found = True
-                    id = val[0]
-                    break
-            if found:
+            id = lookup_ids.get(item.strip(), None)
+            if id is not None:
                 results.append((id, item))
                 item=''
 
         self.multiple_select_columns[field]['selection'] = results
 
     def save_multiple_selection(self, ms_cols, parent_key):
-        for column_name, details in ms_cols.items():
-            ms_table_name = details['multiple_select_table_name']
-            ms_lookup_column_name = details['lookup_table_name']+'_id'
-            ms_parent_column_name = details['entity_name']+'_id'
+        with unit_of_work() as conn:
+            for insert_stmt, lookup_ids in _multiple_selection_links(ms_cols):
+                conn.execute(insert_stmt, [
+                    {'lookup_id': lk_id, 'parent_id': parent_key}
+                    for lk_id in lookup_ids
+                ])
+
+
+def _multiple_selection_links(ms_cols):
+    # Insert statement and selected lookup ids of each multiple select column
+    links = []
+    for column_name, details in ms_cols.items():
+        lookup_ids = [lk_value[0] for lk_value in details.get('selection', [])]
+        if len(lookup_ids) == 0:
+            continue
+
+        insert_stmt = text("Insert into {0} ({1},{2}) VALUES ( :lookup_id, :parent_id )".format(
+            details['multiple_select_table_name'],
+            details['lookup_table_name'] + '_id',
+            details['entity_name'] + '_id'
+        ))
+        links.append((insert_stmt, lookup_ids))
+
+    return links
+
+
+class InstanceWriteError(Exception):
+    """
+    Raised when the records of an instance cannot be ordered for insertion.
+    """
+    pass
+
+
+class PendingRecord():
+    """
+    Record of an instance waiting to be inserted. The values of foreign
+    key columns can be other pending records whose ids are only known once
+    they have been inserted.
+    """
+    def __init__(self, table, values, documents=None, doc_column=None, multiple_selection=None):
+        """
+        :param table: Table of the record.
+        :type table: Table
+        :param values: Column values indexed by column name.
+        :type values: dict
+        :param documents: Supporting document models of the record.
+        :type documents: list
+        :param doc_column: Column, in the supporting document table, that
+        references the record.
+        :type doc_column: str
+        :param multiple_selection: Insert statement and selected lookup ids
+        of each multiple select column.
+        :type multiple_selection: list
+        """
+        self.table = table
+        self.values = values
+        self.documents = documents or []
+        self.doc_column = doc_column
+        self.multiple_selection = multiple_selection or []
+        self.id = None
+
+    def is_ready(self) -> bool:
+        """
+        :return: Returns True if all the records referenced by this record
+        have been inserted.
+        :rtype: bool
+        """
+        return all([v.id is not None for v in self.values.values()
+                    if isinstance(v, PendingRecord)])
+
+    def row(self) -> Dict[FieldName, object]:
+        """
+        :return: Returns the column values with the referenced records
+        replaced by their ids.
+        :rtype: dict
+        """
+        return {
+            k: v.id if isinstance(v, PendingRecord) else v
+            for k, v in self.values.items()
+        }
+
+    def reset(self):
+        """
+        Discards the id of the record and of its supporting documents after
+        the transaction that inserted them has been rolled back.
+        """
+        self.id = None
+        for doc in self.documents:
+            state = inspect(doc)
+            if state.key is None:
+                continue
+
+            make_transient(doc)
+            for column in state.mapper.primary_key:
+                setattr(doc, state.mapper.get_property_by_column(column).key, None)
+
+
+class InstanceRecords():
+    """
+    Records of a single instance file.
+    """
+    def __init__(self, file_name: str, full_file_name: str, source=None):
+        self.file_name = file_name
+        self.full_file_name = full_file_name
+        # Parsed instance the records were read from
+        self.source = source
+        self.records = []
+
+    def reset(self):
+        for record in self.records:
+            record.reset()
 
-            for lk_value in details['selection']:
-                insert_stmt = "Insert into {0} ({1},{2}) VALUES ( {3}, {4} )".format(
-                        ms_table_name, ms_lookup_column_name, ms_parent_column_name,
-                        lk_value[0], parent_key )
-                run_query(insert_stmt)
 
+class InstanceWriter():
+    """
+    Writes the records of GeoODK instances in batches. The records of all
+    the instances in a batch are inserted in one transaction, using one
+    multi-row INSERT statement per table for the records whose parents
+    have already been inserted. The ids of the records are allocated from
+    the sequence of the id column beforehand. If the batch fails, each
+    instance is written again in its own savepoint so that only the
+    failing instances are rolled back.
+    """
+    def __init__(self, cache:ImportCache=None, batch_size:int=IMPORT_BATCH_SIZE):
+        self.cache = cache if cache is not None else ImportCache()
+        self.batch_size = max(1, int(batch_size))
+        self._instances = []
+        # Sequences of the id columns indexed by table name
+        self._id_sequences = {}
+
+    def new_instance(self, file_name: str, full_file_name: str, source=None) -> InstanceRecords:
+        """
+        :param source: Parsed instance the records are read from.
+        :type source: InstanceData
+        :return: Returns an empty container for the records of an instance.
+        :rtype: InstanceRecords
+        """
+        return InstanceRecords(file_name, full_file_name, source)
+
+    def add_record(self, instance:InstanceRecords, entity_name:str,
+                   entity_data:DictWithOrder[FieldName, FieldValue],
+                   parent_data:ParentEntityData) -> PendingRecord:
+        """
+        Format the entity data and add it to the records of the instance.
+        The supporting documents captured in the instance are copied to
+        the document repository.
+        :return: Returns the record, which can be used as a parent of the
+        subsequent records of the instance.
+        :rtype: PendingRecord
+        """
+        entity_add = Save2DB(entity_name, entity_data, parent_data, self.cache)
+        entity_add.objects_from_supporting_doc(instance.full_file_name)
+        record = entity_add.pending_record()
+        entity_add.cleanup()
+        instance.records.append(record)
+
+        return record
+
+    def add_social_tenure(self, instance:InstanceRecords,
+                          str_data:DictWithOrder[FieldName, FieldValue],
+                          parent_data:ParentEntityData) -> PendingRecord:
+        """
+        Add a social tenure relationship, which references the party and
+        spatial unit records in the parent data, to the records of the
+        instance.
+        :return: Returns the record or None if there are no parent records.
+        :rtype: PendingRecord
+        """
+        if not str_data or not parent_data:
+            return None
+
+        return self.add_record(
+            instance, 'social_tenure', {'social_tenure': str_data}, parent_data
+        )
+
+    def add(self, instance:InstanceRecords):
+        """
+        Queue the records of an instance and write the batch once it is
+        full.
+        :return: Returns the instances written and the instances, together
+        with the error, that failed.
+        :rtype: tuple
+        """
+        self._instances.append(instance)
+        if len(self._instances) < self.batch_size:
+            return [], []
+
+        return self.flush()
+
+    def flush(self):
+        """
+        Write the queued instances.
+        :return: Returns the instances written and the instances, together
+        with the error, that failed.
+        :rtype: tuple
+        """
+        instances, self._instances = self._instances, []
+        if len(instances) == 0:
+            return [], []
+
+        try:
+            with unit_of_work() as conn:
+                self._write(conn, instances)
+
+            return instances, []
+        except (SQLAlchemyError, InstanceWriteError) as ex:
+            LOGGER.debug('Batch of %s instances could not be imported: %s',
+                         len(instances), str(ex))
+            error = ex
+
+        for instance in instances:
+            instance.reset()
+
+        if len(instances) == 1:
+            return [], [(instances[0], error)]
+
+        written = []
+        failed = []
+        with unit_of_work() as conn:
+            for instance in instances:
+                savepoint = conn.begin_nested()
+                try:
+                    self._write(conn, [instance])
+                    savepoint.commit()
+                    written.append(instance)
+                except (SQLAlchemyError, InstanceWriteError) as ex:
+                    if savepoint.is_active:
+                        savepoint.rollback()
+                    instance.reset()
+                    failed.append((instance, ex))
+
+        return written, failed
+
+    def _write(self, conn, instances):
+        records = [r for instance in instances for r in instance.records]
+
+        # Records only reference records added before them hence there
+        # should always be a pending record whose parents have been inserted.
+        pending = records
+        while len(pending) > 0:
+            groups = OrderedDict()
+            for record in pending:
+                if record.is_ready():
+                    key = (record.table, tuple(sorted(record.values.keys())))
+                    groups.setdefault(key, []).append(record)
+
+            if len(groups) == 0:
+                raise InstanceWriteError(
+                    '{0} record(s) reference records that are not in the '
+                    'instance.'.format(len(pending))
+                )
+
+            for (table, columns), group in groups.items():
+                self._insert(conn, table, columns, group)
+
+            pending = [r for r in pending if r.id is None]
+
+        self._save_documents(conn, records)
+
+        links = OrderedDict()
+        for record in records:
+            for insert_stmt, lookup_ids in record.multiple_selection:
+                links.setdefault(insert_stmt, []).extend([
+                    {'lookup_id': lk_id, 'parent_id': record.id}
+                    for lk_id in lookup_ids
+                ])
+
+        for insert_stmt, rows in links.items():
+            conn.execute(insert_stmt, rows)
+
+    def _insert(self, conn, table, columns, records):
+        # The ids are allocated before the insert so that each record is
+        # explicitly mapped to its id
+        ids = self._allocate_ids(conn, table, len(records))
+
+        if ids is None:
+            for record in records:
+                record.id = conn.execute(
+                    table.insert().values(record.row()).returning(table.c.id)
+                ).scalar()
+            return
+
+        rows = []
+        for record, record_id in zip(records, ids):
+            row = record.row()
+            row['id'] = record_id
+            rows.append(row)
+
+        conn.execute(table.insert().values(rows))
+
+        for record, record_id in zip(records, ids):
+            record.id = record_id
+
+    def _allocate_ids(self, conn, table, count):
+        """
+        :return: Returns the given number of ids from the sequence of the id
+        column of the table or None if the column has no sequence.
+        :rtype: list
+        """
+        if table.fullname not in self._id_sequences:
+            self._id_sequences[table.fullname] = conn.execute(
+                text('SELECT pg_get_serial_sequence(:table_name, :column_name)'),
+                table_name=table.fullname,
+                column_name='id'
+            ).scalar()
+
+        sequence = self._id_sequences[table.fullname]
+        if sequence is None:
+            return None
+
+        result = conn.execute(
+            text('SELECT nextval(CAST(:sequence AS regclass)) '
+                 'FROM generate_series(1, :count)'),
+            sequence=sequence,
+            count=count
+        )
+
+        return [row[0] for row in result]
+
+    def _save_documents(self, conn, records):
+        doc_records = [r for r in records if len(r.documents) > 0]
+        if len(doc_records) == 0:
+            return
+
+        # Join the transaction of the batch
+        session = Session(bind=conn)
+        try:
+            for record in doc_records:
+                for doc in record.documents:
+                    setattr(doc, record.doc_column, record.id)
+                session.add_all(record.documents)
+
+            session.flush()
+        finally:
+            session.close()
@@ -0,0 +1,243 @@
+"""
+/***************************************************************************
+Name                 : Import Ledger
+Description          : Persistent and indexed record of the GeoODK instances
+                       imported into the database, used to skip instances
+                       that have already been imported.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from typing import (
+    Iterable,
+    List,
+    Set
+)
+
+from stdm.geoodk.importer.import_log import (
+    LOGGER_HOME,
+    ImportLogger
+)
+
+LOGGER = logging.getLogger('stdm')
+
+LEDGER_FILE = 'import_ledger.sqlite'
+
+# Version of the ledger schema, stored in PRAGMA user_version
+LEDGER_VERSION = 1
+
+# Maximum number of values in each IN (...) query
+QUERY_CHUNK_SIZE = 500
+
+_LEDGER_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS imported_instance ('
+    'id INTEGER PRIMARY KEY, '
+    'instance_uuid TEXT NOT NULL, '
+    'content_hash TEXT, '
+    'file_name TEXT NOT NULL, '
+    'device_id TEXT, '
+    'profile TEXT, '
+    'imported_at TEXT NOT NULL)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_imported_instance_uuid '
+    'ON imported_instance (instance_uuid)',
+    'CREATE INDEX IF NOT EXISTS idx_imported_instance_hash '
+    'ON imported_instance (content_hash)',
+    'CREATE INDEX IF NOT EXISTS idx_imported_instance_device '
+    'ON imported_instance (device_id, imported_at)'
+]
+
+# Date format of the legacy JSON import log
+_LEGACY_DATE_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+
+class ImportLedger:
+    """
+    Append-only ledger, in an SQLite database in the GeoODK folder, of the
+    imported instances keyed by the instance UUID. The content hash, device
+    and import time of each instance are indexed so that duplicates
+    submitted under another UUID can be detected and the imports can be
+    queried by device and period. The import log written by earlier
+    versions is migrated when the ledger is created.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: Path of the ledger database, defaults to
+        import_ledger.sqlite in the GeoODK folder.
+        :type path: str
+        """
+        if path is None:
+            if not os.access(LOGGER_HOME, os.F_OK):
+                os.makedirs(str(LOGGER_HOME))
+            path = os.path.normpath(LOGGER_HOME + '/' + LEDGER_FILE)
+
+        self._path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.row_factory = sqlite3.Row
+        self._setup()
+
+    @property
+    def path(self) -> str:
+        """
+        :return: Returns the path of the ledger database.
+        :rtype: str
+        """
+        return self._path
+
+    def _setup(self):
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= LEDGER_VERSION:
+            return
+
+        with self._conn:
+            for sql in _LEDGER_SCHEMA:
+                self._conn.execute(sql)
+            self._migrate_log_data()
+            self._conn.execute('PRAGMA user_version = {0}'.format(LEDGER_VERSION))
+
+    def _migrate_log_data(self):
+        # Copies the file names in the legacy JSON import log
+        log_file = os.path.normpath(LOGGER_HOME + '/import_log.json')
+        if not os.path.isfile(log_file):
+            return
+
+        logger = ImportLogger()
+        rows = []
+        for file_name, log_date in logger.read_log_data().items():
+            try:
+                imported_at = datetime.strptime(log_date, _LEGACY_DATE_FORMAT)
+            except (TypeError, ValueError):
+                imported_at = datetime.now()
+
+            rows.append((
+                logger.log_data_name(file_name),
+                file_name,
+                imported_at.isoformat(timespec='seconds')
+            ))
+
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO imported_instance '
+            '(instance_uuid, file_name, imported_at) VALUES (?, ?, ?)',
+            rows
+        )
+        LOGGER.debug('%s entries migrated from the GeoODK import log.', len(rows))
+
+    def close(self):
+        """
+        Closes the ledger database.
+        """
+        self._conn.close()
+
+    def imported_uuids(self, uuids: Iterable[str]) -> Set[str]:
+        """
+        :param uuids: UUIDs of the instances.
+        :type uuids: list
+        :return: Returns the UUIDs, among those given, of the instances
+        that have been imported.
+        :rtype: set
+        """
+        uuids = list(set(uuids))
+        imported = set()
+        for i in range(0, len(uuids), QUERY_CHUNK_SIZE):
+            chunk = uuids[i:i + QUERY_CHUNK_SIZE]
+            sql = 'SELECT instance_uuid FROM imported_instance ' \
+                  'WHERE instance_uuid IN ({0})'.format(', '.join(['?'] * len(chunk)))
+            imported.update([r[0] for r in self._conn.execute(sql, chunk)])
+
+        return imported
+
+    def is_imported(self, uuid: str, content_hash: str = None) -> bool:
+        """
+        :param uuid: UUID of the instance.
+        :type uuid: str
+        :param content_hash: Hash of the content of the instance file.
+        :type content_hash: str
+        :return: Returns True if an instance with the given UUID or
+        content has been imported.
+        :rtype: bool
+        """
+        row = self._conn.execute(
+            'SELECT 1 FROM imported_instance WHERE instance_uuid = ? '
+            'OR content_hash = ? LIMIT 1',
+            (uuid, content_hash)
+        ).fetchone()
+
+        return row is not None
+
+    def record(self, instances: list, profile: str = None):
+        """
+        Appends the imported instances to the ledger. Instances whose UUID
+        is already in the ledger are ignored.
+        :param instances: Imported instances.
+        :type instances: list(InstanceData)
+        :param profile: Name of the profile the instances were imported
+        into.
+        :type profile: str
+        """
+        imported_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (i.uuid, i.content_hash, i.file_name, i.device_id, profile, imported_at)
+            for i in instances
+        ]
+
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO imported_instance '
+                '(instance_uuid, content_hash, file_name, device_id, profile, '
+                'imported_at) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def imports(self, device_id: str = None, start: datetime = None,
+                end: datetime = None, profile: str = None) -> List[sqlite3.Row]:
+        """
+        Queries the imported instances e.g. those imported from a device
+        in a given week.
+        :param device_id: Identifier of the device the instances were
+        collected on.
+        :type device_id: str
+        :param start: Start, inclusive, of the import period.
+        :type start: datetime
+        :param end: End, exclusive, of the import period.
+        :type end: datetime
+        :param profile: Name of the profile.
+        :type profile: str
+        :return: Returns the matching entries ordered by import time.
+        :rtype: list
+        """
+        criteria = []
+        params = []
+        if device_id is not None:
+            criteria.append('device_id = ?')
+            params.append(device_id)
+        if start is not None:
+            criteria.append('imported_at >= ?')
+            params.append(start.isoformat(timespec='seconds'))
+        if end is not None:
+            criteria.append('imported_at < ?')
+            params.append(end.isoformat(timespec='seconds'))
+        if profile is not None:
+            criteria.append('profile = ?')
+            params.append(profile)
+
+        sql = 'SELECT * FROM imported_instance'
+        if len(criteria) > 0:
+            sql += ' WHERE ' + ' AND '.join(criteria)
+        sql += ' ORDER BY imported_at, id'
+
+        return self._conn.execute(sql, params).fetchall()
@@ -0,0 +1,379 @@
+"""
+/***************************************************************************
+Name                 : Instance Reader
+Description          : Parses GeoODK instance files one at a time into plain
+                       dictionaries and prefetches them in a background
+                       thread or in worker processes so that parsing
+                       overlaps with the import.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from collections import (
+    OrderedDict,
+    deque
+)
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Iterator,
+    List,
+    Tuple
+)
+from xml.etree.ElementTree import (
+    ParseError,
+    iterparse
+)
+
+LOGGER = logging.getLogger('stdm')
+
+STR_ENTITY = 'social_tenure'
+
+# Metadata elements of an instance
+INSTANCE_ID = 'instanceID'
+DEVICE_ID = 'deviceid'
+
+# Number of parsed instances waiting to be imported
+PREFETCH_SIZE = 4
+
+# Number of instance files parsed by each task of a worker process
+PARSE_BATCH_SIZE = 16
+
+# Number of parse tasks queued per worker process
+TASKS_PER_WORKER = 2
+
+EntityName = str
+FieldData = 'OrderedDict[str, str]'
+EntityInstances = 'OrderedDict[EntityName, FieldData]'
+
+
+class InstanceData:
+    """
+    Plain data of a single instance file. The entity data is split, as
+    for InstanceUUIDExtractor.instance_data_from_nodelist, into entities
+    occurring once, indexed by entity name, and repeated entities indexed
+    by the position of the occurrence followed by the entity name.
+    The UUID is the instance ID without colons, as used to name the
+    instance files.
+    """
+
+    def __init__(self, file_name: str, full_file_name: str):
+        self.file_name = file_name
+        self.full_file_name = full_file_name
+        self.uuid = os.path.splitext(file_name)[0]
+        self.device_id = None
+        self.content_hash = None
+        self.single_entities = OrderedDict()
+        self.repeated_entities = OrderedDict()
+        self.single_str = OrderedDict()
+        self.repeated_str = OrderedDict()
+        self.has_str_data = False
+
+
+def _local_name(tag: str) -> str:
+    # Drop the namespace, if any, from the element tag
+    return tag.rsplit('}', 1)[-1]
+
+
+def _field_values(element) -> 'OrderedDict[str, str]':
+    fields = OrderedDict()
+    for child in element:
+        fields[_local_name(child.tag)] = ''.join(child.itertext())
+
+    return fields
+
+
+def _split_occurrences(occurrences: 'OrderedDict[EntityName, list]') -> Tuple[EntityInstances, EntityInstances]:
+    instances = OrderedDict()
+    repeated_instances = OrderedDict()
+
+    for entity_name, entity_fields in occurrences.items():
+        if len(entity_fields) > 1:
+            for i, fields in enumerate(entity_fields):
+                repeated_instances['{}'.format(i) + entity_name] = fields
+        else:
+            instances[entity_name] = entity_fields[0]
+
+    return instances, repeated_instances
+
+
+def parse_instance(full_file_name: str, profile: str, entities: List[EntityName]) -> InstanceData:
+    """
+    Parses an instance file incrementally and extracts the data of the
+    given entities and of the social tenure relationship. Only the entities
+    which are direct children of the profile element are extracted, each
+    element is discarded once its data has been read. The instance ID,
+    device ID and the hash of the file content are also read.
+    :param full_file_name: Path of the instance file.
+    :type full_file_name: str
+    :param profile: Name of the profile element i.e. the profile name with
+    spaces replaced by underscores.
+    :type profile: str
+    :param entities: Names of the entities to extract.
+    :type entities: list
+    :return: Returns the data of the instance.
+    :rtype: InstanceData
+    """
+    instance = InstanceData(
+        os.path.basename(full_file_name), full_file_name
+    )
+    with open(full_file_name, 'rb') as f:
+        content = f.read()
+    instance.content_hash = hashlib.sha256(content).hexdigest()
+
+    wanted = set(entities)
+    wanted.add(STR_ENTITY)
+
+    # Entities which are direct children of the profile element
+    profile_entities = set()
+    occurrences = OrderedDict()
+    path = []
+    profile_read = False
+
+    for event, element in iterparse(io.BytesIO(content), events=('start', 'end')):
+        name = _local_name(element.tag)
+
+        if event == 'start':
+            if path and path[-1] == profile and not profile_read:
+                profile_entities.add(name)
+            path.append(name)
+            continue
+
+        path.pop()
+
+        if name == INSTANCE_ID and element.text and not profile_read:
+            instance.uuid = element.text.strip().replace(':', '')
+        elif name == DEVICE_ID and element.text and path[-1:] == [profile]:
+            instance.device_id = element.text.strip()
+
+        if name in wanted:
+            occurrences.setdefault(name, []).append(_field_values(element))
+            # The text of nested entities is part of the enclosing entity
+            if wanted.isdisjoint(path):
+                element.clear()
+
+        elif name == profile:
+            # Only the first profile element is considered
+            profile_read = True
+
+        elif len(path) > 0 and path[-1] == profile:
+            element.clear()
+
+    del content
+
+    str_occurrences = OrderedDict()
+    entity_occurrences = OrderedDict()
+    for name, entity_fields in occurrences.items():
+        if name not in profile_entities:
+            continue
+
+        if name == STR_ENTITY:
+            str_occurrences[name] = entity_fields
+        if name in entities:
+            entity_occurrences[name] = entity_fields
+
+    instance.single_entities, instance.repeated_entities = \
+        _split_occurrences(entity_occurrences)
+    instance.single_str, instance.repeated_str = \
+        _split_occurrences(str_occurrences)
+    instance.has_str_data = len(str_occurrences) > 0
+
+    return instance
+
+
+def iter_instances(file_names: List[str], profile: str, entities: List[EntityName]) -> Iterator[InstanceData]:
+    """
+    Parses the instance files one at a time.
+    :return: Returns a generator of the data of the existing instance
+    files.
+    :rtype: generator
+    """
+    for full_file_name in file_names:
+        if os.path.isfile(full_file_name):
+            yield parse_instance(full_file_name, profile, entities)
+
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch_instances(file_names: List[str], profile: str, entities: List[EntityName],
+                       prefetch_size: int = PREFETCH_SIZE) -> Iterator[InstanceData]:
+    """
+    Parses the instance files in a background thread while the caller
+    imports the instances already parsed. At most prefetch_size parsed
+    instances are held in memory. Parsing errors are raised by the
+    generator. Closing the generator stops the background thread.
+    :return: Returns a generator of the data of the existing instance
+    files.
+    :rtype: generator
+    """
+    items = queue.Queue(maxsize=max(1, prefetch_size))
+    stop = threading.Event()
+
+    def put(item):
+        # Give up when the consumer has stopped
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for instance in iter_instances(file_names, profile, entities):
+                if not put(instance):
+                    return
+        except Exception as ex:
+            put(_Failure(ex))
+            return
+
+        put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def parse_instances(file_names: List[str], profile: str, entities: List[EntityName]) -> List[InstanceData]:
+    """
+    Parses a batch of instance files. This is the task run by the worker
+    processes of parallel_instances.
+    :return: Returns the data of the existing instance files.
+    :rtype: list
+    """
+    return list(iter_instances(file_names, profile, entities))
+
+
+def _python_executable():
+    # The interpreter used to start the worker processes. When embedded, as
+    # in QGIS, sys.executable is the host application rather than Python.
+    if 'python' in os.path.basename(sys.executable).lower():
+        return sys.executable
+
+    for folder in (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin')):
+        for name in ('python.exe', 'python3', 'python'):
+            executable = os.path.join(folder, name)
+            if os.path.isfile(executable):
+                return executable
+
+    return None
+
+
+def _process_pool(workers: int):
+    executable = _python_executable()
+    if executable is None:
+        return None
+
+    # Forking the GUI process is unsafe, start fresh interpreters instead
+    context = multiprocessing.get_context('spawn')
+    context.set_executable(executable)
+
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def parallel_instances(file_names: List[str], profile: str, entities: List[EntityName],
+                       workers: int = None,
+                       batch_size: int = PARSE_BATCH_SIZE) -> Iterator[InstanceData]:
+    """
+    Parses the instance files in batches in a pool of worker processes
+    while the caller imports the instances already parsed. The instances
+    are yielded in the order of the files and at most TASKS_PER_WORKER
+    batches per worker are parsed ahead of the caller. Falls back to
+    prefetch_instances if there are too few files to be worth starting
+    the workers or if the workers cannot be started.
+    :param workers: Number of worker processes, defaults to the number of
+    processors.
+    :type workers: int
+    :param batch_size: Number of instance files parsed by each task.
+    :type batch_size: int
+    :return: Returns a generator of the data of the existing instance
+    files.
+    :rtype: generator
+    """
+    workers = workers or os.cpu_count() or 1
+    batch_size = max(1, batch_size)
+    executor = None
+
+    if workers > 1 and len(file_names) > batch_size:
+        try:
+            executor = _process_pool(workers)
+        except (OSError, ValueError) as ex:
+            LOGGER.debug('Instance parsing processes could not be started: %s', str(ex))
+
+    if executor is None:
+        yield from prefetch_instances(file_names, profile, entities)
+        return
+
+    # Index of the first file of each pending task
+    pending = deque()
+    next_file = 0
+
+    try:
+        while next_file < len(file_names) or len(pending) > 0:
+            while next_file < len(file_names) and len(pending) < workers * TASKS_PER_WORKER:
+                batch = file_names[next_file:next_file + batch_size]
+                pending.append(
+                    (next_file, executor.submit(parse_instances, batch, profile, entities))
+                )
+                next_file += len(batch)
+
+            first_file, task = pending[0]
+            try:
+                instances = task.result()
+            except ParseError:
+                raise
+            except Exception as ex:
+                # The workers failed rather than the parsing, parse the
+                # remaining files in this process.
+                LOGGER.debug('Instance parsing processes failed: %s', str(ex))
+                for _, remaining_task in pending:
+                    remaining_task.cancel()
+                pending.clear()
+                yield from prefetch_instances(file_names[first_file:], profile, entities)
+                return
+
+            pending.popleft()
+            for instance in instances:
+                yield instance
+    finally:
+        for _, task in pending:
+            task.cancel()
+        executor.shutdown(wait=True)
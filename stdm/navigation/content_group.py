@@ -136,6 +136,8 @@ class ContentGroup(QObject, HashableMixin):
         Registers the content items into the database. Registration only works for a
         postgres user account.
         """
+        from stdm.security.permission_matrix import PermissionMatrix
+
         PG_ACCOUNT = "postgres"
 
         if self._username == PG_ACCOUNT:
@@ -173,6 +175,9 @@ class ContentGroup(QObject, HashableMixin):
                                 existingContents.append(c)
                                 role.contents = existingContents
                                 role.update()
+
+                        # Newly registered content is not in the matrix
+                        PermissionMatrix.instance().invalidate()
         else:
             for c in self.contentItems():
                 if isinstance(c, Content):
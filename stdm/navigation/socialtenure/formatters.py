@@ -20,7 +20,11 @@ email                : stdm@unhabitat.org
  *                                                                         *
  ***************************************************************************/
 """
-from collections import OrderedDict
+from collections import (
+    defaultdict,
+    OrderedDict
+)
+from itertools import islice
 
 from qgis.PyQt.QtWidgets import (
     QApplication
@@ -48,6 +52,72 @@ from stdm.utils.util import (
     lookup_id_to_value
 )
 
+# Maximum number of nodes whose related models are fetched in one query
+LOAD_BATCH_SIZE = 500
+
+
+class BatchLoader:
+    """
+    Loads the related models of several nodes in one query. The keys of
+    the nodes are registered as the nodes are created and, when the models
+    of one of them are first requested, those of the other nodes still
+    waiting to be loaded are fetched along with them.
+    """
+
+    def __init__(self, fetch, default_factory=list,
+                 batch_size=LOAD_BATCH_SIZE):
+        """
+        :param fetch: Callable which takes a list of keys and returns the
+        related models indexed by key.
+        :type fetch: callable
+        :param default_factory: Callable which creates the models returned
+        for a key that has no related models.
+        :type default_factory: callable
+        :param batch_size: Maximum number of keys in each query.
+        :type batch_size: int
+        """
+        self._fetch = fetch
+        self._default_factory = default_factory
+        self._batch_size = batch_size
+        self._pending = OrderedDict()
+        self._loaded = {}
+
+    def register(self, key):
+        """
+        Registers the key of a node whose models will be requested.
+        """
+        if key is not None and key not in self._loaded:
+            self._pending[key] = None
+
+    def load(self, key):
+        """
+        :return: Returns the models related to the given key.
+        """
+        if key is None:
+            return self._default_factory()
+
+        if key not in self._loaded:
+            self._pending.pop(key, None)
+            keys = [key] + list(islice(self._pending, self._batch_size - 1))
+            for k in keys[1:]:
+                del self._pending[k]
+
+            results = self._fetch(keys)
+            for k in keys:
+                if k in results:
+                    self._loaded[k] = results[k]
+                else:
+                    self._loaded[k] = self._default_factory()
+
+        return self._loaded[key]
+
+    def clear(self):
+        """
+        Removes all registered keys and loaded models.
+        """
+        self._pending.clear()
+        self._loaded.clear()
+
 
 class STRNodeFormatter:
     """
@@ -149,6 +219,21 @@ class EntityNodeFormatter(STRNodeFormatter):
         )
         self._spatial_data_sources = list(profile_spatial_tables(self.curr_profile).keys())
 
+        # Loaders for the child nodes, which are created when the parent
+        # node is first expanded.
+        self._valid_str_ids = None
+        self._str_loader = BatchLoader(self._fetch_related_str_models)
+        self._str_doc_loader = BatchLoader(
+            self._fetch_str_doc_models, OrderedDict
+        )
+        self._related_loaders = {}
+        for str_col, mod_table, mod_col in self._fk_references:
+            if mod_table != self._config.data_source_name:
+                self._related_loaders[mod_table] = BatchLoader(
+                    lambda keys, t=mod_table, c=mod_col:
+                    self._models_by_fk_reference(t, c, keys)
+                )
+
     def _format_display_mapping(self, model, display_cols, filter_cols):
         """
         Creates a collection containing a tuple of column name and display
@@ -228,6 +313,60 @@ class EntityNodeFormatter(STRNodeFormatter):
             entity_model, ent_col, self._str_model, str_col
         )
 
+    def _fetch_related_str_models(self, keys):
+        """
+        :param keys: Values of the column of the data source referenced by
+        the social tenure relationship table.
+        :type keys: list
+        :return: Returns the related SocialTenureRelationship models
+        indexed by the value of the referenced column.
+        :rtype: dict
+        """
+        if self._current_data_source_fk_ref is None:
+            return {}
+
+        str_col = self._current_data_source_fk_ref[1]
+
+        return self._models_by_fk_reference(self._str_model, str_col, keys)
+
+    def _str_doc_link_column(self):
+        """
+        :return: Returns the column in the supporting document table that
+        references the social tenure relationship table or None if there
+        is no supporting document table.
+        :rtype: str
+        """
+        from stdm.data.supporting_documents import supporting_doc_tables
+
+        if self._str_ref not in self._entity_supporting_doc_tables:
+            doc_tables = supporting_doc_tables(self._str_ref)
+            if len(doc_tables) == 0:
+                return None
+
+            self._entity_supporting_doc_tables[self._str_ref] = doc_tables[0]
+
+        return self._entity_supporting_doc_tables[self._str_ref][0]
+
+    def _fetch_str_doc_models(self, str_ids):
+        """
+        :param str_ids: Ids of social tenure relationship records.
+        :type str_ids: list
+        :return: Returns the supporting document models indexed by the id
+        of the social tenure relationship record.
+        :rtype: dict
+        """
+        from stdm.data.supporting_documents import document_models_by_link
+
+        doc_link_col = self._str_doc_link_column()
+        if doc_link_col is None:
+            return {}
+
+        return document_models_by_link(
+            self.curr_profile.social_tenure,
+            doc_link_col,
+            str_ids
+        )
+
     def is_str_defined(self, entity_model):
         """
         :param entity_model: Related STR entity
@@ -289,8 +428,9 @@ class EntityNodeFormatter(STRNodeFormatter):
 
     def _create_str_node(self, parent_node, str_model, **kwargs):
         """
-        Creates an STR Node and corresponding child nodes (from related
-        entities).
+        Creates an STR Node. The nodes of the related entities and the
+        supporting documents are loaded when the node is first expanded or
+        the documents first requested.
         :param parent_node: Parent node
         :param str_model: STR model
         :param kwargs: Optional arguments to be passed to the STR node.
@@ -302,40 +442,62 @@ class EntityNodeFormatter(STRNodeFormatter):
                                                        self._str_model_disp_mapping,
                                                        self._str_num_char_cols)
 
-        doc_models = self._supporting_doc_models(self._str_ref, str_model)
+        self._str_doc_loader.register(str_model.id)
 
         str_node = STRNode(display_mapping, parent=parent_node,
-                           document_models=doc_models,
+                           document_loader=self._load_str_documents,
                            model=str_model, **kwargs)
 
-        # Get related entities and create their corresponding nodes
-        for fkr in self._fk_references:
-            str_col, mod_table, mod_col = fkr[0], fkr[1], fkr[2]
+        # Register the related entities so that those of sibling STR nodes
+        # are fetched together.
+        for str_col, mod_table, mod_col in self._fk_references:
+            if mod_table in self._related_loaders:
+                self._related_loaders[mod_table].register(
+                    getattr(str_model, str_col, None)
+                )
 
-            if mod_table != self._config.data_source_name:
-                mod_fk_ref = mod_col, mod_table, str_col
+        str_node.setChildLoader(self._load_str_children)
 
-                r_entities = self._models_from_fk_reference(str_model, str_col,
-                                                            mod_table, mod_col)
-                curr_entity = self.curr_profile.entity_by_name(mod_table)
+        return str_node
 
-                col_name_header = entity_display_columns(curr_entity, True)
+    def _load_str_documents(self, str_node):
+        """
+        :return: Returns the supporting document models of the STR node.
+        """
+        return self._str_doc_loader.load(str_node.model().id)
 
-                for r in r_entities:
-                    dm = self._format_display_mapping(r,
-                                                      col_name_header,
-                                                      list(col_name_header.keys()))
+    def _load_str_children(self, str_node):
+        """
+        Creates the nodes of the entities related to the STR node.
+        :param str_node: STR node
+        :type str_node: STRNode
+        """
+        str_model = str_node.model()
 
-                    node = self._spatial_textual_node(mod_table)
+        for str_col, mod_table, mod_col in self._fk_references:
+            if mod_table not in self._related_loaders:
+                continue
 
-                    mod_table = mod_table.replace(self.curr_profile.prefix, '')
-                    entity_node = node(dm, parent=str_node,
-                                       header=mod_table.replace('_',
-                                                                ' ').title(),
-                                       isChild=True,
-                                       model=r)
+            r_entities = self._related_loaders[mod_table].load(
+                getattr(str_model, str_col, None)
+            )
+            curr_entity = self.curr_profile.entity_by_name(mod_table)
 
-        return str_node
+            col_name_header = entity_display_columns(curr_entity, True)
+
+            node = self._spatial_textual_node(mod_table)
+            header = mod_table.replace(self.curr_profile.prefix, '')
+
+            for r in r_entities:
+                dm = self._format_display_mapping(r,
+                                                  col_name_header,
+                                                  list(col_name_header.keys()))
+
+                entity_node = node(dm, parent=str_node,
+                                   header=header.replace('_',
+                                                         ' ').title(),
+                                   isChild=True,
+                                   model=r)
 
     def _models_from_fk_reference(self, source_model, source_column,
                                   referenced_model, referenced_column):
@@ -343,40 +505,70 @@ class EntityNodeFormatter(STRNodeFormatter):
         :return: Retrieves data models based on the foreign key reference
         information.
         """
-        ref_model = referenced_model
-
         if hasattr(source_model, source_column):
             source_col_value = getattr(source_model, source_column)
 
-            # Create model if string is used as referenced model
-            if isinstance(ref_model, str):
-                ref_model = DeclareMapping.instance().tableMapping(ref_model)
+            return self._models_by_fk_reference(
+                referenced_model, referenced_column, [source_col_value]
+            ).get(source_col_value, [])
 
-            if ref_model is None:
-                return []
+        return []
+
+    def _models_by_fk_reference(self, referenced_model, referenced_column,
+                                values):
+        """
+        Retrieves, in one query, the data models whose referenced column
+        matches any of the given values.
+        :param referenced_model: Model or table name.
+        :type referenced_model: object
+        :param referenced_column: Name of the referenced column.
+        :type referenced_column: str
+        :param values: Values of the referenced column.
+        :type values: list
+        :return: Returns the lists of data models indexed by value.
+        :rtype: dict
+        """
+        ref_model = referenced_model
 
-            if hasattr(ref_model, referenced_column):
-                col_prop = getattr(ref_model, referenced_column)
+        # Create model if string is used as referenced model
+        if isinstance(ref_model, str):
+            ref_model = DeclareMapping.instance().tableMapping(ref_model)
 
-                # Get property type so that the filter can be applied according to the appropriate type
-                col_prop_type = col_prop.property.columns[0].type
+        if ref_model is None or not hasattr(ref_model, referenced_column):
+            return {}
 
-                ref_model_instance = ref_model()
-                ref_query_obj = ref_model_instance.queryObject()
+        values = [v for v in values if v is not None]
+        if len(values) == 0:
+            return {}
 
-                if not isinstance(col_prop_type, String):
-                    results = ref_query_obj.filter(col_prop == source_col_value).all()
+        col_prop = getattr(ref_model, referenced_column)
 
-                else:
-                    results = ref_query_obj.filter(func.lower(col_prop) == func.lower(source_col_value)).all()
+        # Get property type so that the filter can be applied according to the appropriate type
+        col_prop_type = col_prop.property.columns[0].type
 
-                if len(results) == 0:
-                    return []
+        ref_model_instance = ref_model()
+        ref_query_obj = ref_model_instance.queryObject()
 
-                else:
-                    return results
+        results = defaultdict(list)
 
-        return []
+        if not isinstance(col_prop_type, String):
+            for r in ref_query_obj.filter(col_prop.in_(values)).all():
+                results[getattr(r, referenced_column)].append(r)
+
+        else:
+            # Match the values regardless of case
+            lower_values = defaultdict(list)
+            for v in values:
+                lower_values[str(v).lower()].append(v)
+
+            for r in ref_query_obj.filter(
+                    func.lower(col_prop).in_(list(lower_values.keys()))
+            ).all():
+                ref_value = getattr(r, referenced_column)
+                for v in lower_values[str(ref_value).lower()]:
+                    results[v].append(r)
+
+        return results
 
     def _is_spatial_data_source(self, ds):
         """
@@ -406,9 +598,39 @@ class EntityNodeFormatter(STRNodeFormatter):
         else:
             return EntityNode
 
+    def _load_entity_children(self, entity_node):
+        """
+        Creates the STR nodes of the entity node.
+        :param entity_node: Node of a party or spatial unit record.
+        :type entity_node: EntityNode
+        """
+        ent_col = self._current_data_source_fk_ref[0]
+        str_entities = self._str_loader.load(
+            getattr(entity_node.model(), ent_col, None)
+        )
+
+        # Show no STR
+        if len(str_entities) == 0:
+            NoSTRNode(entity_node)
+
+        else:
+            for s in str_entities:
+                # if no validity period is specified or
+                # the str is within the validity period specified
+                if self._valid_str_ids is None or s.id in self._valid_str_ids:
+                    self._create_str_node(
+                        entity_node, s,
+                        isChild=True,
+                        header=self._str_title
+                    )
+                # if the str is not valid, show invalid STR
+                else:
+                    InvalidSTRNode(entity_node)
+
     def root(self, valid_str_ids=None):
         """
-        Root method shows the different tree nodes based on data.
+        Root method shows the different tree nodes based on data. The
+        child nodes are loaded when their parent node is first expanded.
 
         :param valid_str_ids: List of valid str nodes
         within the validity period.
@@ -416,6 +638,8 @@ class EntityNodeFormatter(STRNodeFormatter):
         :return:
         :rtype:
         """
+        self._valid_str_ids = valid_str_ids
+
         for ed in self._data:
             disp_mapping = self._format_display_mapping(ed,
                                                         self._config.displayColumns,
@@ -427,34 +651,15 @@ class EntityNodeFormatter(STRNodeFormatter):
                 node = self._spatial_textual_node(self._config.data_source_name)
                 entity_node = node(disp_mapping, parent=self.rootNode,
                                    model=ed)
-                str_entities = self._related_str_models(ed)
 
-                # Show no STR
-                if len(str_entities) == 0:
+                if self._current_data_source_fk_ref is None:
                     no_str_node = NoSTRNode(entity_node)
+                    continue
 
-                else:
-                    for s in str_entities:
-                        # if no validity period is specified
-                        if valid_str_ids is None:
-
-                            str_node = self._create_str_node(
-                                entity_node, s,
-                                isChild=True,
-                                header=self._str_title
-                            )
-                        # if validity period is specified
-                        else:
-                            # the str is within the validity period specified
-                            if s.id in valid_str_ids:
-                                str_node = self._create_str_node(
-                                    entity_node, s,
-                                    isChild=True,
-                                    header=self._str_title
-                                )
-                            # if the str is not valid, show invalid STR
-                            else:
-                                no_str_node = InvalidSTRNode(entity_node)
+                self._str_loader.register(
+                    getattr(ed, self._current_data_source_fk_ref[0], None)
+                )
+                entity_node.setChildLoader(self._load_entity_children)
 
             else:
                 # The parent node now refers to STR data so we render accordingly
@@ -58,6 +58,9 @@ class BaseSTRNode:
         self._view = view
         self._parentWidget = parentWidget
         self._model = model
+        # Callable that creates the remaining children when the node is
+        # first expanded.
+        self._child_loader = None
 
         if parent is not None:
             parent.addChild(self)
@@ -150,6 +153,55 @@ class BaseSTRNode:
         """
         return len(self._children)
 
+    def setChildLoader(self, loader):
+        """
+        Set the callable that creates the remaining child nodes of this
+        node when it is first expanded. It is called with this node as the
+        only argument and should create the child nodes with this node as
+        the parent.
+        """
+        self._child_loader = loader
+
+    def canFetchMore(self):
+        """
+        True if there are child nodes that have not yet been loaded.
+        """
+        return self._child_loader is not None
+
+    def hasChildren(self):
+        """
+        True if the node has child nodes, including those that have not
+        yet been loaded.
+        """
+        return len(self._children) > 0 or self.canFetchMore()
+
+    def fetchChildren(self):
+        """
+        Creates the child nodes that have not yet been loaded. The new
+        children are detached from the node and returned so that the
+        caller can add them between the appropriate model notifications.
+        :return: New child nodes.
+        :rtype: list
+        """
+        loader = self._child_loader
+        if loader is None:
+            return []
+
+        self._child_loader = None
+
+        count = len(self._children)
+        loader(self)
+        new_children = self._children[count:]
+        del self._children[count:]
+
+        return new_children
+
+    def addChildren(self, children):
+        """
+        Add the children, previously returned by fetchChildren, to the node.
+        """
+        self._children.extend(children)
+
     def children(self):
         """
         Returns all the node's children as a list.
@@ -441,6 +493,9 @@ class SupportsDocumentsNode(BaseSTRNode):
 
     def __init__(self, *args, **kwargs):
         self._doc_models = kwargs.pop('document_models', [])
+        # Callable that returns the document models, when first requested,
+        # given the node.
+        self._doc_loader = kwargs.pop('document_loader', None)
         super(SupportsDocumentsNode, self).__init__(*args, **kwargs)
 
     def documents(self):
@@ -448,12 +503,18 @@ class SupportsDocumentsNode(BaseSTRNode):
         Returns a list of supporting document models for the given entity
         represented by the node.
         """
+        if self._doc_loader is not None:
+            loader = self._doc_loader
+            self._doc_loader = None
+            self._doc_models = loader(self)
+
         return self._doc_models
 
     def add_document_model(self, doc_model):
-        self._doc_models.append(doc_model)
+        self.documents().append(doc_model)
 
     def set_document_models(self, doc_models):
+        self._doc_loader = None
         self._doc_models = doc_models
 
     def typeInfo(self):
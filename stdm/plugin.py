@@ -62,6 +62,7 @@ from stdm.composer.custom_layout_items import StdmCustomLayoutItems
 from stdm.composer.document_template import DocumentTemplate
 from stdm.data import globals
 from stdm.data.configfile_paths import FilePaths
+from stdm.data.configuration import invalidate_entity_models
 from stdm.data.configuration.column_updaters import varchar_updater
 from stdm.data.configuration.config_updater import ConfigurationSchemaUpdater
 from stdm.data.configuration.exception import ConfigurationException
@@ -70,6 +71,7 @@ from stdm.data.database import (
     STDMDb
 )
 from stdm.data.database import alchemy_table
+from stdm.data.schema_catalog import SchemaCatalog
 from stdm.data.pg_utils import (
     pg_table_exists,
     spatial_tables,
@@ -84,6 +86,7 @@ from stdm.navigation.container_loader import (
     QtContainerLoader,
     ContentGroup)
 from stdm.navigation.content_group import TableContentGroup
+from stdm.security.permission_matrix import PermissionMatrix
 from stdm.security.privilege_provider import SinglePrivilegeProvider
 from stdm.security.roleprovider import RoleProvider
 from stdm.security.user import User
@@ -2173,7 +2176,11 @@ class STDMQGISLoader:
 
                 # Clear singleton ref for SQLAlchemy connections
                 if globals.APP_DBCONN is not None:
+                    STDMDb.instance().dispose()
                     STDMDb.cleanUp()
+                    invalidate_entity_models()
+                    SchemaCatalog.instance().invalidate()
+                    PermissionMatrix.instance().invalidate()
                     DeclareMapping.cleanUp()
                 # Remove database reference
                 globals.APP_DBCONN = None
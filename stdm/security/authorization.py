@@ -17,10 +17,8 @@ email                : gkahiu@gmail.com
  *                                                                         *
  ***************************************************************************/
 """
-from stdm.data.database import Content
 from stdm.exceptions import DummyException
-from stdm.security.roleprovider import RoleProvider
-from stdm.utils.util import getIndex
+from stdm.security.permission_matrix import PermissionMatrix
 
 
 class RoleMapper:
@@ -42,37 +40,24 @@ class Authorizer:
         """
         Get roles that the user belongs to
         """
-        roleProvider = RoleProvider()
-        self.userRoles = roleProvider.GetRolesForUser(self.username)
         """
-        If user name is postgres then add it to the list of user roles since
-        it is not a group role in PostgreSQL but content is initialized by
-        morphing it as a role in registering content items
+        If user name is postgres then it is added to the list of user roles
+        since it is not a group role in PostgreSQL but content is initialized
+        by morphing it as a role in registering content items
         """
-        pg_account = 'postgres'
-        if self.username == pg_account:
-            self.userRoles.append(pg_account)
+        self.userRoles = PermissionMatrix.instance().user_roles(self.username)
 
     def CheckAccess(self, contentCode):
         """
         Assert whether the given user has permissions to access a content
-        item with the gien code.
+        item with the gien code. The roles are read from the permission
+        matrix which is loaded once rather than queried for each item.
         """
         hasPermission = False
         # Get roles with permission
         try:
-            cnt = Content()
-            qo = cnt.queryObject()
-            """
-            cntRef = qo.filter(Content.code == contentCode).first()
-            """
-            cntRef = qo.filter(Content.code == contentCode).first()
-            if cntRef is not None:
-                cntRoles = cntRef.roles
-                for rl in cntRoles:
-                    if getIndex(self.userRoles, rl.name) != -1:
-                        hasPermission = True
-                        break
+            cntRoles = PermissionMatrix.instance().content_roles(contentCode)
+            hasPermission = not cntRoles.isdisjoint(self.userRoles)
         except DummyException:
             """
             Current user does not have permission to access the content tables.
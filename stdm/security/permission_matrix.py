@@ -0,0 +1,137 @@
+"""
+/***************************************************************************
+Name                 : Permission Matrix
+Description          : Keeps the roles granted access to each content item
+                       and the roles of each user in memory so that access
+                       checks do not query the database.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import logging
+from collections import defaultdict
+
+from sqlalchemy.sql.expression import text
+
+from stdm.data.database import Singleton
+from stdm.data.pg_utils import _execute_read
+
+LOGGER = logging.getLogger('stdm')
+
+# The postgres account is not a group role but content items are registered
+# against it as if it were one.
+PG_ACCOUNT = 'postgres'
+
+_CONTENT_ROLES_SQL = 'SELECT content_base.code, role.name FROM content_base ' \
+                     'JOIN content_roles ON content_roles.content_base_id = content_base.id ' \
+                     'JOIN role ON role.id = content_roles.role_id;'
+
+_USER_ROLES_SQL = 'SELECT pg_user.usename, pg_roles.rolname FROM pg_user ' \
+                  'JOIN pg_auth_members ON pg_user.usesysid = pg_auth_members.member ' \
+                  'JOIN pg_roles ON pg_roles.oid = pg_auth_members.roleid;'
+
+
+@Singleton
+class PermissionMatrix:
+    """
+    Loads, in two queries, the roles that have been granted access to each
+    content item and the roles that each user belongs to, then answers
+    access checks from memory. The matrix is loaded when first used and
+    should be invalidated whenever content privileges or role memberships
+    change.
+    """
+
+    def __init__(self):
+        # {content code: set(role names)}
+        self._content_roles = None
+        # {user name: set(role names)}
+        self._user_roles = None
+
+    @property
+    def is_loaded(self):
+        """
+        :return: Returns True if the matrix has been loaded.
+        :rtype: bool
+        """
+        return self._content_roles is not None
+
+    def load(self):
+        """
+        Loads the content and user roles from the database.
+        """
+        content_roles = defaultdict(set)
+        for r in _execute_read(text(_CONTENT_ROLES_SQL)):
+            content_roles[r['code']].add(r['name'])
+
+        user_roles = defaultdict(set)
+        for r in _execute_read(text(_USER_ROLES_SQL)):
+            user_roles[r['usename']].add(r['rolname'])
+
+        self._content_roles = dict(content_roles)
+        self._user_roles = dict(user_roles)
+
+    def invalidate(self):
+        """
+        Discards the loaded roles so that they are loaded afresh on the
+        next access check.
+        """
+        self._content_roles = None
+        self._user_roles = None
+
+    def _ensure_loaded(self):
+        if not self.is_loaded:
+            self.load()
+
+    def user_roles(self, username):
+        """
+        :param username: User name.
+        :type username: str
+        :return: Returns the names of the roles that the user belongs to.
+        :rtype: list
+        """
+        self._ensure_loaded()
+
+        roles = sorted(self._user_roles.get(username, set()))
+        if username == PG_ACCOUNT:
+            roles.append(PG_ACCOUNT)
+
+        return roles
+
+    def content_roles(self, content_code):
+        """
+        :param content_code: Code of the content item.
+        :type content_code: str
+        :return: Returns the names of the roles that have been granted
+        access to the content item.
+        :rtype: set
+        """
+        self._ensure_loaded()
+
+        return self._content_roles.get(content_code, set())
+
+    def has_access(self, username, content_code):
+        """
+        :param username: User name.
+        :type username: str
+        :param content_code: Code of the content item.
+        :type content_code: str
+        :return: Returns True if the user belongs to a role that has been
+        granted access to the content item.
+        :rtype: bool
+        """
+        roles = self.content_roles(content_code)
+        if len(roles) == 0:
+            return False
+
+        return not roles.isdisjoint(self.user_roles(username))
@@ -6,6 +6,7 @@ from stdm.settings.registryconfig import (
     CURRENT_PROFILE,
     RegistryConfig,
     ENTITY_BROWSER_RECORD_LIMIT,
+    ENTITY_BROWSER_CACHE_SIZE,
     ENTITY_SORT_ORDER,
     LOG_MODE
 
@@ -72,6 +73,26 @@ def save_entity_browser_record_limit(limit: int):
     reg_config = RegistryConfig()
     reg_config.write({ENTITY_BROWSER_RECORD_LIMIT: limit})
 
+
+def get_entity_browser_cache_size() -> int:
+    """
+    :return: Returns the memory budget, in megabytes, of the table models
+    cached by the entity browser.
+    :rtype: int
+    """
+    reg_config = RegistryConfig()
+    cache_info = reg_config.read([ENTITY_BROWSER_CACHE_SIZE])
+    cache_size = int(cache_info.get(ENTITY_BROWSER_CACHE_SIZE, 64))
+    return cache_size
+
+
+def save_entity_browser_cache_size(size: int):
+    """
+    type size:int
+    """
+    reg_config = RegistryConfig()
+    reg_config.write({ENTITY_BROWSER_CACHE_SIZE: size})
+
 def save_log_mode(log_mode: str):
     reg_config = RegistryConfig()
     reg_config.write({LOG_MODE: log_mode})
@@ -51,6 +51,11 @@ from stdm.data.configuration.profile import Profile
 from stdm.data.configuration.social_tenure import SocialTenure
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.data.configuration.value_list import ValueList
+from stdm.settings.config_snapshot import (
+    content_hash,
+    read_snapshot,
+    write_snapshot
+)
 from stdm.settings.config_updaters import ConfigurationUpdater
 from stdm.settings.database_updaters import DatabaseUpdater
 from stdm.utils.util import (
@@ -79,6 +84,8 @@ class ConfigurationFileSerializer(QObject):
         self.path = path
         self.config = StdmConfiguration.instance()
         self.file_handler = FilePaths()
+        # True if the configuration file was upgraded while loading it
+        self._upgraded = False
         self.log_file_path = '{}/logs/migration.log'.format(
             self.file_handler.localPath()
         )
@@ -133,7 +140,9 @@ class ConfigurationFileSerializer(QObject):
     def load(self):
         """
         Loads the contents of the configuration file to the corresponding
-        instance object.
+        instance object. The profiles are restored from the snapshot of the
+        file if it has not changed since the snapshot was written, otherwise
+        the file is parsed and a new snapshot written.
         """
         if not QFile.exists(self.path):
             raise IOError('{0} does not exist. Configuration file cannot be '
@@ -145,16 +154,33 @@ class ConfigurationFileSerializer(QObject):
             raise IOError('Cannot read configuration file. Check read '
                           'permissions.')
 
+        content = config_file.readAll()
+        config_file.close()
+        config_hash = content_hash(bytes(content))
+
+        profiles = read_snapshot(self.path, self.config, config_hash)
+        if profiles is not None:
+            self.config._clear()
+            for profile in profiles:
+                self.config.add_profile(profile)
+
+            return
+
         config_doc = QDomDocument()
 
-        status, msg, line, col = config_doc.setContent(config_file)
+        status, msg, line, col = config_doc.setContent(content)
         if not status:
             raise ConfigurationException('Configuration file cannot be '
                                          'loaded: {0}'.format(msg))
 
         # Load configuration items
+        self._upgraded = False
         self.read_xml(config_doc)
 
+        # An upgraded file has been saved afresh hence its hash has changed
+        if not self._upgraded:
+            write_snapshot(self.path, self.config, config_hash)
+
     def update(self, document):
         """
         Tries to upgrade the configuration file specified in the DOM document
@@ -317,6 +343,7 @@ class ConfigurationFileSerializer(QObject):
                              'Profile cannot be loaded.')
 
     def _update_status(self, document):
+        self._upgraded = True
         status, doc = self.update(document)
 
         if not status:
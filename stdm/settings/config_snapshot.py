@@ -0,0 +1,235 @@
+"""
+/***************************************************************************
+Name                 : Configuration Snapshot
+Description          : Binary snapshot of the profiles loaded from the
+                       configuration file, used to restore the configuration
+                       without parsing the file while it is unchanged.
+Date                 : 17/October/2026
+copyright            : (C) 2026 by UN-Habitat and implementing partners.
+                       See the accompanying file CONTRIBUTORS.txt in the root
+email                : stdm@unhabitat.org
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+import hashlib
+import logging
+import os
+import pickle
+from configparser import RawConfigParser
+
+from qgis.PyQt.QtCore import QObject
+
+LOGGER = logging.getLogger('stdm')
+
+# Incremented whenever the layout of the snapshot changes
+SNAPSHOT_FORMAT = 1
+
+SNAPSHOT_MAGIC = b'STDMSNAP'
+
+SNAPSHOT_SUFFIX = '.snapshot'
+
+_CONFIGURATION_ID = 'configuration'
+
+_plugin_version = None
+
+
+def plugin_version() -> str:
+    """
+    :return: Returns the version of the plugin in metadata.txt.
+    :rtype: str
+    """
+    global _plugin_version
+
+    if _plugin_version is None:
+        metadata = RawConfigParser()
+        metadata.read(os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'metadata.txt'
+        ))
+        _plugin_version = metadata.get('general', 'version', fallback='')
+
+    return _plugin_version
+
+
+def content_hash(content: bytes) -> str:
+    """
+    :param content: Content of the configuration file.
+    :type content: bytes
+    :return: Returns the hash that identifies the content.
+    :rtype: str
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def snapshot_path(config_path: str) -> str:
+    """
+    :param config_path: Path of the configuration file.
+    :type config_path: str
+    :return: Returns the path of the snapshot of the configuration file.
+    :rtype: str
+    """
+    return config_path + SNAPSHOT_SUFFIX
+
+
+def _snapshot_key(configuration, config_hash):
+    return (
+        SNAPSHOT_FORMAT,
+        config_hash,
+        plugin_version(),
+        configuration.VERSION
+    )
+
+
+def _new_qobject(cls):
+    # Creates the object whose state is restored from a later record
+    obj = cls.__new__(cls)
+    QObject.__init__(obj)
+
+    return obj
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """
+    Writes each QObject, which cannot be pickled, as a reference and
+    queues its state to be written as a separate record. This also keeps
+    the nesting, hence the recursion, shallow since references between
+    entities are not followed.
+    """
+
+    def __init__(self, file, configuration):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._configuration = configuration
+        self._ids = {}
+        self.pending = []
+
+    def persistent_id(self, obj):
+        if obj is self._configuration:
+            return _CONFIGURATION_ID
+
+        if not isinstance(obj, QObject):
+            return None
+
+        obj_id = self._ids.get(id(obj), None)
+        if obj_id is None:
+            obj_id = len(self._ids)
+            self._ids[id(obj)] = obj_id
+            self.pending.append(obj)
+
+        return obj_id, type(obj)
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, configuration):
+        super().__init__(file)
+        self._configuration = configuration
+        self._objects = {}
+
+    def persistent_load(self, pid):
+        if pid == _CONFIGURATION_ID:
+            return self._configuration
+
+        obj_id, cls = pid
+        obj = self._objects.get(obj_id, None)
+        if obj is None:
+            obj = _new_qobject(cls)
+            self._objects[obj_id] = obj
+
+        return obj
+
+
+def write_snapshot(config_path: str, configuration, config_hash: str) -> bool:
+    """
+    Writes the snapshot of the profiles in the configuration. The
+    configuration should have just been loaded from the configuration file
+    with the given hash.
+    :param config_path: Path of the configuration file.
+    :type config_path: str
+    :param configuration: Configuration object.
+    :type configuration: StdmConfiguration
+    :param config_hash: Hash of the content of the configuration file.
+    :type config_hash: str
+    :return: Returns True if the snapshot was written.
+    :rtype: bool
+    """
+    path = snapshot_path(config_path)
+    temp_path = path + '.tmp'
+
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            pickle.dump(
+                _snapshot_key(configuration, config_hash),
+                f,
+                pickle.HIGHEST_PROTOCOL
+            )
+
+            pickler = _SnapshotPickler(f, configuration)
+            pickler.dump(list(configuration.profiles.values()))
+
+            # One record per QObject, more may be queued while writing
+            i = 0
+            while i < len(pickler.pending):
+                obj = pickler.pending[i]
+                pickler.dump((obj, obj.parent(), obj.__dict__))
+                i += 1
+            pickler.dump(None)
+
+        os.replace(temp_path, path)
+
+        return True
+    except Exception as ex:
+        LOGGER.debug('Configuration snapshot could not be written: %s', str(ex))
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+
+        return False
+
+
+def read_snapshot(config_path: str, configuration, config_hash: str) -> list:
+    """
+    Restores the profiles from the snapshot of the configuration file.
+    :param config_path: Path of the configuration file.
+    :type config_path: str
+    :param configuration: Configuration object the profiles belong to.
+    :type configuration: StdmConfiguration
+    :param config_hash: Hash of the content of the configuration file.
+    :type config_hash: str
+    :return: Returns the profiles or None if there is no snapshot or if it
+    was written for another version of the configuration file or plugin.
+    :rtype: list
+    """
+    path = snapshot_path(config_path)
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+
+            if pickle.load(f) != _snapshot_key(configuration, config_hash):
+                return None
+
+            unpickler = _SnapshotUnpickler(f, configuration)
+            profiles = unpickler.load()
+
+            record = unpickler.load()
+            while record is not None:
+                obj, parent, state = record
+                if parent is not None:
+                    obj.setParent(parent)
+                obj.__dict__.update(state)
+                record = unpickler.load()
+
+        return profiles
+    except Exception as ex:
+        LOGGER.debug('Configuration snapshot could not be read: %s', str(ex))
+
+        return None
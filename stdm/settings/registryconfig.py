@@ -43,6 +43,7 @@ FIRST_LOGIN = 'FirstLogin'
 STDM_PLUGIN = 'stdm'
 STDM_VERSION = 'STDMVersion'
 ENTITY_BROWSER_RECORD_LIMIT = 'EntityBrowserRecordLimit'
+ENTITY_BROWSER_CACHE_SIZE = 'EntityBrowserCacheSize'
 ENTITY_SORT_ORDER = 'EntitySortOrder'
 RUN_TEMPLATE_CONVERTER = 'RunTemplateConverter'
 LOG_MODE = 'LogMode'
@@ -0,0 +1,145 @@
+import queue
+from collections import defaultdict
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.composer.parallel_generator import (
+    MAX_ATTEMPTS,
+    _RESULT,
+    _render_work_item,
+    document_file_name
+)
+
+
+class _Logger:
+    def __init__(self):
+        self.errors = []
+
+    def log_error(self, msg):
+        self.errors.append(msg)
+
+
+class _DocumentGenerator:
+    """
+    Returns the status of each value in the statuses, the values in
+    failures fail the given number of times before succeeding.
+    """
+
+    def __init__(self, statuses=None, failures=None):
+        self.statuses = statuses or {}
+        self.failures = failures or {}
+        self.calls = defaultdict(int)
+        self.batches = []
+
+    def run_batch(self, template_path, values, output_mode, **kwargs):
+        self.batches.append((list(values), kwargs))
+
+        for v in values:
+            self.calls[v] += 1
+
+            if self.calls[v] <= self.failures.get(v, 0):
+                yield v, False, 'Failed'
+            else:
+                yield v, self.statuses.get(v, True), 'Success'
+
+    def clear_temporary_layers(self):
+        pass
+
+
+class TestParallelGenerator(TestCase):
+    def setUp(self):
+        self.settings = {
+            'template_path': 'template.sdt',
+            'output_dir': '/tmp/docs',
+            'output_mode': 0,
+            'file_extension': 'pdf',
+            'file_prefix': 'ru_household',
+            'data_source': 'ru_household',
+            'data_fields': []
+        }
+        self.results = queue.Queue()
+        self.logger = _Logger()
+
+    def _results(self):
+        results = {}
+        while not self.results.empty():
+            msg_type, value, status, msg = self.results.get()
+            self.assertEqual(msg_type, _RESULT)
+            self.assertNotIn(value, results)
+            results[value] = status
+
+        return results
+
+    def test_document_file_name(self):
+        self.assertEqual(
+            document_file_name('ru_household', 5, 0, 'pdf'),
+            'ru_household_5.pdf'
+        )
+        self.assertEqual(
+            document_file_name('ru_household', 5, 2, 'png'),
+            'ru_household_5_2.png'
+        )
+
+    def test_document_file_name_replaces_invalid_chars(self):
+        self.assertEqual(
+            document_file_name('ru household', 'a/b:c', 0, 'pdf'),
+            'ru_household_a_b_c.pdf'
+        )
+
+    def test_failed_value_is_retried(self):
+        generator = _DocumentGenerator(failures={2: 1})
+        _render_work_item(generator, self.settings, [1, 2, 3], self.results,
+                          self.logger)
+
+        self.assertEqual(self._results(), {1: True, 2: True, 3: True})
+        self.assertEqual(generator.calls[1], 1)
+        self.assertEqual(generator.calls[2], 2)
+        self.assertEqual(len(self.logger.errors), 1)
+
+        # Only the failed value is sent in the second batch
+        self.assertEqual(generator.batches[1][0], [2])
+
+    def test_value_fails_after_max_attempts(self):
+        generator = _DocumentGenerator(failures={1: MAX_ATTEMPTS})
+        _render_work_item(generator, self.settings, [1, 2], self.results,
+                          self.logger)
+
+        self.assertEqual(self._results(), {1: False, 2: True})
+        self.assertEqual(generator.calls[1], MAX_ATTEMPTS)
+
+    def test_skipped_value_is_not_retried(self):
+        generator = _DocumentGenerator(statuses={1: None})
+        _render_work_item(generator, self.settings, [1, 2], self.results,
+                          self.logger)
+
+        self.assertEqual(self._results(), {1: None, 2: True})
+        self.assertEqual(generator.calls[1], 1)
+
+    def test_file_path_resolver(self):
+        generator = _DocumentGenerator()
+        _render_work_item(generator, self.settings, [7], self.results,
+                          self.logger)
+
+        kwargs = generator.batches[0][1]
+        self.assertEqual(
+            kwargs['file_path_resolver'](7, 1),
+            '/tmp/docs/ru_household_7_1.pdf'
+        )
+
+    def test_data_fields_naming(self):
+        self.settings['data_fields'] = ['first_name']
+        generator = _DocumentGenerator()
+        _render_work_item(generator, self.settings, [7], self.results,
+                          self.logger)
+
+        kwargs = generator.batches[0][1]
+        self.assertIsNone(kwargs['file_path_resolver'])
+        self.assertEqual(kwargs['dataFields'], ['first_name'])
+
+
+def suite():
+    suite = makeSuite(TestParallelGenerator, 'test')
+
+    return suite
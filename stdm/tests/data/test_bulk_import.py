@@ -0,0 +1,102 @@
+import struct
+from datetime import date
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data.importexport.bulk_import import (
+    COLUMN_DEFAULT,
+    BulkTableWriter,
+    copy_text_value,
+    ewkb_hex
+)
+
+
+class _Cursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def copy_expert(self, sql, f):
+        self.statements.append((sql, f.read()))
+
+    def execute(self, sql):
+        self.statements.append((sql, None))
+
+    def close(self):
+        pass
+
+
+class _Connection:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return _Cursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class TestBulkImport(TestCase):
+    def test_ewkb_hex_embeds_srid(self):
+        # Little endian WKB for POINT(1 2)
+        wkb = struct.pack('<bIdd', 1, 1, 1.0, 2.0)
+        ewkb = bytes.fromhex(ewkb_hex(wkb, 4326))
+
+        geom_type, srid = struct.unpack('<II', ewkb[1:9])
+        self.assertEqual(geom_type, 0x20000001)
+        self.assertEqual(srid, 4326)
+        self.assertEqual(ewkb[9:], wkb[5:])
+
+    def test_ewkb_hex_big_endian(self):
+        wkb = struct.pack('>bIdd', 0, 1, 1.0, 2.0)
+        ewkb = bytes.fromhex(ewkb_hex(wkb, 32737))
+
+        geom_type, srid = struct.unpack('>II', ewkb[1:9])
+        self.assertEqual(geom_type, 0x20000001)
+        self.assertEqual(srid, 32737)
+
+    def test_copy_text_value(self):
+        self.assertEqual(copy_text_value(None), '\\N')
+        self.assertEqual(copy_text_value(True), 't')
+        self.assertEqual(copy_text_value(False), 'f')
+        self.assertEqual(copy_text_value(date(2020, 1, 31)), '2020-01-31')
+        self.assertEqual(copy_text_value(12), '12')
+        self.assertEqual(copy_text_value('a\tb\nc\\'), 'a\\tb\\nc\\\\')
+
+    def test_default_columns_are_not_copied(self):
+        writer = BulkTableWriter('ru_parcel', ['code', 'area'], batch_size=10)
+        writer._conn = _Connection()
+
+        writer.add_row(['P1', 10])
+        writer.add_row(['P2', COLUMN_DEFAULT])
+        writer.add_row([None, 30])
+        writer.flush()
+
+        statements = writer._conn.statements
+        self.assertEqual(statements[0], (
+            'COPY "stdm_import_ru_parcel" ("code", "area") FROM STDIN',
+            'P1\t10\n\\N\t30\n'
+        ))
+        self.assertEqual(statements[3], (
+            'COPY "stdm_import_ru_parcel" ("code") FROM STDIN',
+            'P2\n'
+        ))
+        self.assertEqual(
+            statements[4][0],
+            'INSERT INTO "ru_parcel" ("code") SELECT "code" '
+            'FROM "stdm_import_ru_parcel"'
+        )
+        self.assertEqual(writer._conn.commits, 1)
+        self.assertEqual(writer.committed_rows, 3)
+
+
+def suite():
+    suite = makeSuite(TestBulkImport, 'test')
+
+    return suite
@@ -0,0 +1,180 @@
+import re
+from contextlib import contextmanager
+from unittest import (
+    makeSuite,
+    TestCase
+)
+from unittest.mock import patch
+
+from stdm.data import code_generator
+from stdm.data.code_generator import CodeGenerator
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def scalar(self):
+        row = self.first()
+
+        return None if row is None else list(row.values())[0]
+
+
+class _CodeTable:
+    """
+    Stands in for the code and code_counter tables.
+    """
+
+    def __init__(self, codes=None):
+        self.codes = list(codes or [])
+        self.counters = {}
+
+    def execute_read(self, sql, **kwargs):
+        sql = str(sql)
+        if 'FROM code_counter' in sql:
+            key = kwargs['key']
+            if key not in self.counters:
+                return _Result([])
+
+            return _Result([{'last_value': self.counters[key]}])
+
+        serials = [
+            int(c[kwargs['start'] - 1:]) for c in self.codes
+            if re.match(kwargs['pattern'], c)
+        ]
+
+        return _Result([{'serial': max(serials) if serials else None}])
+
+    def execute(self, sql, **kwargs):
+        sql = str(sql)
+        key = kwargs['key']
+        if sql.startswith('INSERT'):
+            self.counters.setdefault(key, kwargs['seed'])
+
+            return _Result([])
+
+        self.counters[key] += kwargs['count']
+
+        return _Result([{'last_value': self.counters[key]}])
+
+
+class _CodeEntity:
+    name = 'cb_code'
+
+
+class _CodeGenerator(CodeGenerator):
+    def __init__(self, code_table):
+        self.code_entity = _CodeEntity()
+        self.code_table = code_table
+
+    def save_codes(self, codes):
+        self.code_table.codes.extend(codes)
+
+
+@contextmanager
+def _unit_of_work():
+    yield
+
+
+class TestCodeGenerator(TestCase):
+    def setUp(self):
+        self.code_table = _CodeTable()
+        self.generator = _CodeGenerator(self.code_table)
+
+        patchers = [
+            patch.object(
+                code_generator, '_execute_read', self.code_table.execute_read
+            ),
+            patch.object(code_generator, '_execute', self.code_table.execute),
+            patch.object(code_generator, 'unit_of_work', _unit_of_work)
+        ]
+        for p in patchers:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_last_serial_without_codes(self):
+        self.assertEqual(self.generator.last_serial('HH', '-'), 0)
+
+    def test_last_serial_is_the_largest_number(self):
+        # '9' sorts after '10' as text
+        self.code_table.codes.extend(['HH-9', 'HH-10', 'HH-08'])
+
+        self.assertEqual(self.generator.last_serial('HH', '-'), 10)
+
+    def test_last_serial_ignores_other_prefixes(self):
+        self.code_table.codes.extend(
+            ['HH-3', 'HHX-20', 'HH-2a', 'PL-50', 'HH/40']
+        )
+
+        self.assertEqual(self.generator.last_serial('HH', '-'), 3)
+
+    def test_last_serial_escapes_the_prefix(self):
+        self.code_table.codes.extend(['H.5', 'HX7'])
+
+        self.assertEqual(self.generator.last_serial('H', '.'), 5)
+
+    def test_counter_is_seeded_from_the_last_serial(self):
+        self.code_table.codes.extend(['HH-9', 'HH-10'])
+
+        self.assertEqual(self.generator.reserve_serials('HH', '-'), 11)
+        self.assertEqual(self.generator.reserve_serials('HH', '-'), 12)
+        self.assertEqual(
+            self.code_table.counters[
+                self.generator.counter_key('HH', '-')
+            ],
+            12
+        )
+
+    def test_counters_are_kept_per_prefix_and_separator(self):
+        self.assertEqual(self.generator.reserve_serials('HH', '-'), 1)
+        self.assertEqual(self.generator.reserve_serials('HH', '/'), 1)
+        self.assertEqual(self.generator.reserve_serials('PL', '-'), 1)
+        self.assertEqual(self.generator.reserve_serials('HH', '-'), 2)
+
+    def test_first_code_matches_the_previous_format(self):
+        for leading_zero in ['', '0', '000']:
+            generator = _CodeGenerator(_CodeTable())
+            with patch.object(code_generator, '_execute_read',
+                              generator.code_table.execute_read), \
+                    patch.object(code_generator, '_execute',
+                                 generator.code_table.execute):
+                code = generator.generate('HH', '-', leading_zero)
+
+            self.assertEqual(
+                code, '{0}{1}{2}1'.format('HH', '-', leading_zero)
+            )
+
+    def test_leading_zero(self):
+        self.code_table.codes.append('HH-0099')
+
+        self.assertEqual(self.generator.generate('HH', '-', '000'), 'HH-0100')
+        self.assertEqual(
+            self.generator.generate('HH', '-', '000', hide_prefix=True),
+            '0101'
+        )
+
+    def test_reserve_block(self):
+        self.code_table.codes.append('HH-05')
+
+        codes = self.generator.reserve('HH', '-', '0', 3)
+        self.assertEqual(codes, ['HH-06', 'HH-07', 'HH-08'])
+        self.assertEqual(self.generator.generate('HH', '-', '0'), 'HH-09')
+        self.assertEqual(
+            self.code_table.codes,
+            ['HH-05', 'HH-06', 'HH-07', 'HH-08', 'HH-09']
+        )
+
+    def test_reserve_block_hide_prefix(self):
+        serials = self.generator.reserve('HH', '', '00', 2, hide_prefix=True)
+
+        self.assertEqual(serials, ['001', '002'])
+        self.assertEqual(self.code_table.codes, ['HH001', 'HH002'])
+
+
+def suite():
+    suite = makeSuite(TestCodeGenerator, 'test')
+
+    return suite
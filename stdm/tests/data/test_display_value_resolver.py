@@ -0,0 +1,90 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data.display_value_resolver import DisplayValueResolver
+
+
+class _DisplayValueResolver(DisplayValueResolver):
+    def __init__(self, records, cache_size):
+        super().__init__('ru_person', ['first_name'], cache_size)
+        self.records = records
+        self.fetched = []
+
+    def _fetch(self, ids):
+        self.fetched.append(sorted(ids))
+
+        return {i: self.records[i] for i in ids if i in self.records}
+
+
+class TestDisplayValueResolver(TestCase):
+    def setUp(self):
+        self.records = {
+            i: {'id': i, 'first_name': 'Name {0}'.format(i)}
+            for i in range(1, 6)
+        }
+        self.resolver = _DisplayValueResolver(self.records, 3)
+
+    def test_resolve_fetches_missing_ids_once(self):
+        values = self.resolver.resolve([1, 2, None])
+
+        self.assertEqual(values[1]['first_name'], 'Name 1')
+        self.assertEqual(values[2]['first_name'], 'Name 2')
+        self.assertEqual(self.resolver.fetched, [[1, 2]])
+
+        self.resolver.resolve([1, 2, 3])
+        self.assertEqual(self.resolver.fetched, [[1, 2], [3]])
+
+    def test_missing_record_is_cached(self):
+        self.assertIsNone(self.resolver.record(10))
+        self.assertIsNone(self.resolver.record(10))
+        self.assertEqual(self.resolver.fetched, [[10]])
+
+    def test_least_recently_used_records_are_evicted(self):
+        self.resolver.resolve([1, 2, 3])
+
+        # 1 becomes the most recently used record
+        self.resolver.record(1)
+        self.resolver.record(4)
+
+        self.resolver.resolve([1, 3, 4])
+        self.assertEqual(self.resolver.fetched, [[1, 2, 3], [4]])
+
+        self.resolver.record(2)
+        self.assertEqual(self.resolver.fetched[-1], [2])
+
+    def test_requested_ids_are_kept_above_cache_size(self):
+        values = self.resolver.resolve([1, 2, 3, 4, 5])
+
+        self.assertEqual(len(values), 5)
+        self.assertEqual(values[5]['first_name'], 'Name 5')
+
+    def test_clear(self):
+        self.resolver.resolve([1, 2])
+        self.resolver.clear([1])
+
+        self.resolver.resolve([1, 2])
+        self.assertEqual(self.resolver.fetched[-1], [1])
+
+        self.resolver.clear()
+        self.resolver.resolve([1, 2])
+        self.assertEqual(self.resolver.fetched[-1], [1, 2])
+
+    def test_new_columns_clear_the_cache(self):
+        self.resolver.resolve([1])
+
+        self.resolver.add_columns(['first_name'])
+        self.resolver.record(1)
+        self.assertEqual(len(self.resolver.fetched), 1)
+
+        self.resolver.add_columns(['last_name'])
+        self.assertEqual(self.resolver.columns, ['first_name', 'last_name'])
+        self.resolver.record(1)
+        self.assertEqual(len(self.resolver.fetched), 2)
+
+
+def suite():
+    suite = makeSuite(TestDisplayValueResolver, 'test')
+
+    return suite
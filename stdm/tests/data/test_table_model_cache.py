@@ -0,0 +1,123 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    create_engine
+)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from stdm.data.table_model_cache import TableModelCache
+
+Base = declarative_base()
+
+
+class Household(Base):
+    __tablename__ = 'hh_household'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class _Signal:
+    def connect(self, slot):
+        pass
+
+
+class _TableModel:
+    """
+    Stands in for PagedEntityTableModel.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.rowsInserted = _Signal()
+        self.refreshed = []
+        self.reloaded = 0
+
+    def memory_usage(self):
+        return self.size
+
+    def refresh_rows(self, updated_ids, deleted_ids):
+        self.refreshed.append((set(updated_ids), set(deleted_ids)))
+
+    def reload(self):
+        self.reloaded += 1
+
+
+class TestTableModelCache(TestCase):
+    def setUp(self):
+        self.cache = TableModelCache.instance()
+        self.cache.clear()
+        self.cache.memory_budget = 100
+
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.session.close()
+        TableModelCache.cleanUp()
+
+    def test_evicts_least_recently_used(self):
+        first = _TableModel(40)
+        second = _TableModel(40)
+        self.cache.add(('a',), first)
+        self.cache.add(('b',), second)
+
+        # Use 'a' so that 'b' becomes the least recently used
+        self.assertIs(self.cache.model(('a',)), first)
+        self.cache.add(('c',), _TableModel(40))
+
+        self.assertIsNone(self.cache.model(('b',)))
+        self.assertIs(self.cache.model(('a',)), first)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_keeps_most_recent_model_over_budget(self):
+        self.cache.add(('a',), _TableModel(500))
+
+        self.assertEqual(len(self.cache), 1)
+
+    def test_invalidate_table(self):
+        model = _TableModel(10)
+        self.cache.add(('hh_household', 'x'), model)
+        self.cache.invalidate_table('hh_household')
+
+        self.assertEqual(model.reloaded, 1)
+
+    def test_commit_refreshes_changed_records(self):
+        model = _TableModel(10)
+        self.cache.add(('hh_household',), model)
+
+        household = Household(name='A')
+        self.session.add(household)
+        self.session.commit()
+
+        self.assertEqual(model.refreshed, [({household.id}, set())])
+
+        self.session.delete(household)
+        self.session.commit()
+
+        self.assertEqual(model.refreshed[-1], (set(), {household.id}))
+
+    def test_rollback_discards_changes(self):
+        model = _TableModel(10)
+        self.cache.add(('hh_household',), model)
+
+        self.session.add(Household(name='B'))
+        self.session.flush()
+        self.session.rollback()
+        self.session.commit()
+
+        self.assertEqual(model.refreshed, [])
+
+
+def suite():
+    suite = makeSuite(TestTableModelCache, 'test')
+
+    return suite
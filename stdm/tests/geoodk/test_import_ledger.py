@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.geoodk.importer import (
+    import_ledger,
+    import_log
+)
+from stdm.geoodk.importer.import_ledger import ImportLedger
+from stdm.geoodk.importer.instance_reader import InstanceData
+
+
+def _instance(uuid, content_hash=None, device_id=None):
+    instance = InstanceData(uuid + '.xml', '/instances/' + uuid + '.xml')
+    instance.content_hash = content_hash
+    instance.device_id = device_id
+
+    return instance
+
+
+class TestImportLedger(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.ledger_path = os.path.join(self.temp_dir, 'import_ledger.sqlite')
+
+        # Read the legacy import log from the temporary folder
+        self.logger_home = import_ledger.LOGGER_HOME
+        import_ledger.LOGGER_HOME = self.temp_dir
+        import_log.LOGGER_HOME = self.temp_dir
+
+        self.ledger = None
+
+    def tearDown(self):
+        if self.ledger is not None:
+            self.ledger.close()
+
+        import_ledger.LOGGER_HOME = self.logger_home
+        import_log.LOGGER_HOME = self.logger_home
+        shutil.rmtree(self.temp_dir)
+
+    def test_imported_instances(self):
+        self.ledger = ImportLedger(self.ledger_path)
+        self.ledger.record(
+            [_instance('a', 'hash_a'), _instance('b', 'hash_b')],
+            'Local'
+        )
+
+        self.assertEqual(
+            self.ledger.imported_uuids(['a', 'c', 'b', 'a']), {'a', 'b'}
+        )
+        self.assertTrue(self.ledger.is_imported('a'))
+        self.assertFalse(self.ledger.is_imported('c'))
+
+        # Same content submitted under another UUID
+        self.assertTrue(self.ledger.is_imported('c', 'hash_b'))
+
+    def test_duplicate_uuid_is_ignored(self):
+        self.ledger = ImportLedger(self.ledger_path)
+        self.ledger.record([_instance('a', 'hash_1')])
+        self.ledger.record([_instance('a', 'hash_2')])
+
+        rows = self.ledger.imports()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['content_hash'], 'hash_1')
+
+    def test_imports_by_device_and_period(self):
+        self.ledger = ImportLedger(self.ledger_path)
+        self.ledger.record([
+            _instance('a', device_id='device_1'),
+            _instance('b', device_id='device_2'),
+            _instance('c', device_id='device_1')
+        ], 'Local')
+
+        rows = self.ledger.imports(device_id='device_1', profile='Local')
+        self.assertEqual([r['instance_uuid'] for r in rows], ['a', 'c'])
+
+        rows = self.ledger.imports(end=datetime(2000, 1, 1))
+        self.assertEqual(len(rows), 0)
+
+    def test_legacy_log_is_migrated(self):
+        log_data = {
+            '/instances/a.xml': '31/01/2026 10:15:00',
+            '/instances/b.xml': 'invalid date'
+        }
+        with open(os.path.join(self.temp_dir, 'import_log.json'), 'w') as f:
+            json.dump(log_data, f)
+
+        self.ledger = ImportLedger(self.ledger_path)
+
+        self.assertEqual(self.ledger.imported_uuids(['a', 'b']), {'a', 'b'})
+        rows = self.ledger.imports()
+        imported_at = {r['instance_uuid']: r['imported_at'] for r in rows}
+        self.assertEqual(imported_at['a'], '2026-01-31T10:15:00')
+
+    def test_legacy_log_is_migrated_once(self):
+        self.ledger = ImportLedger(self.ledger_path)
+        self.ledger.close()
+
+        with open(os.path.join(self.temp_dir, 'import_log.json'), 'w') as f:
+            json.dump({'/instances/a.xml': '31/01/2026 10:15:00'}, f)
+
+        self.ledger = ImportLedger(self.ledger_path)
+        self.assertFalse(self.ledger.is_imported('a'))
+
+
+def suite():
+    suite = makeSuite(TestImportLedger, 'test')
+
+    return suite
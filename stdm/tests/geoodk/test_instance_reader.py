@@ -0,0 +1,139 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.geoodk.importer.instance_reader import (
+    iter_instances,
+    parse_instance
+)
+
+INSTANCE_XML = b"""<?xml version='1.0' ?>
+<Local_Profile xmlns="http://opendatakit.org/xforms" id="Local_Profile">
+  <deviceid>imei:358240051111110</deviceid>
+  <lo_person>
+    <first_name>Jane</first_name>
+    <last_name>Doe</last_name>
+  </lo_person>
+  <lo_person>
+    <first_name>John</first_name>
+    <last_name>Doe</last_name>
+  </lo_person>
+  <lo_parcel>
+    <code>P-001</code>
+  </lo_parcel>
+  <social_tenure>
+    <tenure_type>Owner</tenure_type>
+  </social_tenure>
+  <lo_household>
+    <size>4</size>
+  </lo_household>
+  <meta>
+    <instanceID>uuid:3f6e5c1a-0b7d-4c2e-9a51-7f2d8c9b1e44</instanceID>
+  </meta>
+</Local_Profile>
+"""
+
+
+class TestInstanceReader(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.instance_file = self._write_instance('instance.xml', INSTANCE_XML)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_instance(self, file_name, content):
+        path = os.path.join(self.temp_dir, file_name)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+        return path
+
+    def test_metadata(self):
+        instance = parse_instance(
+            self.instance_file, 'Local_Profile', ['lo_person', 'lo_parcel']
+        )
+
+        self.assertEqual(instance.file_name, 'instance.xml')
+        self.assertEqual(
+            instance.uuid, 'uuid3f6e5c1a-0b7d-4c2e-9a51-7f2d8c9b1e44'
+        )
+        self.assertEqual(instance.device_id, 'imei:358240051111110')
+        self.assertEqual(
+            instance.content_hash,
+            hashlib.sha256(INSTANCE_XML).hexdigest()
+        )
+
+    def test_entities(self):
+        instance = parse_instance(
+            self.instance_file, 'Local_Profile', ['lo_person', 'lo_parcel']
+        )
+
+        self.assertEqual(list(instance.single_entities.keys()), ['lo_parcel'])
+        self.assertEqual(
+            instance.single_entities['lo_parcel']['code'], 'P-001'
+        )
+
+        self.assertEqual(
+            list(instance.repeated_entities.keys()),
+            ['0lo_person', '1lo_person']
+        )
+        self.assertEqual(
+            instance.repeated_entities['1lo_person']['first_name'], 'John'
+        )
+
+    def test_entity_outside_profile_is_ignored(self):
+        instance = parse_instance(
+            self.instance_file, 'Local_Profile', ['lo_parcel', 'instanceID']
+        )
+
+        self.assertNotIn('instanceID', instance.single_entities)
+        self.assertNotIn('lo_household', instance.single_entities)
+
+    def test_social_tenure(self):
+        instance = parse_instance(
+            self.instance_file, 'Local_Profile', ['lo_person']
+        )
+
+        self.assertTrue(instance.has_str_data)
+        self.assertEqual(
+            instance.single_str['social_tenure']['tenure_type'], 'Owner'
+        )
+        self.assertNotIn('social_tenure', instance.single_entities)
+
+    def test_instance_without_id(self):
+        path = self._write_instance(
+            'no_id.xml',
+            b'<Local_Profile><lo_parcel><code>P-002</code></lo_parcel>'
+            b'</Local_Profile>'
+        )
+        instance = parse_instance(path, 'Local_Profile', ['lo_parcel'])
+
+        self.assertEqual(instance.uuid, 'no_id')
+        self.assertIsNone(instance.device_id)
+        self.assertFalse(instance.has_str_data)
+
+    def test_iter_instances(self):
+        path = self._write_instance(
+            'other.xml',
+            b'<Local_Profile><lo_parcel><code>P-003</code></lo_parcel>'
+            b'</Local_Profile>'
+        )
+        instances = list(iter_instances(
+            [self.instance_file, path], 'Local_Profile', ['lo_parcel']
+        ))
+
+        self.assertEqual(
+            [i.file_name for i in instances], ['instance.xml', 'other.xml']
+        )
+
+
+def suite():
+    suite = makeSuite(TestInstanceReader, 'test')
+
+    return suite
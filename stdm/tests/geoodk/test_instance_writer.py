@@ -0,0 +1,145 @@
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table
+)
+
+from stdm.geoodk.importer.entity_importer import (
+    InstanceWriteError,
+    InstanceWriter,
+    PendingRecord
+)
+
+metadata = MetaData()
+
+parcel_table = Table(
+    'ru_parcel', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('code', String)
+)
+
+person_table = Table(
+    'ru_person', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String)
+)
+
+str_table = Table(
+    'ru_social_tenure_relationship', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('party_id', Integer),
+    Column('spatial_unit_id', Integer)
+)
+
+
+class _Connection:
+    def __init__(self):
+        self.inserts = []
+
+    def execute(self, stmt, *args, **kwargs):
+        self.inserts.append(stmt.table.name)
+
+
+class _InstanceWriter(InstanceWriter):
+    def __init__(self):
+        super().__init__(cache=object())
+        self.next_id = 100
+
+    def _allocate_ids(self, conn, table, count):
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+
+        return ids
+
+
+class TestInstanceWriter(TestCase):
+    def setUp(self):
+        self.writer = _InstanceWriter()
+        self.conn = _Connection()
+
+    def test_pending_record_row(self):
+        parcel = PendingRecord(parcel_table, {'code': 'P1'})
+        person = PendingRecord(person_table, {'name': 'A'})
+        str_record = PendingRecord(str_table, {
+            'party_id': person,
+            'spatial_unit_id': parcel
+        })
+
+        self.assertFalse(str_record.is_ready())
+
+        parcel.id = 1
+        person.id = 2
+        self.assertTrue(str_record.is_ready())
+        self.assertEqual(
+            str_record.row(),
+            {'party_id': 2, 'spatial_unit_id': 1}
+        )
+
+    def test_parents_are_inserted_first(self):
+        instance = self.writer.new_instance('a.xml', '/tmp/a.xml')
+        parcel = PendingRecord(parcel_table, {'code': 'P1'})
+        person = PendingRecord(person_table, {'name': 'A'})
+        str_record = PendingRecord(str_table, {
+            'party_id': person,
+            'spatial_unit_id': parcel
+        })
+        instance.records = [str_record, parcel, person]
+
+        self.writer._write(self.conn, [instance])
+
+        self.assertEqual(self.conn.inserts[-1], str_table.name)
+        self.assertEqual(len(self.conn.inserts), 3)
+        self.assertEqual(
+            str_record.row(),
+            {'party_id': person.id, 'spatial_unit_id': parcel.id}
+        )
+
+    def test_records_of_instances_are_grouped(self):
+        instances = []
+        for i in range(3):
+            instance = self.writer.new_instance('a.xml', '/tmp/a.xml')
+            instance.records = [PendingRecord(parcel_table, {'code': str(i)})]
+            instances.append(instance)
+
+        self.writer._write(self.conn, instances)
+
+        self.assertEqual(self.conn.inserts, [parcel_table.name])
+        self.assertEqual(
+            [i.records[0].id for i in instances],
+            [100, 101, 102]
+        )
+
+    def test_missing_parent_raises_error(self):
+        instance = self.writer.new_instance('a.xml', '/tmp/a.xml')
+        parcel = PendingRecord(parcel_table, {'code': 'P1'})
+        person = PendingRecord(person_table, {'name': 'A'})
+        str_record = PendingRecord(str_table, {
+            'party_id': person,
+            'spatial_unit_id': parcel
+        })
+
+        # The party is not in the batch
+        instance.records = [parcel, str_record]
+
+        with self.assertRaises(InstanceWriteError):
+            self.writer._write(self.conn, [instance])
+
+    def test_reset(self):
+        parcel = PendingRecord(parcel_table, {'code': 'P1'})
+        parcel.id = 1
+        parcel.reset()
+
+        self.assertIsNone(parcel.id)
+
+
+def suite():
+    suite = makeSuite(TestInstanceWriter, 'test')
+
+    return suite
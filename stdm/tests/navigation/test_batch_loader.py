@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.navigation.socialtenure.formatters import BatchLoader
+
+
+class TestBatchLoader(TestCase):
+    def setUp(self):
+        self.fetched = []
+
+    def _fetch(self, keys):
+        self.fetched.append(list(keys))
+
+        return {k: ['model {0}'.format(k)] for k in keys
+                if not str(k).startswith('missing')}
+
+    def test_registered_keys_are_loaded_together(self):
+        loader = BatchLoader(self._fetch)
+        for key in [1, 2, 3]:
+            loader.register(key)
+
+        self.assertEqual(loader.load(2), ['model 2'])
+        self.assertEqual(loader.load(1), ['model 1'])
+        self.assertEqual(loader.load(3), ['model 3'])
+
+        # The requested key is fetched first
+        self.assertEqual(self.fetched, [[2, 1, 3]])
+
+    def test_batch_size(self):
+        loader = BatchLoader(self._fetch, batch_size=2)
+        for key in [1, 2, 3]:
+            loader.register(key)
+
+        loader.load(1)
+        loader.load(2)
+        loader.load(3)
+
+        self.assertEqual(self.fetched, [[1, 2], [3]])
+
+    def test_unregistered_key(self):
+        loader = BatchLoader(self._fetch)
+
+        self.assertEqual(loader.load(5), ['model 5'])
+        self.assertEqual(self.fetched, [[5]])
+
+    def test_default(self):
+        loader = BatchLoader(self._fetch)
+
+        self.assertEqual(loader.load('missing'), [])
+        self.assertEqual(loader.load(None), [])
+        self.assertEqual(self.fetched, [['missing']])
+
+    def test_default_factory(self):
+        loader = BatchLoader(self._fetch, OrderedDict)
+
+        self.assertEqual(loader.load('missing'), OrderedDict())
+        self.assertIsInstance(loader.load(None), OrderedDict)
+
+    def test_defaults_are_not_shared(self):
+        loader = BatchLoader(self._fetch)
+        for key in ['missing 1', 'missing 2']:
+            loader.register(key)
+
+        loader.load('missing 1').append('model')
+
+        self.assertEqual(loader.load('missing 2'), [])
+        self.assertEqual(loader.load('missing 1'), ['model'])
+        self.assertEqual(self.fetched, [['missing 1', 'missing 2']])
+
+    def test_loaded_key_is_not_registered_again(self):
+        loader = BatchLoader(self._fetch)
+        loader.load(1)
+        loader.register(1)
+        loader.register(2)
+        loader.load(2)
+
+        self.assertEqual(self.fetched, [[1], [2]])
+
+    def test_clear(self):
+        loader = BatchLoader(self._fetch)
+        loader.register(1)
+        loader.load(1)
+        loader.clear()
+        loader.load(1)
+
+        self.assertEqual(self.fetched, [[1], [1]])
+
+
+def suite():
+    suite = makeSuite(TestBatchLoader, 'test')
+
+    return suite
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+from unittest import (
+    makeSuite,
+    TestCase
+)
+
+from stdm.data.configuration.stdm_configuration import StdmConfiguration
+from stdm.settings.config_snapshot import (
+    SNAPSHOT_MAGIC,
+    content_hash,
+    read_snapshot,
+    snapshot_path,
+    write_snapshot
+)
+from stdm.tests.data.utils import (
+    PERSON_ENTITY,
+    add_basic_profile,
+    add_person_entity
+)
+
+
+class TestConfigSnapshot(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.temp_dir, 'configuration.stc')
+        self.config_hash = content_hash(b'<Configuration/>')
+
+        self.config = StdmConfiguration.instance()
+        profile = add_basic_profile(self.config)
+        add_person_entity(profile)
+
+    def tearDown(self):
+        StdmConfiguration.cleanUp()
+        shutil.rmtree(self.temp_dir)
+
+    def test_round_trip(self):
+        self.assertTrue(
+            write_snapshot(self.config_path, self.config, self.config_hash)
+        )
+        self.assertTrue(os.path.isfile(snapshot_path(self.config_path)))
+
+        profiles = read_snapshot(
+            self.config_path, self.config, self.config_hash
+        )
+
+        self.assertEqual([p.name for p in profiles], ['Basic'])
+        profile = profiles[0]
+        self.assertIsNot(profile, self.config.profile('Basic'))
+        self.assertEqual(
+            list(profile.entities.keys()),
+            list(self.config.profile('Basic').entities.keys())
+        )
+
+        # References between the restored objects are preserved
+        entity = profile.entity(PERSON_ENTITY)
+        self.assertIs(entity.profile, profile)
+        self.assertIs(profile.configuration, self.config)
+
+    def test_hash_mismatch(self):
+        write_snapshot(self.config_path, self.config, self.config_hash)
+
+        profiles = read_snapshot(
+            self.config_path, self.config, content_hash(b'<Changed/>')
+        )
+        self.assertIsNone(profiles)
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(
+            read_snapshot(self.config_path, self.config, self.config_hash)
+        )
+
+    def test_invalid_snapshot(self):
+        with open(snapshot_path(self.config_path), 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + b'invalid')
+
+        self.assertIsNone(
+            read_snapshot(self.config_path, self.config, self.config_hash)
+        )
+
+
+def suite():
+    suite = makeSuite(TestConfigSnapshot, 'test')
+
+    return suite
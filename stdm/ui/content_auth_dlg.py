@@ -38,6 +38,7 @@ from stdm.data.database import (
     Role
 )
 from stdm.data.qtmodels import UsersRolesModel
+from stdm.security.permission_matrix import PermissionMatrix
 from stdm.security.privilege_provider import SinglePrivilegeProvider
 from stdm.security.roleprovider import RoleProvider
 from stdm.settings import current_profile
@@ -186,5 +187,6 @@ class contentAuthDlg(WIDGET, BASE):
                 self.privilege_provider.revoke_privilege()
 
             self.currentContent.update()
+            PermissionMatrix.instance().invalidate()
 
             self.blockSignals(False)
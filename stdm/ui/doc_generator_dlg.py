@@ -48,6 +48,10 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from stdm.exceptions import DummyException
 from stdm.composer.document_generator import DocumentGenerator
+from stdm.composer.parallel_generator import (
+    ParallelDocumentGenerator,
+    WORK_ITEM_SIZE
+)
 from stdm.data.configuration import entity_model
 from stdm.settings import current_profile
 from stdm.settings.registryconfig import (
@@ -73,6 +77,9 @@ __all__ = ["DocumentGeneratorDialog", "EntityConfig"]
 
 LOGGER = logging.getLogger('stdm')
 
+# Minimum number of records for generating the documents in worker processes
+PARALLEL_MIN_RECORDS = 2 * WORK_ITEM_SIZE
+
 
 class EntityConfig(object):
     """
@@ -663,80 +670,79 @@ class DocumentGeneratorDialog(WIDGET, BASE):
             # Apply cell formatters for naming output files
             self._doc_generator.set_attr_value_formatters(config.formatters())
 
-        entity_field_name = "id"
+        # Large batches named using the data fields are generated in
+        # worker processes
+        if self.chkUseOutputFolder.checkState() == Qt.Checked and \
+                not self.chk_template_datasource.isChecked() and \
+                len(records) >= PARALLEL_MIN_RECORDS:
+            success_status = self._generate_in_parallel(
+                [record.id for record in records],
+                outputMode,
+                fileExtension,
+                documentNamingAttrs
+            )
+            self.reset(success_status)
+
+            return
 
         # Iterate through the selected records
         progressDlg = QProgressDialog(self)
         progressDlg.setMaximum(len(records))
 
+        entity_values = [record.id for record in records]
 
         try:
             QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
 
-            for i, record in enumerate(records):
-                progressDlg.setValue(i)
-
-                if progressDlg.wasCanceled():
-                    success_status = False
-                    break
-                # User-defined location
-                if self.chkUseOutputFolder.checkState() == Qt.Unchecked:
-
-                    status, msg = self._doc_generator.run(self._docTemplatePath, entity_field_name,
-                                                        record.id, outputMode,
-                                                        data_source=self.ds_entity.name,
-                                                        filePath=self._outputFilePath)
-                    self._doc_generator.clear_temporary_layers()
-
-
-                # Output folder location using custom naming
-                else:
-
-                    status, msg = self._doc_generator.run(self._docTemplatePath, entity_field_name,
-                                                          record.id, outputMode,
-                                                          dataFields=documentNamingAttrs,
-                                                          fileExtension=fileExtension,
-                                                          data_source=self.ds_entity.name)
-                    self._doc_generator.clear_temporary_layers()
-
-                if not status:
-                    result = QMessageBox.warning(self,
-                                                 QApplication.translate("DocumentGeneratorDialog",
-                                                                        "Document Generate Error"),
-                                                 msg, QMessageBox.Ignore | QMessageBox.Abort)
-
-                    if result == QMessageBox.Abort:
-                        progressDlg.close()
-                        progressDlg.deleteLater()
-                        del progressDlg
-                        success_status = False
-
-                        # Restore cursor
-                        QApplication.restoreOverrideCursor()
+            # User-defined location
+            if self.chkUseOutputFolder.checkState() == Qt.Unchecked:
+                batch = self._doc_generator.run_batch(self._docTemplatePath, entity_values,
+                                                      outputMode,
+                                                      data_source=self.ds_entity.name,
+                                                      filePath=self._outputFilePath)
 
-                    # If its the last record and user has selected to ignore
-                    if i + 1 == len(records):
-                        progressDlg.close()
-                        progressDlg.deleteLater()
-                        del progressDlg
+            # Output folder location using custom naming
+            else:
+                batch = self._doc_generator.run_batch(self._docTemplatePath, entity_values,
+                                                      outputMode,
+                                                      dataFields=documentNamingAttrs,
+                                                      fileExtension=fileExtension,
+                                                      data_source=self.ds_entity.name)
+
+            try:
+                for i, (entity_value, status, msg) in enumerate(batch):
+                    progressDlg.setValue(i + 1)
+
+                    # Skipped records have already been logged
+                    if status is not None and not status:
+                        result = QMessageBox.warning(self,
+                                                     QApplication.translate("DocumentGeneratorDialog",
+                                                                            "Document Generate Error"),
+                                                     msg, QMessageBox.Ignore | QMessageBox.Abort)
+
+                        # Template or data source errors apply to all records
+                        if result == QMessageBox.Abort or entity_value is None:
+                            success_status = False
+                            break
+
+                    if progressDlg.wasCanceled():
                         success_status = False
+                        break
+            finally:
+                # Removes the temporary layers of the batch
+                batch.close()
 
-                        # Restore cursor
-                        QApplication.restoreOverrideCursor()
-
-                        return
-
-                else:
-                    progressDlg.setValue(len(records))
+            progressDlg.setValue(len(records))
 
             QApplication.restoreOverrideCursor()
 
-            QMessageBox.information(self,
-                                    QApplication.translate("DocumentGeneratorDialog",
-                                                           "Document Generation Complete"),
-                                    QApplication.translate("DocumentGeneratorDialog",
-                                                           "Document generation has successfully completed.")
-                                    )
+            if success_status:
+                QMessageBox.information(self,
+                                        QApplication.translate("DocumentGeneratorDialog",
+                                                               "Document Generation Complete"),
+                                        QApplication.translate("DocumentGeneratorDialog",
+                                                               "Document generation has successfully completed.")
+                                        )
 
         except SQLAlchemyError as sqlerr:
             LOGGER.debug(str(sqlerr))
@@ -776,6 +782,77 @@ class DocumentGeneratorDialog(WIDGET, BASE):
         QApplication.restoreOverrideCursor()
         self.reset(success_status)
 
+    def _generate_in_parallel(self, entity_values, output_mode, file_extension,
+                              data_fields) -> bool:
+        """
+        Generates the documents of the entity records using
+        ParallelDocumentGenerator. The documents are written to the composer
+        output directory and named using the data fields.
+        :return: Returns True if all the documents were generated.
+        :rtype: bool
+        """
+        generator = ParallelDocumentGenerator(
+            self._docTemplatePath,
+            None,
+            output_mode,
+            file_extension,
+            self.ds_entity.name,
+            data_fields=data_fields
+        )
+
+        progressDlg = QProgressDialog(self)
+        progressDlg.setMaximum(len(entity_values))
+        num_processed = 0
+
+        def on_progress(processed, total, entity_value, status, msg):
+            nonlocal num_processed
+            num_processed = processed
+            progressDlg.setValue(processed)
+            QApplication.processEvents()
+
+            return not progressDlg.wasCanceled()
+
+        try:
+            succeeded, failed = generator.run(entity_values, on_progress)
+        finally:
+            canceled = progressDlg.wasCanceled()
+            progressDlg.deleteLater()
+
+        if canceled:
+            return False
+
+        # Values are not processed if the workers exited
+        num_failed = len(failed) + len(entity_values) - num_processed
+        if num_failed > 0:
+            QMessageBox.warning(
+                self,
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "Document Generate Error"
+                ),
+                QApplication.translate(
+                    "DocumentGeneratorDialog",
+                    "{0} document(s) could not be generated, check the "
+                    "document generator log."
+                ).format(num_failed)
+            )
+
+            return False
+
+        QMessageBox.information(
+            self,
+            QApplication.translate(
+                "DocumentGeneratorDialog",
+                "Document Generation Complete"
+            ),
+            QApplication.translate(
+                "DocumentGeneratorDialog",
+                "Document generation has successfully completed."
+            )
+        )
+
+        return True
+
     def _dummy_template_records(self):
         """
         This is applied when records from a template data source are to be
@@ -29,7 +29,7 @@ from qgis.PyQt.QtCore import (
     QSize,
     QModelIndex,
     QItemSelectionModel,
-    QRegExp
+    QTimer
 )
 from qgis.PyQt.QtWidgets import (
     QApplication,
@@ -43,7 +43,10 @@ from qgis.PyQt.QtWidgets import (
     QLabel
 )
 
-from qgis.PyQt.QtGui import QFont
+from qgis.PyQt.QtGui import (
+    QCursor,
+    QFont
+)
 
 from qgis.core import (
     QgsProject
@@ -52,7 +55,17 @@ from qgis.gui import QgsGui
 from qgis.utils import (
     iface
 )
-from sqlalchemy.sql.expression import text
+from sqlalchemy import (
+    String,
+    cast,
+    or_,
+    select
+)
+from sqlalchemy.sql.expression import (
+    column as sql_column,
+    table as sql_table,
+    text
+)
 
 from stdm.data.configuration import entity_model
 from stdm.data.configuration.columns import (
@@ -60,21 +73,22 @@ from stdm.data.configuration.columns import (
     MultipleSelectColumn,
     VirtualColumn
 )
-from stdm.data.globals import ENTITY_TABLE_MODEL
 from stdm.data.configuration.entity import Entity
 from stdm.data.pg_utils import (
-    table_column_names,
-    pg_table_record_count
+    table_column_names
 )
 from stdm.data.qtmodels import (
     BaseSTDMTableModel,
+    PagedEntityTableModel,
     VerticalHeaderSortFilterProxyModel
 )
+from stdm.data.table_model_cache import TableModelCache
 from stdm.exceptions import DummyException
 from stdm.navigation.content_group import TableContentGroup
 from stdm.network.filemanager import NetworkFileManager
 from stdm.settings import (
     get_entity_browser_record_limit,
+    get_entity_browser_cache_size,
     get_entity_sort_details,
     current_profile
 )
@@ -107,6 +121,39 @@ from stdm.utils.util import (
 
 __all__ = ["EntityBrowser", "EntityBrowserWithEditor", "ContentGroupEntityBrowser"]
 
+# Delay, in milliseconds, before the records are filtered after the user
+# stops typing the filter text.
+FILTER_DELAY = 300
+
+# Types of columns whose values are searched using a case insensitive
+# 'contains' match.
+TEXT_COLUMN_TYPES = ('VARCHAR', 'TEXT', 'AUTO_GENERATED')
+
+# Types of columns referencing records whose display values are searched
+# by the quick filter.
+RELATED_COLUMN_TYPES = ('FOREIGN_KEY', 'LOOKUP', 'ADMIN_SPATIAL_UNIT')
+
+
+def _contains_pattern(value):
+    """
+    :param value: Text to search for.
+    :type value: str
+    :return: Returns an ILIKE pattern matching values containing the given
+    text. Wildcard characters in the text are escaped using a backslash.
+    :rtype: str
+    """
+    value = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    return '%{0}%'.format(value)
+
+
+def _text_expression(attr):
+    # Cast non-text columns so that they can be matched with ILIKE
+    if isinstance(attr.property.columns[0].type, String):
+        return attr
+
+    return cast(attr, String)
+
 
 class _EntityDocumentViewerHandler(object):
     """
@@ -272,15 +319,17 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         self._cell_formatters = {}
         self.filtered_records = []
         self._searchable_columns = OrderedDict()
+        # Advanced search values indexed by column name
+        self._search_params = {}
         self._show_docs_col = False
         self.child_model = OrderedDict()
         # ID of a record to select once records have been added to the table
         self._select_item = None
-        self.current_records = 0
+        self._total_records = 0
 
         self.parent_record_id = ent_rec_id
-        self.record_limit = self.get_records_limit()  # get_entity_browser_record_limit()
-        self.sort_order = self.get_sorting_value()
+        self.record_limit = self.get_records_limit()
+        self.sort_column, self.sort_descending = self.get_sort_details()
 
         # Enable viewing of supporting documents
         if self.can_view_supporting_documents:
@@ -290,6 +339,12 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         self._clear_search_action = None
         self._add_advanced_search_btn()
 
+        # Filter the records once the user stops typing
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DELAY)
+        self._filter_timer.timeout.connect(self.reload_records)
+
         self._csv_export_act = None
         self._add_csv_export_btn()
 
@@ -319,10 +374,12 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
             self.str_preview_container.hide()
 
     def get_records_limit(self):
-        records = get_entity_browser_record_limit()
-        if records == 0:
-            records = pg_table_record_count(self.entity.name)
-        return records
+        """
+        :return: Returns the maximum number of records whose values are
+        kept in memory by the table model. Zero means there is no limit.
+        :rtype: int
+        """
+        return get_entity_browser_record_limit()
 
     def children_entities(self):
         """
@@ -524,17 +581,12 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         """
         Get the number of records in the specified table and updates the window title.
         """
-        entity = self._dbmodel()
-
-        # Get number of records
-        num_records = entity.queryObject().count()
-        if init_data:
-            if self.current_records < 1:
-                if num_records > self.record_limit:
-                    self.current_records = self.record_limit
-                    num_records = self.record_limit
-                else:
-                    self.current_records = num_records
+        if self._tableModel is not None:
+            num_records = self._tableModel.total_count()
+        else:
+            num_records = self._dbmodel().queryObject().count()
+
+        self._total_records = num_records
         self.update_visible_row_count()
         return num_records
 
@@ -545,7 +597,7 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         if not self._proxyModel:
             return
 
-        total_records = self._proxyModel.sourceModel().rowCount()
+        total_records = self._total_records
         visible_records = self._proxyModel.rowCount()
 
         rowStr = QApplication.translate('EntityBrowser', 'row') \
@@ -656,23 +708,23 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
             )
 
     def on_advanced_search(self):
-        self._search_act.setChecked(bool(self._proxyModel.filter_params))
-        search = AdvancedSearch(self._entity, parent=self, initial_values=self._proxyModel.filter_params)
+        self._search_act.setChecked(bool(self._search_params))
+        search = AdvancedSearch(self._entity, parent=self, initial_values=self._search_params)
         search.setAttribute(Qt.WA_DeleteOnClose, True)
 
         search.search_triggered.connect(self._filter_to_search_results)
         search.exec_()
 
-        self._search_act.setChecked(bool(self._proxyModel.filter_params))
+        self._search_act.setChecked(bool(self._search_params))
 
     def _filter_to_search_results(self, search_parameters: dict):
         """
         Filters the view using the specified search parameters
         """
-        self._proxyModel.set_filter_params(search_parameters)
+        self._search_params = search_parameters
         self._search_act.setChecked(bool(search_parameters))
-        self.update_visible_row_count()
         self._clear_search_action.setEnabled(bool(search_parameters))
+        self.reload_records()
 
     def clear_advanced_search(self):
         """
@@ -713,7 +765,13 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
                 self._doc_viewer.load(docs)
     
     def on_csv_export(self):
-        data = self._tableModel._initData
+        # All the records matching the filters, not only those fetched by
+        # the view
+        QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
+        try:
+            data = self._tableModel.all_rows()
+        finally:
+            QApplication.restoreOverrideCursor()
         headers = self._tableModel._headerdata if len(data) > 0 else []
 
         export_entity = {
@@ -727,7 +785,7 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         csv_export_dlg = CSVExportDialog(iface, export_entity)
         csv_export_dlg.exec_()
 
-    def _initializeData(self, filtered_records=None):
+    def _initializeData(self):
         """
         Set table model and load data into it.
         """
@@ -746,138 +804,20 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
 
         self._init_entity_columns()
 
-        # Load entity data. There might be a better way in future in order
-        # to ensure that there is a balance between user data discovery
-        # experience and performance.
-        if filtered_records is not None:
-            self.current_records = filtered_records.rowcount
-
-        numRecords = self.recomputeRecordCount(init_data=True)
-
-        # Load progress dialog
-        progressLabel = QApplication.translate(
-            "EntityBrowser", "Fetching Records..."
-        )
-        progressDialog = QProgressDialog(
-            progressLabel, None, 0, numRecords, parent=self
-        )
-
-        QApplication.processEvents()
-        progressDialog.show()
-        progressDialog.setValue(0)
-
-        entity_records = []
-        # Add records to nested list for enumeration in table model
-        load_data = True
-        if self._entity.name in ENTITY_TABLE_MODEL.keys():
-            if filtered_records is None:
-                self._tableModel = ENTITY_TABLE_MODEL[
-                    self._entity.name
-                ]
-
-        if isinstance(self._parent, EntityEditorDialog):
-            load_data = True
-
-        if load_data:
-            # Only one filter is possible.
-            if len(self.filtered_records) > 0:
-                entity_records = self.filtered_records
-            else:
-                entity_cls = self._dbmodel()
-
-                #ordering = self.get_sorting_order(self._entity)
-
-                if type(self.parent_record_id) == int and self.parent_record_id > 0:
-                    col = self.filter_col(self._entity)
-                    if col is None:
-                        entity_records = entity_cls.queryObject().filter().order_by(
-                            self.sort_order).limit(
-                            self.record_limit
-                        ).all()
-                    else:
-                        child_model = entity_model(self._entity)
-                        col_name = getattr(child_model, col.name)
-                        child_model_obj = child_model()
-                        entity_records = child_model_obj.queryObject().filter(
-                            col_name == self.parent_record_id
-                        ).order_by(self.sort_order).all()
-                else:
-                    # if isinstance(self._parent, QMainWindow):
-                    if not isinstance(self._parent, EntityEditorDialog):
-                        entity_records = entity_cls.queryObject().filter().order_by(
-                            self.sort_order).limit(self.record_limit).all()
-
-                numRecords = len(entity_records)
-
-            # if self._tableModel is None:
-            entity_records_collection = []
-            entity_raw_records = []
-            row_ids = []
-            for i, er in enumerate(entity_records):
-                if i == self.record_limit:
-                    break
-                QApplication.processEvents()
-                entity_row_info = []
-                entity_raw_values = []
-                progressDialog.setValue(i)
-
-                try:
-                    for attr in self._entity_attrs:
-                        attr_val = getattr(er, attr)
-                        entity_raw_values.append(attr_val)
-
-                        # Check if there are display formatters and apply if
-                        # one exists for the given attribute.
-                        if attr_val is not None:  # No need of formatter for None value
-                            if attr in self._cell_formatters:
-                                formatter = self._cell_formatters[attr]
-                                attr_val = formatter.format_column_value(attr_val)
-                        entity_row_info.append(attr_val)
-                except DummyException as ex:
-                    QMessageBox.critical(
-                        self,
-                        QApplication.translate(
-                            'EntityBrowser', 'Loading Records'
-                        ),
-                        str(ex))
-
-                    progressDialog.deleteLater()
-                    del progressDialog
-                    return
-
-                row_ids.append(er.id)
-                entity_records_collection.append(entity_row_info)
-                entity_raw_records.append(entity_raw_values)
-
-            self._tableModel = BaseSTDMTableModel(
-                entity_records_collection, self._headers, self,
-                attribute_names=self._entity_attrs,
-                raw_values=entity_raw_records,
-                row_ids=row_ids
-            )
-
-            ENTITY_TABLE_MODEL[self._entity.name] = self._tableModel
-
         # Add filter columns
         for header, info in self._searchable_columns.items():
             column_name, index = info['name'], info['header_index']
             if column_name != 'id':
                 self.cboFilterColumn.addItem(header, info)
 
-        # Use sortfilter proxy model for the view
+        # Filtering and sorting are done in the database, the proxy model
+        # only numbers the rows.
         self._proxyModel = VerticalHeaderSortFilterProxyModel()
-        self._proxyModel.setDynamicSortFilter(True)
-        self._proxyModel.setSourceModel(self._tableModel)
-        self._proxyModel.setSortCaseSensitivity(Qt.CaseInsensitive)
 
-        # USe first column in the combo for filtering
-        if self.cboFilterColumn.count() > 0:
-            self.set_proxy_model_filter_column(0)
+        # Records are fetched in pages as the user scrolls through the view
+        self._set_table_model(self._create_table_model())
 
         self.tbEntity.setModel(self._proxyModel)
-        #if numRecords < self.record_limit:
-            #self.tbEntity.setSortingEnabled(True)
-            #self.tbEntity.sortByColumn(1, Qt.AscendingOrder)
 
         # First (ID) column will always be hidden
         self.tbEntity.hideColumn(0)
@@ -895,28 +835,264 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
 
         #self.tbEntity.resizeColumnsToContents()
 
+        # Sort the records in the database when a column header is clicked
+        self._init_sort_indicator()
+
         # Connect signals
         self.cboFilterColumn.currentIndexChanged.connect(self.onFilterColumnChanged)
         self.txtFilterPattern.textChanged.connect(self.onFilterRegExpChanged)
         self.tbEntity.selectionModel().currentChanged.connect(self._current_row_changed)
 
+        self.recomputeRecordCount()
+
         # Select record with the given ID if specified
         if self._select_item is not None:
             self._select_record(self._select_item)
 
-        if numRecords > 0:
-            # Set maximum value of the progress dialog
-            progressDialog.setValue(numRecords)
+    def _record_criteria(self):
+        """
+        :return: Returns the filter criteria for the records shown in the
+        browser or None if no records should be shown.
+        :rtype: list
+        """
+        # Only one filter is possible.
+        if len(self.filtered_records) > 0:
+            return [self._dbmodel.id.in_([r.id for r in self.filtered_records])]
+
+        if type(self.parent_record_id) == int and self.parent_record_id > 0:
+            col = self.filter_col(self._entity)
+            if col is None:
+                return []
+
+            return [getattr(self._dbmodel, col.name) == self.parent_record_id]
+
+        # Records are added by the parent editor
+        if isinstance(self._parent, EntityEditorDialog):
+            return None
+
+        return []
+
+    def _query_criteria(self):
+        """
+        :return: Returns the filter criteria for the records shown in the
+        browser, including those of the advanced search and quick filter,
+        or None if no records should be shown.
+        :rtype: list
+        """
+        criteria = self._record_criteria()
+        if criteria is None:
+            return None
+
+        criteria = list(criteria)
+
+        for name, value in self._search_params.items():
+            criterion = self._search_criterion(name, value)
+            if criterion is not None:
+                criteria.append(criterion)
+
+        filter_text = self.txtFilterPattern.text()
+        if filter_text and self.cboFilterColumn.currentIndex() >= 0:
+            name, _ = self._header_index_from_filter_combo_index(
+                self.cboFilterColumn.currentIndex()
+            )
+            criterion = self._filter_criterion(name, filter_text)
+            if criterion is not None:
+                criteria.append(criterion)
+
+        return criteria
+
+    def _column_attribute(self, name):
+        # Returns the model attribute of a table column or None for
+        # relationships and columns that are missing in the model.
+        attr = getattr(self._dbmodel, name, None)
+        if not hasattr(getattr(attr, 'property', None), 'columns'):
+            return None
+
+        return attr
+
+    def _search_criterion(self, name, value):
+        """
+        Creates the criterion for an advanced search value. Text values are
+        matched using a case insensitive 'contains' match and the others,
+        including foreign keys and lookups, using equality.
+        :param name: Column name.
+        :type name: str
+        :param value: Search value.
+        :type value: object
+        :return: SQLAlchemy criterion or None if the column cannot be
+        searched.
+        :rtype: BinaryExpression
+        """
+        attr = self._column_attribute(name)
+        if attr is None:
+            return None
+
+        if isinstance(value, str):
+            return _text_expression(attr).ilike(
+                _contains_pattern(value), escape='\\'
+            )
+
+        return attr == value
+
+    def _filter_criterion(self, name, filter_text):
+        """
+        Creates the criterion for the quick filter. Columns referencing
+        other records are matched against the display columns of the
+        referenced records.
+        :param name: Column name.
+        :type name: str
+        :param filter_text: Text entered by the user.
+        :type filter_text: str
+        :return: SQLAlchemy criterion or None if the column cannot be
+        searched.
+        :rtype: BinaryExpression
+        """
+        pattern = _contains_pattern(filter_text)
+        column = self._entity.columns.get(name, None)
+
+        if isinstance(column, MultipleSelectColumn):
+            return self._multiple_select_criterion(column, pattern)
+
+        attr = self._column_attribute(name)
+        if attr is None:
+            return None
+
+        if column is not None and column.TYPE_INFO in RELATED_COLUMN_TYPES:
+            parent = column.entity_relation.parent
+            parent_cls = entity_model(parent, entity_only=True)
+
+            if column.TYPE_INFO == 'LOOKUP':
+                display_cols = ['value']
+            else:
+                display_cols = column.entity_relation.display_cols
+
+            matches = [
+                _text_expression(getattr(parent_cls, dc)).ilike(pattern, escape='\\')
+                for dc in display_cols if hasattr(parent_cls, dc)
+            ]
+            if len(matches) > 0:
+                return attr.in_(
+                    select([parent_cls.id]).where(or_(*matches))
+                )
+
+        return _text_expression(attr).ilike(pattern, escape='\\')
+
+    def _multiple_select_criterion(self, column, pattern):
+        """
+        Creates the criterion matching the records with at least one
+        selected lookup value matching the pattern. The selected values are
+        read from the association table of the column.
+        :param column: Multiple select column.
+        :type column: MultipleSelectColumn
+        :param pattern: ILIKE pattern.
+        :type pattern: str
+        :return: SQLAlchemy criterion.
+        :rtype: BinaryExpression
+        """
+        association = column.association
+        lookup_col = association.first_reference_column.name
+        parent_col = association.second_reference_column.name
+        assoc_table = sql_table(
+            association.name,
+            sql_column(lookup_col),
+            sql_column(parent_col)
+        )
+
+        lookup_cls = entity_model(column.value_list, entity_only=True)
+        lookup_ids = select([lookup_cls.id]).where(
+            _text_expression(lookup_cls.value).ilike(pattern, escape='\\')
+        )
+
+        return self._dbmodel.id.in_(
+            select([assoc_table.c[parent_col]]).where(
+                assoc_table.c[lookup_col].in_(lookup_ids)
+            )
+        )
+
+    def _create_table_model(self):
+        """
+        Creates the table model for the current filter and sort settings.
+        Models showing all the records of the entity are shared with other
+        browsers through the table model cache.
+        :return: Table model.
+        :rtype: PagedEntityTableModel
+        """
+        criteria = self._query_criteria()
+        shared = criteria is not None and len(criteria) == 0
+        cache = TableModelCache.instance()
+        cache.memory_budget = get_entity_browser_cache_size() * 1024 * 1024
+        key = (self._entity.name, self.sort_column, self.sort_descending)
+
+        model = cache.model(key) if shared else None
+        if model is None:
+            model = PagedEntityTableModel(
+                self._dbmodel, self._headers, None if shared else self,
+                attribute_names=self._entity_attrs,
+                formatters=self._cell_formatters,
+                criteria=criteria,
+                sort_column=self.sort_column,
+                sort_descending=self.sort_descending,
+                max_cached_rows=self.record_limit
+            )
+            if shared:
+                cache.add(key, model)
+
+        if model.rowCount() == 0:
+            model.fetchMore()
+
+        return model
+
+    def _set_table_model(self, model):
+        # Sets the source model of the view
+        if self._tableModel is not None:
+            self._tableModel.rowsInserted.disconnect(self.update_visible_row_count)
+            self._tableModel.rowsRemoved.disconnect(self.update_visible_row_count)
+
+        self._tableModel = model
+        self._proxyModel.setSourceModel(model)
+
+        model.rowsInserted.connect(self.update_visible_row_count)
+        model.rowsRemoved.connect(self.update_visible_row_count)
+
+    def reload_records(self):
+        """
+        Reloads the records in the view based on the current filter and
+        sort settings.
+        """
+        if self._tableModel is None:
+            return
+
+        self._set_table_model(self._create_table_model())
+        self.recomputeRecordCount()
+
+    def _init_sort_indicator(self):
+        # Show the current sort column in the header
+        header = self.tbEntity.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+
+        order = Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder
+        if self.sort_column in self._entity_attrs:
+            header.setSortIndicator(self._entity_attrs.index(self.sort_column), order)
         else:
-            progressDialog.close()
+            header.setSortIndicator(-1, order)
 
-        # because progressDialog has been parented to a widget, it won't ever get deleted until that parent
-        # widget is. But we're done with it now and don't want it hanging around and showing on top of things,
-        # so we FORCE it's immediate deletion with a call to deleteLater(). Despite what the name says, this
-        # will cause the underlying c++ dialog instance to be closed and deleted as soon as Qt returns to the
-        # event loop
-        progressDialog.deleteLater()
-        del progressDialog
+        header.sortIndicatorChanged.connect(self._on_sort_indicator_changed)
+
+    def _on_sort_indicator_changed(self, logical_index, order):
+        """
+        Slot raised when a column header is clicked to sort the records.
+        """
+        if logical_index < 0 or logical_index >= len(self._entity_attrs):
+            return
+
+        attr = self._entity_attrs[logical_index]
+        if not self._tableModel.is_sortable(attr):
+            return
+
+        self.sort_column = attr
+        self.sort_descending = order == Qt.DescendingOrder
+        self.reload_records()
 
     def filter_col(self, child_entity):
         for col in child_entity.columns.values():
@@ -926,34 +1102,46 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
                 # if parent_entity == self._entity:
                 # return col
 
-    def get_sorting_value(self):
+    def get_sort_details(self):
         """
-        Returns a quoted string of sort column and sort order for a given entity.
-        :rtype: str
+        Returns the sort column and whether the sort order is descending
+        for a given entity.
+        :return: Tuple of the sort column name, or None if the entity has
+        no sort settings, and a flag for the descending order.
+        :rtype: tuple
         """
         sort_details = get_entity_sort_details('Sorting/'+current_profile().name, self._entity.short_name)
         if sort_details is None:
-            return text('')
-        order = {'Ascending':'asc', 'Descending':'desc'}
+            return None, False
         column_and_order = sort_details.split()
         sort_column = column_and_order[0]
-        sort_order = order[column_and_order[1]]
+        descending = column_and_order[1] == 'Descending'
 
         # confirm if the column still exists in the entity
         if sort_column not in list(self._entity.columns.keys()):
+            return None, False
+
+        return sort_column, descending
+
+    def get_sorting_value(self):
+        """
+        Returns a quoted string of sort column and sort order for a given entity.
+        :rtype: str
+        """
+        sort_column, descending = self.get_sort_details()
+        if sort_column is None:
             return text('')
 
-        return text(sort_column+' '+sort_order)
+        return text(sort_column+' '+('desc' if descending else 'asc'))
 
     def _header_index_from_filter_combo_index(self, idx):
         col_info = self.cboFilterColumn.itemData(idx)
         return col_info['name'], col_info['header_index']
 
     def set_proxy_model_filter_column(self, index):
-        # Set the filter column for the proxy model using the combo index
-        name, header_idx = self._header_index_from_filter_combo_index(index)
-        self._proxyModel.setFilterKeyColumn(header_idx)
-        self.update_visible_row_count()
+        # Filter the records using the column with the given combo index
+        if self.txtFilterPattern.text():
+            self.reload_records()
 
     def onFilterColumnChanged(self, index):
         """
@@ -968,9 +1156,7 @@ class EntityBrowser(SupportsManageMixin, WIDGET, BASE):
         """
         Slot raised whenever the filter text changes.
         """
-        regExp = QRegExp(text, Qt.CaseInsensitive, QRegExp.FixedString)
-        self._proxyModel.setFilterRegExp(regExp)
-        self.update_visible_row_count()
+        self._filter_timer.start()
 
     def onDoubleClickView(self, modelindex):
         """
@@ -1467,7 +1653,7 @@ class EntityBrowserWithEditor(EntityBrowser):
                 del self.child_model[idx]
                 del self._parent.child_models[idx, self.entity.name]
 
-            self._tableModel.removeRows(row_number, 1)
+            self._remove_record_row(rec_id, row_number)
             # Update number of records
             self.recomputeRecordCount()
 
@@ -1486,7 +1672,7 @@ class EntityBrowserWithEditor(EntityBrowser):
             if not result:
                 return False
 
-            self._tableModel.removeRows(row_number, 1)
+            self._remove_record_row(rec_id, row_number)
 
             # Clear previous notifications
             self._notifBar.clear()
@@ -1504,6 +1690,19 @@ class EntityBrowserWithEditor(EntityBrowser):
 
         return del_result
 
+    def _remove_record_row(self, rec_id, row_number):
+        """
+        Removes the row of the record with the given id from the table
+        model unless it has already been removed e.g. when the shared model
+        is refreshed after the record is deleted from the database.
+        """
+        row_id = self._tableModel.data(
+            self._tableModel.index(row_number, 0),
+            BaseSTDMTableModel.ROLE_ROW_ID
+        )
+        if row_id == rec_id:
+            self._tableModel.removeRows(row_number, 1)
+
     def onDoubleClickView(self, modelindex):
         """
         Override for loading editor dialog.
@@ -49,7 +49,7 @@ from stdm.data.importexport import (
 )
 from stdm.data.importexport.writer import OGRWriter
 from stdm.data.pg_utils import (
-    process_report_filter,
+    report_filter_count,
     table_column_names,
     unique_column_values
 )
@@ -212,6 +212,8 @@ class ExportData(WIDGET, BASE):
             ogrFilter = "GPX (*.gpx)"
         elif self.rbDXF.isChecked():
             ogrFilter = "DXF (*.dxf)"
+        elif self.rbGPKG.isChecked():
+            ogrFilter = "GeoPackage (*.gpkg)"
 
         destFile, _ = QFileDialog.getSaveFileName(
             self, "Select Output File", vectorFileDir(), ogrFilter
@@ -281,12 +283,12 @@ class ExportData(WIDGET, BASE):
 
         targetFile = str(self.field("destFile"))
         writer = OGRWriter(targetFile)
-        resultSet = self.filter_buildQuery()
+        record_count = self.filter_recordCount()
 
-        if resultSet is None:
+        if record_count is None:
             return succeed
 
-        if resultSet.rowcount == 0:
+        if record_count == 0:
             msg = QApplication.translate(
                 'ExportData', "There are no records to export.")
 
@@ -295,9 +297,9 @@ class ExportData(WIDGET, BASE):
 
         try:
 
-            writer.db2Feat(
-                self, self.srcTab, resultSet, self.selectedColumns(),
-                self.geomColumn
+            writer.export_table(
+                self, self.srcTab, self.selectedColumns(), self.geomColumn,
+                self.txtWhereQuery.toPlainText()
             )
 
             ft = QApplication.translate('ExportData', 'Features in ')
@@ -360,10 +362,9 @@ class ExportData(WIDGET, BASE):
             self.ErrorInfoMessage(msg)
 
         else:
-            results = self.filter_buildQuery()
+            rLen = self.filter_recordCount()
 
-            if results != None:
-                rLen = results.rowcount
+            if rLen is not None:
                 msg1 = QApplication.translate(
                     'ExportData', "The SQL statement was successfully verified.\n")
                 msg2 = QApplication.translate('ExportData', "record(s) returned.")
@@ -393,23 +394,15 @@ class ExportData(WIDGET, BASE):
                         where_stmnt += "'{}'".format(i.strip('"').strip("'"))
             self.txtWhereQuery.setPlainText(where_stmnt)
 
-    def filter_buildQuery(self):
-        # Build query set and return results
-        queryCols = self.selectedColumns()
-
-        if self.geomColumn != "":
-            queryCols.append("ST_AsText(%s)" % (self.geomColumn))
-        # remove quote from each column
-
-        columnList = ",".join(queryCols)
-
+    def filter_recordCount(self):
+        # Count the records that match the filter. None is returned if the
+        # filter is invalid.
         whereStmnt = self.txtWhereQuery.toPlainText()
 
-        sortStmnt = ''
-        results = None
+        record_count = None
 
         try:
-            results = process_report_filter(self.srcTab, columnList, whereStmnt, sortStmnt)
+            record_count = report_filter_count(self.srcTab, whereStmnt)
 
         except sqlalchemy.exc.DataError:
             msg = QApplication.translate(
@@ -417,7 +410,7 @@ class ExportData(WIDGET, BASE):
 
             self.ErrorInfoMessage(msg)
 
-        return results
+        return record_count
 
     def filter_insertField(self, lstItem):
         '''
@@ -58,6 +58,7 @@ from qgis.gui import (
     QgsMapCanvas
 )
 from qgis.utils import iface
+from sqlalchemy.orm import selectinload
 
 from stdm.data.configuration import (
     entity_model,
@@ -95,6 +96,10 @@ from stdm.utils.util import (
 LOGGER = logging.getLogger("stdm")
 LOGGER.setLevel(logging.DEBUG)
 
+# Maximum number of ids in each query of the details loader
+DETAILS_BATCH_SIZE = 1000
+
+
 class LayerSelectionHandler(QWidget):
     """
      Handles all tasks related to the layer.
@@ -431,26 +436,83 @@ class DetailsDBHandler(LayerSelectionHandler):
         :return: SQLAlchemy result proxy
         :rtype: Object
         """
+        return self.feature_models(entity, [id]).get(
+            id.id() if isinstance(id, QgsFeature) else id, None
+        )
+
+    def feature_models(self, entity: Entity, ids: list) -> OrderedDict:
+        """
+        Gets the models of an entity with the given ids in batched queries.
+        :param entity: Entity
+        :type entity: Object
+        :param ids: Ids of the records or features.
+        :type ids: list
+        :return: Models indexed by id.
+        :rtype: OrderedDict
+        """
         model = entity_model(entity)
         model_obj = model()
 
-        if isinstance(id, QgsFeature):
-            id = id.id()
+        ids = [i.id() if isinstance(i, QgsFeature) else i for i in ids]
+        models = OrderedDict()
 
-        # result = model_obj.queryObject().filter(model.id == id).all()
-        result = model_obj.queryObject().all()
-        if len(result) == 0:
-            return None
+        for i in range(0, len(ids), DETAILS_BATCH_SIZE):
+            chunk = ids[i:i + DETAILS_BATCH_SIZE]
+            for r in model_obj.queryObject().filter(model.id.in_(chunk)).all():
+                models[r.id] = r
 
-        try:
-            for r in result:
-                if int(r.id) == int(id):
-                    return r
+        return models
 
-            return result[0]
-        except:
-            return None
+    def _str_load_options(self, str_model):
+        """
+        Eager loading options for the parties, spatial units and supporting
+        documents referenced by STR records so that they are fetched in one
+        query per relationship rather than one query per record.
+        """
+        social_tenure = self.current_profile.social_tenure
+        names = [p.name for p in social_tenure.parties]
+        names.extend([sp.name for sp in social_tenure.spatial_units])
+        names.append('documents')
 
+        options = []
+        for name in names:
+            attr = getattr(str_model, name, None)
+            # Only relationships can be eager loaded
+            if hasattr(getattr(attr, 'property', None), 'mapper'):
+                options.append(selectinload(attr))
+
+        return options
+
+    def _str_links(self, link_column: str, ids: list) -> OrderedDict:
+        """
+        Gets the STR records whose link column references the given ids.
+        :param link_column: Name of the STR column referencing the party
+        or spatial unit.
+        :type link_column: str
+        :param ids: Ids of the parties or spatial units.
+        :type ids: list
+        :return: Lists of STR records indexed by the referenced id.
+        :rtype: OrderedDict
+        """
+        str_model = entity_model(
+            self.current_profile.social_tenure
+        )
+        link_col_obj = getattr(str_model, link_column)
+        query = str_model().queryObject().options(
+            *self._str_load_options(str_model)
+        )
+
+        links = OrderedDict([(i, []) for i in ids])
+        for i in range(0, len(ids), DETAILS_BATCH_SIZE):
+            chunk = ids[i:i + DETAILS_BATCH_SIZE]
+            result = query.filter(
+                link_col_obj.in_(chunk)
+            ).order_by(str_model.id).all()
+
+            for r in result:
+                links.setdefault(getattr(r, link_column), []).append(r)
+
+        return links
 
     def feature_str_link(self, feature_id: int, entity=None) -> list:
         """
@@ -461,24 +523,24 @@ class DetailsDBHandler(LayerSelectionHandler):
         :return: The list of social tenure records
         :rtype: List
         """
-        str_model = entity_model(
-            self.current_profile.social_tenure
-        )
+        return self.feature_str_links([feature_id], entity)[feature_id]
+
+    def feature_str_links(self, feature_ids: list, entity=None) -> OrderedDict:
+        """
+        Gets the STR records linked to the given features, with their
+        parties, spatial units and supporting documents, in batched queries.
+        :param feature_ids: The feature ids/ids of the spatial units
+        :type feature_ids: list
+        :return: Lists of social tenure records indexed by feature id.
+        :rtype: OrderedDict
+        """
         if entity is None:
-            spatial_unit_entity_id = '{}_id'.format(
-                self._entity.short_name.replace(' ', '_').lower())
-        else:
-            spatial_unit_entity_id = '{}_id'.format(
-                entity.short_name.replace(' ', '_').lower())
+            entity = self._entity
 
-        spatial_unit_col_obj = getattr(str_model, spatial_unit_entity_id)
-        model_obj = str_model()
-        # TODO Check if str_model.spatial_unit_id is correct
-        result = model_obj.queryObject().filter(
-            spatial_unit_col_obj == feature_id
-        ).all()
+        spatial_unit_entity_id = '{}_id'.format(
+            entity.short_name.replace(' ', '_').lower())
 
-        return result
+        return self._str_links(spatial_unit_entity_id, feature_ids)
 
     def party_str_link(self, party_entity: Entity, party_id: int):
         """
@@ -488,21 +550,42 @@ class DetailsDBHandler(LayerSelectionHandler):
         :return: The list of social tenure records
         :rtype: List
         """
-        str_model = entity_model(
-            self.current_profile.social_tenure
-        )
-        model_obj = str_model()
-        party_name = party_entity.name
+        return self.party_str_links(party_entity, [party_id])[party_id]
 
+    def party_str_links(self, party_entity: Entity, party_ids: list) -> OrderedDict:
+        """
+        Gets the STR records linked to the given parties, with their
+        parties, spatial units and supporting documents, in batched queries.
+        :param party_ids: Ids of the party records.
+        :type party_ids: list
+        :return: Lists of social tenure records indexed by party id.
+        :rtype: OrderedDict
+        """
         party_entity_id = f"{(party_entity.short_name.lower().replace(' ','_'))}_id"
 
-        party_col_obj = getattr(str_model, party_entity_id)
+        return self._str_links(party_entity_id, party_ids)
+
+    def _filter_str_links(self, str_links: OrderedDict, str_ids: list) -> OrderedDict:
+        """
+        Removes the STR records whose ids are not in str_ids.
+        :param str_links: Lists of STR records indexed by the referenced id.
+        :type str_links: OrderedDict
+        :param str_ids: Ids of the STR records to keep, all the records are
+        kept if None.
+        :type str_ids: list
+        :return: Lists of the remaining STR records indexed by the
+        referenced id.
+        :rtype: OrderedDict
+        """
+        if str_ids is None:
+            return str_links
 
-        result = model_obj.queryObject().filter(
-            party_col_obj == party_id
-        ).all()
+        str_ids = set(str_ids)
 
-        return result
+        return OrderedDict([
+            (ref_id, [s for s in str_records if s.id in str_ids])
+            for ref_id, str_records in str_links.items()
+        ])
 
     def column_widget_registry(self, model, entity):
         """
@@ -965,29 +1048,38 @@ class DetailsTreeView(DetailsDBHandler):
             if roots is None:
                 return
 
+            feature_ids = [
+                feature.id() for feature in roots.keys()
+                if isinstance(feature, QgsFeature)
+            ]
+
+            # Load the STR records of all the selected features at once
+            str_links = {}
+            if self.entity in self.social_tenure.spatial_units:
+                str_links = self.feature_str_links(feature_ids)
+
+            features_data = self.features_data_map()
+            db_models = self.feature_models(self.entity, [
+                i for i in feature_ids
+                if len(str_links.get(i, [])) == 0 and len(features_data.get(i, {})) == 0
+            ])
+
             for feature, root in roots.items():
 
                 self.spatial_unit_items[root.data()] = self.entity
 
-                if isinstance(feature, QgsFeature):
-                    id = feature.id()
-
-                if not isinstance(id, int):
+                if not isinstance(feature, QgsFeature):
                     continue
 
-                if self.entity in self.social_tenure.spatial_units:
-                    str_records = self.feature_str_link(id)
- 
+                id = feature.id()
+                str_records = str_links.get(id, [])
+
                 if len(str_records) > 0:
                     db_model = getattr(str_records[0], self.entity.name) # SQLAlchemy Object
+                elif len(features_data.get(id, {})) > 0:
+                    db_model = features_data[id]  # OrderedDict
                 else:
-                    data = self.features_data(id)
-
-                    # if len(self.features_data(id)) > 0:
-                    if len(data[0]) > 0:
-                        db_model = data[0]  # OrderedDict
-                    else:
-                        db_model = self.feature_model(self.entity, id) # SQLAlchemy Object
+                    db_model = db_models.get(id, None) # SQLAlchemy Object
 
                 self.add_root_children(db_model, root, str_records)
 
@@ -997,14 +1089,25 @@ class DetailsTreeView(DetailsDBHandler):
 
         # self.zoom_to_selected(self.layer)
 
-    def search_spatial_unit(self, entity, spatial_unit_ids, select_matching_features: bool = True):
+    def search_spatial_unit(self, entity, spatial_unit_ids, select_matching_features: bool = True,
+                            str_ids: list = None):
         """
         Shows the treeview.
+        :param str_ids: Ids of the STR records to show, all the STR
+        records are shown if None.
+        :type str_ids: list
         """
         self.reset_tree_view()
         layer_icon = GuiUtils.get_icon('layer.gif')
         # add non entity layer for views.
 
+        str_links = self._filter_str_links(
+            self.feature_str_links(spatial_unit_ids, entity), str_ids
+        )
+        db_models = self.feature_models(entity, [
+            i for i in spatial_unit_ids if len(str_links.get(i, [])) == 0
+        ])
+
         # self.reset_tree_view(selected_features)
         for spu_id in spatial_unit_ids:
 
@@ -1014,14 +1117,13 @@ class DetailsTreeView(DetailsDBHandler):
             self.set_bold(root)
             self.model.appendRow(root)
 
-            str_records = self.feature_str_link(spu_id, entity)
-
+            str_records = str_links.get(spu_id, [])
 
             if len(str_records) > 0:
                 #db_model = getattr(str_records[list(str_records.keys())[0]], entity.name)
                 db_model = getattr(str_records[0], entity.name)
             else:
-                db_model = self.feature_model(entity, spu_id)
+                db_model = db_models.get(spu_id, None)
 
             self.add_root_children(db_model, root, str_records)
 
@@ -1034,17 +1136,27 @@ class DetailsTreeView(DetailsDBHandler):
 
         # self.zoom_to_selected(self.layer)
 
-    def search_party(self, entity, party_ids):
+    def search_party(self, entity, party_ids, str_ids: list = None):
         """
         Shows the treeview.
+        :param str_ids: Ids of the STR records to show, all the STR
+        records are shown if None.
+        :type str_ids: list
         """
         self.reset_tree_view()
         table_icon = GuiUtils.get_icon('table.png')
         # add non entity layer for views.
 
+        str_links = self._filter_str_links(
+            self.party_str_links(entity, party_ids), str_ids
+        )
+        db_models = self.feature_models(entity, [
+            i for i in party_ids if len(str_links.get(i, [])) == 0
+        ])
+
         str_records = []
         for spu_id in party_ids:
-            str_records = self.party_str_link(entity, spu_id)
+            str_records = str_links.get(spu_id, [])
 
             root = QStandardItem(table_icon, str(entity.short_name))
             self.party_items[spu_id] = entity
@@ -1055,7 +1167,7 @@ class DetailsTreeView(DetailsDBHandler):
             if len(str_records) > 0:
                 db_model = getattr(str_records[0], entity.name)
             else:
-                db_model = self.feature_model(entity, spu_id)
+                db_model = db_models.get(spu_id, None)
 
             self.add_root_children(db_model, root, str_records, True)
 
@@ -1123,6 +1235,19 @@ class DetailsTreeView(DetailsDBHandler):
                 feature_data.append(feature_map)
         return feature_data
 
+    def features_data_map(self) -> OrderedDict:
+        """
+        Gets data column and value of the selected features of the layer.
+        :return: Feature data with column and value indexed by feature id.
+        :rtype: OrderedDict
+        """
+        field_names = [field.name() for field in self.layer.fields()]
+
+        return OrderedDict([
+            (elem.id(), OrderedDict(list(zip(field_names, elem.attributes()))))
+            for elem in self.layer.selectedFeatures()
+        ])
+
     def party_data(self, party_id=None):
         """
         Gets data column and value of a feature from party.
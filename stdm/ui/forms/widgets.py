@@ -22,6 +22,7 @@ from datetime import (
     date,
     datetime
 )
+from types import SimpleNamespace
 
 from qgis.PyQt.QtCore import QCoreApplication, QDate, QDateTime
 from qgis.PyQt.QtGui import (
@@ -45,7 +46,6 @@ from qgis.gui import (
     QgsDateTimeEdit
 )
 
-from stdm.data.configuration import entity_model
 from stdm.data.configuration.columns import (
     AdministrativeSpatialUnitColumn,
     BaseColumn,
@@ -63,6 +63,7 @@ from stdm.data.configuration.columns import (
     AutoGeneratedColumn,
     ExpressionColumn
 )
+from stdm.data.display_value_resolver import display_value_resolver
 from stdm.data.pg_utils import (
     export_data
 )
@@ -358,6 +359,18 @@ class ColumnWidgetRegistry(object):
         """
         return str(value)
 
+    def prefetch_column_values(self, values):
+        """
+        Loads, in bulk, any data required to format the given column values
+        so that subsequent calls to :func:`format_column_value` do not
+        require a database query for each value. Should be implemented by
+        sub-classes whose formatting depends on other tables. Default
+        implementation does nothing.
+        :param values: Column values.
+        :type values: list
+        """
+        pass
+
 
 class VarCharWidgetFactory(ColumnWidgetRegistry):
     """
@@ -614,9 +627,6 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
     def __init__(self, column):
         ColumnWidgetRegistry.__init__(self, column)
 
-        self._parent_entity_cache = {}
-
-        # Query all parent entities. Need for optimization
         p_entity = self._column.entity_relation.parent
 
         if p_entity is None:
@@ -627,13 +637,11 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
             )
             raise WidgetException(msg)
 
-        self._p_entity_cls = entity_model(p_entity, entity_only=True)
-        self._p_entity_obj = self._p_entity_cls()
-
-        # res = self._p_entity_obj.queryObject().filter().all()
-        res = export_data(p_entity.name)
-        for r in res:
-            self._parent_entity_cache[r.id] = r
+        # Display values are fetched on demand for the requested ids only
+        self._resolver = display_value_resolver(
+            p_entity.name,
+            self._column.entity_relation.display_cols
+        )
 
     @classmethod
     def _create_widget(cls, c, parent, host=None):
@@ -651,23 +659,18 @@ class RelatedEntityWidgetFactory(ColumnWidgetRegistry):
         :return: Display extracted from the selected parent record.
         :rtype: str
         """
-        if value in self._parent_entity_cache:
-            rec = self._parent_entity_cache[value]
-
-        else:
-            # Query value
-            rec = self._p_entity_obj.queryObject().filter(
-                self._p_entity_cls.id == value
-            ).first()
-
-            if rec is None:
-                return ''
+        rec = self._resolver.record(value)
+        if rec is None:
+            return ''
 
-            else:
-                # Add to cache
-                self._parent_entity_cache[rec.id] = rec
+        return RelatedEntityLineEdit.process_display(
+            self._column,
+            SimpleNamespace(**rec)
+        )
 
-        return RelatedEntityLineEdit.process_display(self._column, rec)
+    def prefetch_column_values(self, values):
+        # Fetch the display values of all the parent records in one query
+        self._resolver.resolve(values)
 
 
 RelatedEntityWidgetFactory.register()
@@ -684,17 +687,9 @@ class AdministrativeUnitWidgetFactory(ColumnWidgetRegistry):
 
         ColumnWidgetRegistry.__init__(self, column)
 
-        self._aus_cache = {}
-
-        # Query all admin units on initializing
+        # Names and codes are fetched on demand for the requested ids only
         aus = self._column.entity.profile.administrative_spatial_unit
-        self._aus_cls = entity_model(aus, entity_only=True)
-        self._aus_obj = self._aus_cls()
-
-        # res = self._aus_obj.queryObject().filter().all()
-        res = export_data(aus.name)
-        for r in res:
-            self._aus_cache[r.id] = [r.name, r.code]
+        self._resolver = display_value_resolver(aus.name, ['name', 'code'])
 
     @classmethod
     def _create_widget(cls, c, parent, host=None):
@@ -711,23 +706,11 @@ class AdministrativeUnitWidgetFactory(ColumnWidgetRegistry):
         :return: Name and code corresponding to the given id.
         :rtype: str
         """
-        if value in self._aus_cache:
-            nc = self._aus_cache[value]
-            name, code = nc[0], nc[1]
-
-        else:
-            # Query value
-            res = self._aus_obj.queryObject().filter(
-                self._aus_cls.id == value
-            ).first()
+        rec = self._resolver.record(value)
+        if rec is None:
+            return ''
 
-            if res is None:
-                return ''
-
-            else:
-                # Add result to the cache
-                self._aus_cache[res.id] = res
-                name, code = res.name, res.code
+        name, code = rec.get('name', ''), rec.get('code', '')
 
         if code:
             if 'code' not in self._column.entity_relation.display_cols:
@@ -737,6 +720,10 @@ class AdministrativeUnitWidgetFactory(ColumnWidgetRegistry):
 
         return name
 
+    def prefetch_column_values(self, values):
+        # Fetch the names and codes of all the admin units in one query
+        self._resolver.resolve(values)
+
 
 AdministrativeUnitWidgetFactory.register()
 
@@ -21,9 +21,10 @@ email                : stdm@unhabitat.org
 import os
 import glob
 import shutil
+import sqlite3
 # from stdm.geoodk.importer.geoodkserver import JSONEXTRACTOR
 from collections import OrderedDict
-from typing import Dict, List, TypeVar
+from typing import Dict, Iterator, List, TypeVar
 
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import QCoreApplication, QDateTime, QDir, QFile, Qt
@@ -34,17 +35,19 @@ from sqlalchemy.exc import SQLAlchemyError
 from stdm.data.configuration.stdm_configuration import StdmConfiguration
 from stdm.exceptions import DummyException
 from stdm.geoodk.importer.entity_importer import (
-    EntityImporter, 
-    Save2DB
+    ImportCache,
+    InstanceWriter
 )
 
+from stdm.geoodk.importer.import_ledger import ImportLedger
 from stdm.geoodk.importer.import_log import ImportLogger
-
-from stdm.geoodk.importer.uuid_extractor import (
-    EntityNodeData,
-    InstanceUUIDExtractor
+from stdm.geoodk.importer.instance_reader import (
+    InstanceData,
+    parallel_instances
 )
 
+from stdm.geoodk.importer.uuid_extractor import InstanceUUIDExtractor
+
 from stdm.settings import current_profile
 from stdm.settings.config_serializer import ConfigurationFileSerializer
 from stdm.settings.projectionSelector import ProjectionSelector
@@ -68,11 +71,6 @@ ProfileName = str
 EntityName  = str
 FileName    = str
 
-class InstanceData:
-    def __init__(self, field_data_nodes: List[EntityNodeData], str_data_nodes: List[EntityNodeData]):
-        self.field_data_nodes = field_data_nodes
-        self.str_data_nodes = str_data_nodes
-
 
 class ProfileInstanceRecords(QDialog, FORM_CLASS):
     """
@@ -95,6 +93,7 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
         self.relations = OrderedDict()
         self.parent_ids = {}
         self.importlogger = ImportLogger()
+        self.import_ledger = ImportLedger()
         self._notif_bar_str = NotificationBar(self.vlnotification)
 
         self.chk_all.setCheckState(Qt.Checked)
@@ -259,7 +258,6 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
             directories = self.xform_xpaths()
             for directory in directories:
                 self.extract_guuid_and_rename_file(directory)
-        self.importlogger.start_json_file()
         self.previous_import_instances()
         self.txt_count.setText(str(len(self.instance_list)))
 
@@ -275,31 +273,18 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
                 if os.path.isfile(file_instance):
                     self.rename_file_to_UUID(file_instance)
 
-    def read_instance_data(self) -> Dict[str, tuple[str, InstanceData]]:
+    def read_instance_data(self) -> Iterator[InstanceData]:
         """
-        Read all instance data once and store them in a dict
-        :str is filename
+        Read the instance files in order. The files are parsed in worker
+        processes while the instances already read are imported and only
+        a few batches of parsed instances are held in memory at any time.
+        :return: Generator of the data of each instance file.
         """
-        mobile_data = OrderedDict()
-        #social_tenure_info = OrderedDict()
-        self.uuid_extractor.unset_path()
-
-        for full_filename in self.instance_list:
-            if os.path.isfile(full_filename):
-                filepath, filename = os.path.split(full_filename)
-                self.uuid_extractor.set_file_path(full_filename)
-
-            mobile_data[filename] = (full_filename, InstanceData(
-                    field_data_nodes=self.uuid_extractor.document_entities_with_data(
-                    self.active_profile().replace(' ', '_'),
-                    self.user_selected_entities()),
-                    str_data_nodes=self.uuid_extractor.document_entities_with_data(
-                    self.active_profile().replace(' ', '_'),
-                    ['social_tenure'])))
-
-            self.uuid_extractor.close_document()
-
-        return mobile_data
+        return parallel_instances(
+            list(self.instance_list),
+            self.active_profile().replace(' ', '_'),
+            self.user_selected_entities()
+        )
 
     def rename_file_to_UUID(self, filename: str):
         """
@@ -498,18 +483,13 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
         :return:
         """
         try:
-            self.importlogger.add_log_info()
-            for files in self.instance_list:
-                current_dir = os.path.basename(files)
-                exist = self.importlogger.check_file_exist(current_dir)
-                if exist:
-                    self.instance_list.remove(files)
+            self.previous_import_instances()
             self.txt_count.setText(str(len(self.instance_list)))
             if self.record_count() != len(self.instance_list):
                 msg = 'Some files have been already imported and therefore ' \
                       'not enumerated'
                 self._notif_bar_str.insertErrorNotification(msg)
-        except IOError as io:
+        except (IOError, sqlite3.Error) as io:
             self._notif_bar_str.insertErrorNotification(MSG + ": " + str(io))
 
     def available_records(self):
@@ -596,7 +576,6 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
         params entities: List of names for the selected entities.
         """
         cu_obj = ''
-        import_status = False
 
         self.txt_feedback.clear()
         self.txt_feedback.append("Import started, please wait...\n")
@@ -604,8 +583,6 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
         QCoreApplication.processEvents()
         self._notif_bar_str.clear()
 
-        mobile_field_data = self.read_instance_data()
-
         has_fk = self.has_foreign_keys_parent(entities)  # populates self.relations list
 
         if len(self.parent_table_isselected()) > 0:
@@ -618,36 +595,53 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
                                        QMessageBox.Ok | QMessageBox.No) == QMessageBox.No:
                 return
 
-        if not mobile_field_data:
+        if not self.instance_list:
             self.feedback_message('Not matching data in mobile files')
             return 
 
         counter = 0
+        imported = 0
+        queued_instances = set()
+        writer = InstanceWriter(ImportCache(current_profile()))
+        mobile_field_data = self.read_instance_data()
 
         try:
             self.pgbar.setRange(counter, len(self.instance_list))
             self.pgbar.setValue(0)
             ImportLogger.log_action("Import started ...\n")
 
-            for filename, instance_data in mobile_field_data.items():
+            for instance_obj_data in mobile_field_data:
 
-                instance_full_filename = instance_data[0]
-                instance_obj_data = instance_data[1]
+                filename = instance_obj_data.file_name
+                instance_full_filename = instance_obj_data.full_file_name
 
                 ImportLogger.log_action("File {} ...\n".format(filename))
+                counter = counter + 1
+
+                # Skip copies of instances, under another name, that have
+                # already been imported.
+                instance_keys = {instance_obj_data.uuid, instance_obj_data.content_hash}
+                if not queued_instances.isdisjoint(instance_keys) or \
+                        self.import_ledger.is_imported(instance_obj_data.uuid,
+                                                       instance_obj_data.content_hash):
+                    self.txt_feedback.append('"{0}" has already been imported'.format(filename))
+                    self.pgbar.setValue(counter)
+                    continue
+                queued_instances.update(instance_keys)
+
+                instance_records = writer.new_instance(
+                    filename, instance_full_filename, instance_obj_data
+                )
                 parents_info = []
                 self.parent_ids = {}
-                import_status = False
-                counter = counter + 1
 
-                single_occuring, repeated_entities = self.uuid_extractor.instance_data_from_nodelist(
-                    instance_obj_data.field_data_nodes)
+                single_occuring = instance_obj_data.single_entities
+                repeated_entities = instance_obj_data.repeated_entities
 
                 single_occurring_keys = list(single_occuring.keys())
 
                 for entity_name in single_occurring_keys:
                     entity_data = single_occuring[entity_name]
-                    import_status = False
 
                     if entity_name in self.relations:
                         #if entity_name not in self.parent_ids.keys():
@@ -656,37 +650,29 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
                         self.log_table_entry(log_timestamp)
 
                         cu_obj = entity_name
-                        entity_add = Save2DB(entity_name, entity_data, self.parent_ids)
-
-                        entity_add.objects_from_supporting_doc(instance_full_filename)
-
-                        ref_id = entity_add.save_parent_to_db()
+                        ref_id = writer.add_record(
+                            instance_records, entity_name, entity_data, self.parent_ids
+                        )
 
-                        import_status = True
                         self.parent_ids[entity_name] = [ref_id, entity_name]
                         parents_info.append(entity_name)
                         single_occuring.pop(entity_name)
 
                     else: #entity_name not in self.relations:
-                        import_status = False
                         self.count_import_file_step(counter, entity_name)
                         log_timestamp = '=== standalone table import  === : {0}'.format(entity_name)
                         cu_obj = entity_name
                         self.log_table_entry(log_timestamp)
-                        entity_add = Save2DB(entity_name, entity_data, self.parent_ids)
-                        entity_add.objects_from_supporting_doc(instance_full_filename)
-
-                        child_id = entity_add.save_to_db()
+                        child_id = writer.add_record(
+                            instance_records, entity_name, entity_data, self.parent_ids
+                        )
                         cu_obj = entity_name
-                        import_status = True
                         parents_info.append(entity_name)
                         if entity_name not in self.parent_ids.keys():
                             self.parent_ids[entity_name] = [child_id, entity_name]
-                        entity_add.cleanup()
 
                 if repeated_entities:
                     # self.log_table_entry(" ========== starting import of repeated tables ============")
-                    import_status = False
                     for repeated_entity, entity_data in repeated_entities.items():
                         """We are assuming that the number of repeat table cannot exceed 99"""
                         enum_index = repeated_entity[:2]
@@ -700,41 +686,33 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
                         self.count_import_file_step(counter, repeat_table)
                         ImportLogger.log_action(log_timestamp)
                         if repeat_table in self.profile_entities_names(current_profile()):
-                            entity_add = Save2DB(repeat_table, entity_data, self.parent_ids)
-                            entity_add.objects_from_supporting_doc(instance_full_filename)
-                            child_id = entity_add.save_to_db()
+                            child_id = writer.add_record(
+                                instance_records, repeat_table, entity_data, self.parent_ids
+                            )
                             self.parent_ids[repeat_table] = [child_id, repeat_table]
                             cu_obj = repeat_table
-                            import_status = True
-                            self.log_table_entry(" ------ import succeeded:   {0} ".format(import_status))
-                            entity_add.cleanup()
                             QCoreApplication.processEvents()
                         else:
                             continue
 
-                if instance_obj_data.str_data_nodes:
+                if instance_obj_data.has_str_data:
                     '''We treat social tenure entities separately because of foreign key references'''
-                    entity_relation = EntityImporter(filename)
-                    single_str, multiple_str = self.uuid_extractor.instance_data_from_nodelist(
-                        instance_obj_data.str_data_nodes)
-                    if len(single_str) > 0:
-                        entity_relation.process_social_tenure(single_str, self.parent_ids)
-
-                    elif len(multiple_str) > 1:
-                        for repeated_entity, entity_data in multiple_str.items():
-                            """We are assuming that the number of repeat str cannot exceed 10"""
-                            entity_relation.process_social_tenure(entity_data, self.parent_ids)
+                    single_str = instance_obj_data.single_str
+                    multiple_str = instance_obj_data.repeated_str
+                    for str_data in list(single_str.values()) + list(multiple_str.values()):
+                        writer.add_social_tenure(instance_records, str_data, self.parent_ids)
 
                     self.log_table_entry(" ----- saving social tenure relationship")
-                    # entity_add.cleanup()
 
                 self.txt_feedback.append('saving record "{0}" to database'.format(counter))
+                imported += self.log_written_instances(*writer.add(instance_records))
                 self.pgbar.setValue(counter)
-                self.log_instance(filename)
                 QCoreApplication.processEvents()
 
+            imported += self.log_written_instances(*writer.flush())
+
             self.txt_feedback.append('Number of records successfully imported:  {}'
-                                     .format(counter))
+                                     .format(imported))
         except DummyException as ex:
             self.feedback_message(str(ex))
             QCoreApplication.processEvents()
@@ -748,6 +726,9 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
             self.txt_feedback.append(str(ae))
             self.log_table_entry(str(ae))
             return
+        finally:
+            # Stop parsing the remaining files if the import was interrupted
+            mobile_field_data.close()
 
     def count_import_file_step(self, count:int=0, table: str=""):
         """
@@ -802,30 +783,43 @@ class ProfileInstanceRecords(QDialog, FORM_CLASS):
             QApplication.restoreOverrideCursor()
         return
 
-    def log_instance(self, instance):
-        # instance_short_name = self.importlogger.log_data_name(instance)
-        log_data = self.importlogger.read_log_data()
-        log_data[instance] = self.importlogger.log_date()
-        self.importlogger.write_log_data(log_data)
+    def log_written_instances(self, written: list, failed: list) -> int:
+        """
+        Record the instances written to the database by the instance
+        writer and report those which were rolled back.
+        :param written: Instances written.
+        :type written: list
+        :param failed: Instances that failed together with the error.
+        :type failed: list
+        :return: Returns the number of instances written.
+        :rtype: int
+        """
+        if len(written) > 0:
+            self.import_ledger.record(
+                [instance.source for instance in written],
+                current_profile().name
+            )
+
+        for instance, error in failed:
+            self.txt_feedback.append('import of "{0}" failed and was rolled back: {1}'
+                                     .format(instance.file_name, str(error)))
+            self.log_table_entry(str(error))
+
+        return len(written)
 
     def previous_import_instances(self):
-        count = 0
-        del_list = []
-        log_data = self.importlogger.read_log_data()
-        if len(log_data) > 0:
-            for instance in self.instance_list:
-                # dir_path, file_name = os.path.split(instance)
-                # if log_data.has_key(instance) or log_data.has_key(file_name):
-                try:
-                    if os.path.split(instance)[1] in log_data:
-                        # del_list. append(instance)
-                        self.instance_list.remove(instance)
-                    else:
-                        continue
-                except DummyException:
-                    continue
-            # if len(del_list)>0:
-            # [self.instance_list.remove(inst) for inst in del_list]
+        """
+        Remove the instances that have already been imported, according to
+        the import ledger, from the list of instances.
+        """
+        imported = self.import_ledger.imported_uuids(
+            [self.importlogger.log_data_name(instance) for instance in self.instance_list]
+        )
+        if len(imported) > 0:
+            self.instance_list = [
+                instance for instance in self.instance_list
+                if self.importlogger.log_data_name(instance) not in imported
+            ]
 
     def close(self):
         """
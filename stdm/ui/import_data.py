@@ -696,7 +696,16 @@ class ImportData(WIDGET, BASE):
                 setVectorFileDir(self.field("srcFile"))
                 success = True
         except ImportFeatureException as e:
-            self.show_error_message(str(e))
+            msg = str(e)
+            # Batches committed before the error remain in the table
+            if e.imported_count > 0:
+                msg += QApplication.translate(
+                    'ImportData',
+                    '\n\nThe first {0} features were imported before the '
+                    'error occurred.'
+                ).format(e.imported_count)
+
+            self.show_error_message(msg)
 
         return success
 
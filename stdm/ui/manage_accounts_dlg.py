@@ -36,6 +36,7 @@ from qgis.gui import QgsGui
 
 from stdm.data.qtmodels import UsersRolesModel
 from stdm.security.membership import Membership
+from stdm.security.permission_matrix import PermissionMatrix
 from stdm.security.roleprovider import RoleProvider
 from stdm.ui.gui_utils import GuiUtils
 from stdm.ui.new_role_dlg import newRoleDlg
@@ -215,6 +216,7 @@ class manageAccountsDlg(WIDGET, BASE):
         if result == QMessageBox.Yes:
             # Delete the user
             self.membership.deleteUser(username)
+            PermissionMatrix.instance().invalidate()
 
             # Remove user from the list
             self.usersModel.removeRows(userIndex.row(), 1)
@@ -231,6 +233,7 @@ class manageAccountsDlg(WIDGET, BASE):
         This is very important especially on first time login by the superuser/'postgres' account
         '''
         self.roleProvider.syncSTDMRoles()
+        PermissionMatrix.instance().invalidate()
 
         # Update view
         self.loadRoles()
@@ -303,6 +306,7 @@ class manageAccountsDlg(WIDGET, BASE):
             # Delete the role
             self.roleProvider.DeleteSTDMRole(rolename)
             self.roleProvider.DeleteRole(rolename)
+            PermissionMatrix.instance().invalidate()
 
             # Remove user from the list and role mappings view
             self.rolesModel.removeRows(roleIndex.row(), 1)
@@ -382,4 +386,6 @@ class manageAccountsDlg(WIDGET, BASE):
             elif item.checkState() == Qt.Unchecked:
                 self.roleProvider.RemoveUsersFromRoles([username], [self.currentRole])
 
+            PermissionMatrix.instance().invalidate()
+
             self.blockSignals(False)
@@ -30,8 +30,7 @@ from qgis.PyQt.QtCore import (
     QObject,
     pyqtSignal,
     QThread,
-    QRegExp,
-    QSortFilterProxyModel,
+    QStringListModel,
     pyqtSlot
 )
 from qgis.PyQt.QtWidgets import (
@@ -57,16 +56,18 @@ from qgis.utils import (
 )
 from sqlalchemy import exc
 from sqlalchemy import (
+    cast,
     func,
+    select,
     String
 )
 
 from stdm.data import globals
 from stdm.data.configuration import entity_model
 from stdm.data.database import Content
-from stdm.data.pg_utils import pg_table_record_count
-from stdm.data.qtmodels import (
-    BaseSTDMTableModel
+from stdm.data.pg_utils import (
+    _execute_read,
+    pg_table_record_count
 )
 from stdm.exceptions import DummyException
 from stdm.security.authorization import Authorizer
@@ -92,6 +93,26 @@ from stdm.utils.util import (
 
 LOGGER = logging.getLogger('stdm')
 
+# Delay, in milliseconds, after the last keystroke before suggestions are
+# fetched for the search word
+COMPLETER_DELAY = 300
+
+# Maximum number of suggestions fetched for the search word
+COMPLETER_LIMIT = 50
+
+
+def _prefix_pattern(value):
+    """
+    :return: Returns a LIKE pattern matching values that start with the
+    given value, in lower case, with the wildcard characters escaped.
+    :rtype: str
+    """
+    value = value.lower().replace('\\', '\\\\')
+    value = value.replace('%', '\\%').replace('_', '\\_')
+
+    return value + '%'
+
+
 WIDGET, BASE = uic.loadUiType(
     GuiUtils.get_ui_file_path('ui_view_str.ui'))
 
@@ -480,14 +501,18 @@ class ViewSTRWidget(WIDGET, BASE):
 
             result_ids = [r.id for r in results]
 
+            # Only the STR records within the validity period, if any, are
+            # shown
+            str_ids = getattr(entityWidget, 'valid_str_ids', None)
+
             if entity_name in party_names:
 
                 self.active_spu_id = self.details_tree_view.search_party(
-                    entity, result_ids
+                    entity, result_ids, str_ids=str_ids
                 )
             else:
                 self.details_tree_view.search_spatial_unit(
-                    entity, result_ids
+                    entity, result_ids, str_ids=str_ids
                 )
 
             # self.tbPropertyPreview._iface.activeLayer().selectByExpression("id={}".format(self.active_spu_id))
@@ -921,14 +946,29 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
         self.curr_profile = current_profile()
         self.social_tenure = self.curr_profile.social_tenure
         self.str_model = entity_model(self.social_tenure)
-        # Model for storing display and actual mapping values
-        self._completer_model = None
-        self._proxy_completer_model = None
+        # Ids of the STR records within the validity period of the last search
+        self.valid_str_ids = None
+        # Suggestions for the search word, fetched as the user types
+        self._completer_model = QStringListModel(self)
+        self._completer = QCompleter(self._completer_model, self)
+        self._completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self._completer.setCompletionMode(QCompleter.PopupCompletion)
+        self.txtFilterPattern.setCompleter(self._completer)
+        # Identifies the latest request so that stale results are ignored
+        self._completer_request = 0
+
+        self._completer_timer = QTimer(self)
+        self._completer_timer.setSingleShot(True)
+        self._completer_timer.setInterval(COMPLETER_DELAY)
+        self._completer_timer.timeout.connect(self.loadAsync)
 
         # Hook up signals
         self.cboFilterCol.currentIndexChanged.connect(
             self._on_column_index_changed
         )
+        self.txtFilterPattern.textEdited.connect(
+            self._on_search_text_edited
+        )
         self.init_validity_dates()
         self.validity_from_date.dateChanged.connect(
             self.set_minimum_to_date
@@ -990,22 +1030,31 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
 
     def loadAsync(self):
         """
-        Asynchronously loads an entity's attribute values.
+        Asynchronously loads the values of the current filter column that
+        start with the search word.
         """
+        self._completer_timer.stop()
+        self._completer_request += 1
+        request_id = self._completer_request
+
+        query = self._completer_query(self._searchTerm())
+        if query is None:
+            self._completer_model.setStringList([])
+            return
+
         self.asyncStarted.emit()
 
         # Create model worker
         workerThread = QThread(self)
-        modelWorker = ModelWorker()
+        modelWorker = ModelWorker(request_id, query)
         modelWorker.moveToThread(workerThread)
 
         # Connect signals
         modelWorker.error.connect(self.errorHandler)
-        workerThread.started.connect(
-            lambda: modelWorker.fetch(
-                self.config.STRModel, self.currentFieldName()
-            )
-        )
+        modelWorker.error.connect(workerThread.quit)
+        modelWorker.error.connect(lambda: self.asyncFinished.emit())
+        # Bound slot so that the query runs in the worker thread
+        workerThread.started.connect(modelWorker.fetch)
         modelWorker.retrieved.connect(self._asyncFinished)
         modelWorker.retrieved.connect(workerThread.quit)
         workerThread.finished.connect(modelWorker.deleteLater)
@@ -1050,23 +1099,7 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
         )
         search_term = self._searchTerm()
 
-        prog_dialog.setValue(2)
-        # Try to get the corresponding search term value from the completer model
-        if self._completer_model is not None:
-            reg_exp = QRegExp("^%s$" % search_term, Qt.CaseInsensitive,
-                              QRegExp.RegExp2)
-            self._proxy_completer_model.setFilterRegExp(reg_exp)
-
-            if self._proxy_completer_model.rowCount() > 0:
-                # Get corresponding actual value from the first matching item
-                value_model_idx = self._proxy_completer_model.index(0, 1)
-                source_model_idx = self._proxy_completer_model.mapToSource(
-                    value_model_idx
-                )
-                prog_dialog.setValue(4)
-                search_term = self._completer_model.data(
-                    source_model_idx, Qt.DisplayRole
-                )
+        prog_dialog.setValue(4)
 
         modelInstance = self.config.STRModel()
 
@@ -1084,7 +1117,7 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
         # Get property type so that the filter can
         # be applied according to the appropriate type
         propType = queryObjProperty.property.columns[0].type
-        results = []
+        criterion = None
         try:
             if not isinstance(propType, String):
 
@@ -1110,28 +1143,26 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
                         ).first()
 
                     if result is not None:
-                        results = modelQueryObj.filter(
-                            queryObjProperty == result.id
-                        ).all()
-
-                    else:
-                        results = []
+                        criterion = queryObjProperty == result.id
 
             else:
-                results = modelQueryObj.filter(
-                    func.lower(queryObjProperty) == func.lower(search_term)
-                ).all()
+                criterion = func.lower(queryObjProperty) == func.lower(search_term)
 
-            if self.validity.isEnabled():
-                valid_str_ids = self.str_validity_period_filter(results)
+            if criterion is None:
+                results = []
+            elif self.validity.isEnabled():
+                results, self.valid_str_ids = self.str_validity_period_filter(
+                    modelQueryObj.filter(criterion), entity
+                )
             else:
-                valid_str_ids = None
+                results = modelQueryObj.filter(criterion).all()
+                self.valid_str_ids = None
 
             prog_dialog.setValue(7)
         except exc.StatementError:
             prog_dialog.deleteLater()
             del prog_dialog
-            return model_root_node, [], search_term
+            return [], search_term
 
         # if self.formatter is not None:
         # self.formatter.setData(results)
@@ -1144,36 +1175,48 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
 
         return results, search_term
 
-    def str_validity_period_filter(self, results):
+    def str_validity_period_filter(self, query, entity):
         """
-        Filter the entity results using validity period in STR table.
-        :param results: Entity result
-        :type results: SQLAlchemy result proxy
-        :return: Valid list of STR ids
-        :rtype: List
-        """
-        self.str_model_obj = self.str_model()
-        valid_str_ids = []
-        for result in results:
-            from_date = self.validity_from_date.date().toPyDate()
-            to_date = self.validity_to_date.date().toPyDate()
-            entity_id = '{}_id'.format(result.__table__.name[3:])
-            str_column_obj = getattr(self.str_model, entity_id)
-            str_result = self.str_model_obj.queryObject().filter(
-                self.str_model.validity_start >= from_date).filter(
-                self.str_model.validity_end <= to_date
-            ).filter(str_column_obj == result.id).all()
+        Filter the entity search results using the validity period in the
+        STR table. The entity records are joined to their STR records in a
+        single query.
+        :param query: Entity search query.
+        :type query: Query
+        :param entity: Entity being searched.
+        :type entity: Entity
+        :return: Entity records with at least one STR record within the
+        validity period and the ids of the valid STR records.
+        :rtype: tuple(list, list)
+        """
+        from_date = self.validity_from_date.date().toPyDate()
+        to_date = self.validity_to_date.date().toPyDate()
+        entity_id = '{}_id'.format(
+            entity.short_name.replace(' ', '_').lower()
+        )
+        str_column_obj = getattr(self.str_model, entity_id)
 
-            for res in str_result:
-                valid_str_ids.append(res.id)
+        rows = query.add_columns(self.str_model.id).join(
+            self.str_model, str_column_obj == self.config.STRModel.id
+        ).filter(
+            self.str_model.validity_start >= from_date,
+            self.str_model.validity_end <= to_date
+        ).order_by(self.config.STRModel.id, self.str_model.id).all()
 
-        return valid_str_ids
+        results = OrderedDict()
+        valid_str_ids = []
+        for record, str_id in rows:
+            results[record.id] = record
+            valid_str_ids.append(str_id)
+
+        return list(results.values()), valid_str_ids
 
     def reset(self):
         """
         Clear search input parameters.
         """
+        self._completer_timer.stop()
         self.txtFilterPattern.clear()
+        self._completer_model.setStringList([])
         if self.cboFilterCol.count() > 0:
             self.cboFilterCol.setCurrentIndex(0)
 
@@ -1196,59 +1239,73 @@ class STRViewEntityWidget(WIDGET2, BASE2, EntitySearchItem):
         """
         return self.txtFilterPattern.text()
 
-    def _asyncFinished(self, model_values):
+    def _asyncFinished(self, request_id, values):
         """
         Slot raised when worker has finished retrieving items.
         """
-        # Create QCompleter and add values to it.
-        self._update_completer(model_values)
-        self.asyncFinished.emit()
+        # Ignore the suggestions of superseded search words
+        if request_id == self._completer_request:
+            self._update_completer(values)
 
-    def _update_completer(self, values):
-        # Get the items in a tuple and put them in a list
+        self.asyncFinished.emit()
 
-        # Store display and actual values in a
-        # model for easier mapping and
-        # retrieval when carrying out searches
+    def _completer_query(self, search_term):
+        """
+        Creates the query for the first values of the current filter column
+        that start with the search term. Matching is case-insensitive on
+        lower(column) so that the search indexes on text columns are used.
+        Values of lookup columns are matched against the lookup values.
+        :param search_term: Search word.
+        :type search_term: str
+        :return: Returns the select statement or None if the column does
+        not support suggestions.
+        :rtype: Select
+        """
+        col_name = self.currentFieldName()
+        model = self.config.STRModel
+        if not search_term or col_name is None or not hasattr(model, col_name):
+            return None
 
-        model_attr_mapping = []
+        col_obj = getattr(model, col_name)
+        formatter = self.config.LookupFormatters.get(col_name, None)
 
-        # Check if there are formaters specified
-        # for the current field name
-        for mv in values:
-            f_model_values = []
+        if formatter is not None:
+            # Suggestions are only supported for lookup values
+            if formatter.column.TYPE_INFO != 'LOOKUP':
+                return None
 
-            m_val = mv[0]
+            lookup_entity = lookup_parent_entity(self.curr_profile, col_name)
+            lookup_model = entity_model(lookup_entity)
+            if lookup_model is None:
+                return None
 
-            if m_val is not None:
-                col_label = self.currentFieldName()
-                if col_label in self.config.LookupFormatters:
-                    formatter = self.config.LookupFormatters[col_label]
-                    if formatter.column.TYPE_INFO == 'LOOKUP':
-                        m_val = formatter.code_value(m_val)[0]
-                    else:
-                        m_val = formatter.format_column_value(m_val)
-            f_model_values.extend([m_val, m_val])
+            col_obj = getattr(lookup_model, 'value')
 
-            model_attr_mapping.append(f_model_values)
+        elif not isinstance(col_obj.property.columns[0].type, String):
+            col_obj = cast(col_obj, String)
 
-        self._completer_model = BaseSTDMTableModel(model_attr_mapping, ["", ""], self)
+        return select([col_obj]).where(
+            func.lower(col_obj).like(_prefix_pattern(search_term), escape='\\')
+        ).distinct().order_by(col_obj).limit(COMPLETER_LIMIT)
 
-        # We will use the QSortFilterProxyModel for filtering purposes
-        self._proxy_completer_model = QSortFilterProxyModel()
-        self._proxy_completer_model.setDynamicSortFilter(True)
-        self._proxy_completer_model.setSourceModel(self._completer_model)
-        self._proxy_completer_model.setSortCaseSensitivity(Qt.CaseInsensitive)
-        self._proxy_completer_model.setFilterKeyColumn(0)
+    def _update_completer(self, values):
+        """
+        Shows the suggestions for the current search word.
+        :param values: Values that start with the search word.
+        :type values: list
+        """
+        self._completer_model.setStringList(values)
 
-        # Configure completer
-        mod_completer = QCompleter(self._completer_model, self)
-        mod_completer.setCaseSensitivity(Qt.CaseInsensitive)
-        mod_completer.setCompletionMode(QCompleter.PopupCompletion)
-        mod_completer.setCompletionColumn(0)
-        mod_completer.setCompletionRole(Qt.DisplayRole)
+        if self.txtFilterPattern.hasFocus() and len(values) > 0:
+            self._completer.setCompletionPrefix(self._searchTerm())
+            self._completer.complete()
 
-        self.txtFilterPattern.setCompleter(mod_completer)
+    def _on_search_text_edited(self, text):
+        """
+        Slot raised when the user edits the search word. Suggestions are
+        fetched once the user pauses typing.
+        """
+        self._completer_timer.start()
 
     def _on_column_index_changed(self, int):
         """
@@ -1290,25 +1347,27 @@ class ModelWorker(QObject):
     Worker for retrieving model attribute
     values stored in the database.
     """
-    retrieved = pyqtSignal(object)
+    retrieved = pyqtSignal(int, list)
     error = pyqtSignal(str)
 
-    pyqtSlot(object, str)
+    def __init__(self, request_id, query, parent=None):
+        QObject.__init__(self, parent)
+        self.request_id = request_id
+        self.query = query
 
-    def fetch(self, model, fieldname):
+    @pyqtSlot()
+    def fetch(self):
         """
-        Fetch attribute values from the
-        database for the specified model
-        and corresponding column name.
+        Fetch the attribute values returned by the
+        query on a connection separate from the
+        session used in the GUI thread.
         """
         try:
-            if hasattr(model, fieldname):
-                modelInstance = model()
-                obj_property = getattr(model, fieldname)
-                model_values = modelInstance.queryObject(
-                    [obj_property]
-                ).distinct()
-                self.retrieved.emit(model_values)
+            values = [
+                str(r[0]) for r in _execute_read(self.query)
+                if r[0] is not None
+            ]
+            self.retrieved.emit(self.request_id, values)
 
-        except DummyException as ex:
+        except exc.SQLAlchemyError as ex:
             self.error.emit(str(ex))
@@ -85,6 +85,7 @@ from stdm.data.pg_utils import (
     table_column_names,
     pg_table_record_count
 )
+from stdm.data.schema_catalog import SchemaCatalog
 
 from stdm.security.privilege_provider import MultiPrivilegeProvider
 from stdm.settings import (
@@ -224,6 +225,9 @@ class ConfigWizard(WIDGET, BASE):
         # Initialize notification bars
         self._notif_bar_str = NotificationBar(self.vl_notification_str)
 
+        # Start with a fresh view of the database structure
+        SchemaCatalog.instance().invalidate()
+
         # transfer state between wizard and column editor
         self.editor_cache = {}
         self.editor_cache['prop_set'] = None
@@ -1507,6 +1511,9 @@ class ConfigWizard(WIDGET, BASE):
         self.txtHtml.append(msg)
 
     def config_update_completed(self, status):
+        # The schema has changed, reload the catalog on the next lookup
+        SchemaCatalog.instance().invalidate()
+
         self.button(QWizard.CancelButton).setEnabled(True)
         self.button(QWizard.CustomButton1).setEnabled(True)
         if status: